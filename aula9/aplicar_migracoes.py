@@ -0,0 +1,63 @@
+"""
+Aplica, em ordem, os arquivos de migrations/*.sql ainda não aplicados no banco.
+
+Uso:
+    python aplicar_migracoes.py           # aplica pendentes
+    python aplicar_migracoes.py --listar  # só mostra o estado
+
+O schema base continua em informações.sql; as migrações registram-se em schema_migrations.
+"""
+from pg_pool import get_pool
+import argparse
+import glob
+import os
+
+MIGRACOES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+SQL_CONTROLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      name        TEXT PRIMARY KEY,
+      applied_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+
+def migracoes() -> list:
+    return sorted(glob.glob(os.path.join(MIGRACOES_DIR, "*.sql")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplica migrações SQL pendentes.")
+    parser.add_argument("--listar", action="store_true")
+    args = parser.parse_args(argv)
+
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_CONTROLE)
+            cur.execute("SELECT name FROM schema_migrations;")
+            aplicadas = {r[0] for r in cur.fetchall()}
+            conn.commit()
+
+            for caminho in migracoes():
+                nome = os.path.basename(caminho)
+                if nome in aplicadas:
+                    print(f"ok        {nome}")
+                    continue
+                if args.listar:
+                    print(f"pendente  {nome}")
+                    continue
+                with open(caminho, encoding="utf-8") as f:
+                    cur.execute(f.read())
+                cur.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (nome,))
+                conn.commit()
+                print(f"aplicada  {nome}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,32 +7,35 @@ from prompt_agentes import (
     prompt_orquestrador,
     prompt_faq,
 )
-from langchain_core.runnables import RunnableWithMessageHistory, RunnablePassthrough
+from langchain_core.runnables import RunnableWithMessageHistory
 from langchain.agents import create_tool_calling_agent
 from langchain.agents import AgentExecutor
 from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_message_histories import ChatMessageHistory
-from faq_tools import get_faq_context
+from historico_redis import HISTORY_TTL, get_session_history as get_redis_history, history_cache_metrics
+from janela_historico import com_janela
+from faq_tools import get_faq_context, embed_question, faq_version
+from cache_faq import CacheSemantico, com_cache_semantico
+from pre_roteador import ROTAS_GRAFO, pre_rotear
+from langchain_core.messages import HumanMessage, AIMessage
 from dotenv import load_dotenv
 from pg_tools import TOOLS
+from pg_pool import async_pool_metrics, pool_metrics
+from typing import AsyncIterator, Iterator, List, Optional
 import unicodedata
+import json
 import os
 import sys
 import io
 import re
-from guardrail import verificar_guardrail
+from guardrail import MascaradorStream, verificar_guardrail, sanitizar
+from instrumentacao import CALLBACK, METRICAS, iniciar_exportador, medir_no
 from langgraph.graph import StateGraph, START, END
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
-sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
 load_dotenv()
 
-store = {}
-def get_session_history(session_id: str) -> ChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+# Chat interativo mostra a resposta token a token (0 volta a imprimir só no fim)
+ASSESSOR_STREAM = os.getenv("ASSESSOR_STREAM", "1") != "0"
 
 def sanitize_input(text) -> str:
     if isinstance(text, bytes):
@@ -58,6 +61,9 @@ llm_fast = ChatGoogleGenerativeAI(
     google_api_key=os.getenv("GEMINI_API_KEY"),
 )
 
+# Prompts recebem resumo + últimas trocas; o histórico completo fica no Redis
+get_session_history = com_janela(get_redis_history, llm_fast, HISTORY_TTL)
+
 chain_roteador = RunnableWithMessageHistory( 
     prompt_roteador | llm_fast | StrOutputParser(),
     get_session_history=get_session_history,
@@ -112,15 +118,18 @@ chain_orquestrador = RunnableWithMessageHistory(
     history_messages_key="chat_history"
 )
 
-chain_faq = (
-    RunnablePassthrough.assign(
-        question=lambda x: x['input'],
-        context=lambda x: get_faq_context(x['input'])
-    )
-    | prompt_faq
-    | llm_fast
-    | StrOutputParser()
-)
+chain_faq_llm = prompt_faq | llm_fast | StrOutputParser()
+
+def responder_faq(pergunta: str, embedding) -> str:
+    return chain_faq_llm.invoke({
+        "question": pergunta,
+        "context": get_faq_context(pergunta, embedding=embedding),
+    })
+
+# Perguntas equivalentes (cosseno >= FAQ_CACHE_THRESHOLD) reaproveitam a resposta;
+# o cache é descartado quando o PDF do FAQ muda
+cache_faq = CacheSemantico(faq_version())
+chain_faq = com_cache_semantico(responder_faq, embed_question, faq_version, cache_faq)
 
 rota_map = {
     "financeiro": chain_financeiro,
@@ -138,16 +147,69 @@ def to_safe_str(text):
 
 CLARIFY_PATTERN = re.compile(r"CLARIFY=(.*)", re.DOTALL)
 ROUTE_PATTERN = re.compile(r"ROUTE=(\w+)")
+JSON_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+CERCA_PATTERN = re.compile(r"^\s*(```(json)?)?\s*$", re.IGNORECASE)
+
+# JSON completo do especialista é formatado aqui, sem a chamada ao chain_orquestrador (0 desliga)
+ORQUESTRADOR_LOCAL = os.getenv("ORQUESTRADOR_LOCAL", "1") != "0"
+
+
+def renderizar_especialista(saida: str) -> Optional[str]:
+    """
+    FORMATO DE SAÍDA do prompt_orquestrador a partir do JSON do especialista:
+    `resposta` na primeira linha, *Recomendação* se não vazia, *Acompanhamento* com
+    `esclarecer` ou `acompanhamento`. None quando o LLM precisa sintetizar: JSON
+    inválido, texto fora do JSON ou `resposta` ausente.
+    """
+    achou = JSON_PATTERN.search(saida)
+    if not achou:
+        return None
+    # Fora do objeto só pode haver cerca de código (```json ... ```)
+    for trecho in (saida[:achou.start()], saida[achou.end():]):
+        if not CERCA_PATTERN.match(trecho):
+            return None
+    try:
+        dados = json.loads(achou.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(dados, dict):
+        return None
+
+    campos = {}
+    for chave in ("resposta", "recomendacao", "esclarecer", "acompanhamento"):
+        valor = dados.get(chave)
+        if valor is not None and not isinstance(valor, str):
+            return None
+        campos[chave] = (valor or "").strip()
+    if not campos["resposta"]:
+        return None
+
+    linhas = [campos["resposta"]]
+    if campos["recomendacao"]:
+        linhas += ["- *Recomendação*:", campos["recomendacao"]]
+    acompanhamento = campos["esclarecer"] or campos["acompanhamento"]
+    if acompanhamento:
+        linhas += ["- *Acompanhamento* (opcional):", acompanhamento]
+    return "\n".join(linhas)
+
+
+def orquestrar(saida_especialista: str, session_id: str) -> str:
+    resposta = renderizar_especialista(saida_especialista) if ORQUESTRADOR_LOCAL else None
+    if resposta is None:
+        METRICAS.incrementar("assessor_orquestrador_total", modo="llm")
+        return chain_orquestrador.invoke(
+            {"input": saida_especialista},
+            config={"configurable": {"session_id": session_id}}
+        )
+    METRICAS.incrementar("assessor_orquestrador_total", modo="local")
+    # Mantém o histórico igual ao que o chain_orquestrador gravaria
+    get_session_history(session_id).add_messages([HumanMessage(content=saida_especialista), AIMessage(content=resposta)])
+    return resposta
 
 def executar_fluxo_assessor(pergunta, session_id):
     safe_input = sanitize_input(pergunta)
 
-    resposta_roteador = to_safe_str(
-        chain_roteador.invoke(
-            {"input": safe_input},
-            config={"configurable": {"session_id": session_id}}
-        )
-    )
+    resposta_roteador = to_safe_str(rotear(safe_input, session_id))
 
     clarify_match = CLARIFY_PATTERN.search(resposta_roteador)
     if clarify_match:
@@ -173,31 +235,38 @@ def executar_fluxo_assessor(pergunta, session_id):
         )
     )
 
-    resposta_orquestrador = to_safe_str(
-        chain_orquestrador.invoke(
-            {"input": resposta_especialista},
-            config={"configurable": {"session_id": session_id}}
-        )
-    )
+    resposta_orquestrador = to_safe_str(orquestrar(resposta_especialista, session_id))
     
     return resposta_orquestrador
 
 
+def rotear(texto: str, session_id: str) -> str:
+    # Intenções óbvias são decididas localmente; o LLM só entra quando o pré-roteador não tem certeza
+    resposta_roteador = pre_rotear(texto)
+    if resposta_roteador is None:
+        return chain_roteador.invoke(
+            {"input": texto},
+            config={"configurable": {"session_id": session_id}}
+        )
+    # Mantém o histórico igual ao que o chain_roteador gravaria
+    get_session_history(session_id).add_messages([HumanMessage(content=texto), AIMessage(content=resposta_roteador)])
+    return resposta_roteador
+
+
+@medir_no("roteador")
 def router_node(state: dict) -> dict:
-    resposta_roteador = chain_roteador.invoke(
-        {"input": state["input"]},
-        config={"configurable": {"session_id": state["session_id"]}}
-    )  
+    resposta_roteador = rotear(state["input"], state["session_id"])
    
     if not resposta_roteador.startswith("ROUTE="):
         return {"resposta_usuario": resposta_roteador}
    
     rota = resposta_roteador.split("\n", 1)[0].split("=", 1)[1].strip().lower()
-    if rota not in {"financeiro", "agenda", "faq"}:
+    if rota not in ROTAS_GRAFO:
         return {"erro": f"Rota inválida: {rota}"}
  
     return {"rota": rota, "roteador": resposta_roteador, 'input':state['input'], 'session_id': state['session_id']}
 
+@medir_no("guardrail")
 def guardrail_node(state: dict) -> dict:
     acao, mensagem, gatilhos = verificar_guardrail(state["input"])
 
@@ -208,11 +277,12 @@ def guardrail_node(state: dict) -> dict:
         return {"resposta_usuario": mensagem, "gatilhos": gatilhos}
 
     elif acao == "SANITIZAR":
-        texto_sanitizado = re.sub(r"\*+", "***", state["input"])
+        texto_sanitizado = sanitizar(state["input"])
         return {"input": texto_sanitizado, "mensagem_guardrail": mensagem, "gatilhos": gatilhos, "session_id": state["session_id"]}
 
     return {"input": state["input"], "session_id": state["session_id"]}
 
+@medir_no("faq")
 def faq_node(state: dict) -> dict:
     result = chain_faq.invoke(
         {"input": state['input']}, 
@@ -221,25 +291,27 @@ def faq_node(state: dict) -> dict:
     
     return {"resposta_usuario": result, "session_id": state["session_id"]}
 
+@medir_no("financeiro")
 def financeiro_node(state: dict) -> dict:
-    result = executor_financeiro.invoke(
+    # Pela chain com histórico: o prompt do agente exige chat_history
+    result = chain_financeiro.invoke(
         {"input": state['roteador']}, 
         config={"configurable": {"session_id": state["session_id"]}}
     )  
-    return {"saida_especialista": result["output"], 'session_id': state['session_id']}
+    return {"saida_especialista": result["output"], 'session_id': state['session_id'], 'rota': state['rota']}
 
+@medir_no("agenda")
 def agenda_node(state: dict) -> dict:
-    result = executor_agenda.invoke(
+    # Pela chain com histórico: o prompt do agente exige chat_history
+    result = chain_agenda.invoke(
         {"input": state['roteador']}, 
         config={"configurable": {"session_id": state["session_id"]}}
     )  
-    return {"saida_especialista": result["output"], 'session_id': state['session_id']}
+    return {"saida_especialista": result["output"], 'session_id': state['session_id'], 'rota': state['rota']}
 
+@medir_no("orquestrador")
 def orchestrator_node(state: dict) -> dict:
-    resposta_final = chain_orquestrador.invoke(
-        {"input": state['saida_especialista']},
-        config={"configurable": {"session_id": state["session_id"]}}
-    )  
+    resposta_final = orquestrar(state['saida_especialista'], state["session_id"])
     return {"resposta_usuario": resposta_final}
 
 def decide_after_router(state: dict) -> str:
@@ -307,29 +379,129 @@ graph.add_conditional_edges(
 graph.add_edge("orquestrador", END)
 graph.add_edge("faq", END)
 
-app = graph.compile()
+# CALLBACK mede LLMs e tools de todas as chains chamadas dentro dos nós
+app = graph.compile().with_config(callbacks=[CALLBACK])
 
+METRICAS.descrever("assessor_orquestrador_total", "Respostas finais formatadas localmente x pelo LLM do orquestrador.")
+METRICAS.registrar_coletor("assessor_cache_faq", cache_faq.metrics)
+METRICAS.registrar_coletor("assessor_historico_lru", history_cache_metrics)
+METRICAS.registrar_coletor("assessor_pg_pool", pool_metrics)
+METRICAS.registrar_coletor("assessor_pg_pool_async", async_pool_metrics)
 
-def executar_fluxo_assessor(pergunta_usuario: str, session_id: str) -> str:
-    final_state = app.invoke({"input": pergunta_usuario, "session_id": session_id})
+
+def resposta_final(final_state: dict) -> str:
     if final_state.get("erro"):
         return f"Erro: {final_state['erro']}"
     return final_state.get("resposta_usuario", "Não foi possível responder.")
 
-while True:
-    try:
-        user_input = input("> ")
-        if user_input.lower() in ('sair', 'end', 'fim', 'tchau', 'bye'):
-            print("Encerrando a conversa.")
-            break
+
+def executar_fluxo_assessor(pergunta_usuario: str, session_id: str) -> str:
+    final_state = app.invoke({"input": pergunta_usuario, "session_id": session_id})
+    return resposta_final(final_state)
+
+
+# Nós cujo LLM gera a resposta final: só os tokens deles vão para o usuário
+NOS_RESPOSTA = {"orquestrador", "faq"}
+STREAM_MODES = ["updates", "messages"]
+
+
+class TraducaoEventos:
+    """
+    Converte os pedaços de app.stream(stream_mode=["updates", "messages"]) em eventos:
+      {"tipo": "progresso", "no": "roteador", "rota": "financeiro"}  - nó concluído
+      {"tipo": "token", "texto": "..."}                             - pedaço da resposta
+      {"tipo": "fim", "resposta": "..."}                            - resposta completa
+    Os tokens passam pelo MascaradorStream (PII mascarada sem esperar a resposta
+    inteira). Respostas que não vêm de LLM em streaming (guardrail, saudação, cache do
+    FAQ) saem num único token antes do fim.
+    """
+
+    def __init__(self):
+        self.mascarador = MascaradorStream()
+        self.estado = {}
+        self.transmitiu = False
+        self.partes = []
+
+    def _token(self, texto: str) -> List[dict]:
+        if not texto:
+            return []
+        self.partes.append(texto)
+        return [{"tipo": "token", "texto": texto}]
+
+    def traduzir(self, modo: str, dados) -> List[dict]:
+        if modo == "messages":
+            chunk, meta = dados
+            if meta.get("langgraph_node") in NOS_RESPOSTA and isinstance(chunk.content, str) and chunk.content:
+                self.transmitiu = True
+                return self._token(self.mascarador.feed(chunk.content))
+            return []
+
+        eventos = []
+        for no, saida in dados.items():
+            # StateGraph(dict): a saída do nó é o estado inteiro daqui em diante
+            self.estado = saida or {}
+            evento = {"tipo": "progresso", "no": no}
+            if self.estado.get("rota"):
+                evento["rota"] = self.estado["rota"]
+            eventos.append(evento)
+        return eventos
+
+    def finalizar(self) -> List[dict]:
+        eventos = []
+        if not self.transmitiu:
+            eventos += self._token(self.mascarador.feed(resposta_final(self.estado)))
+        eventos += self._token(self.mascarador.flush())
+        return eventos + [{"tipo": "fim", "resposta": "".join(self.partes)}]
+
+
+def executar_fluxo_assessor_stream(pergunta_usuario: str, session_id: str) -> Iterator[dict]:
+    """Como executar_fluxo_assessor, mas entrega a resposta token a token (eventos de TraducaoEventos)."""
+    traducao = TraducaoEventos()
+    for modo, dados in app.stream({"input": pergunta_usuario, "session_id": session_id}, stream_mode=STREAM_MODES):
+        yield from traducao.traduzir(modo, dados)
+    yield from traducao.finalizar()
+
+
+async def aexecutar_fluxo_assessor_stream(pergunta_usuario: str, session_id: str) -> AsyncIterator[dict]:
+    """Versão async (servidor HTTP); os nós síncronos rodam no executor do LangGraph."""
+    traducao = TraducaoEventos()
+    async for modo, dados in app.astream({"input": pergunta_usuario, "session_id": session_id}, stream_mode=STREAM_MODES):
+        for evento in traducao.traduzir(modo, dados):
+            yield evento
+    for evento in traducao.finalizar():
+        yield evento
+
+
+# Só o chat interativo (o serviço HTTP fica em servidor.py); importar o módulo não abre o loop
+if __name__ == "__main__":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    # /metrics no formato do Prometheus quando METRICS_PORT está definido
+    iniciar_exportador()
+
+    while True:
+        try:
+            user_input = input("> ")
+            if user_input.lower() in ('sair', 'end', 'fim', 'tchau', 'bye'):
+                print("Encerrando a conversa.")
+                break
         
-        resposta = executar_fluxo_assessor(
-            pergunta_usuario=user_input, 
-            session_id="PRECISA_MAS_NÃO_IMPORTA"
-        )
+            if ASSESSOR_STREAM:
+                for evento in executar_fluxo_assessor_stream(user_input, "PRECISA_MAS_NÃO_IMPORTA"):
+                    if evento["tipo"] == "progresso":
+                        print(f"· {evento['no']}", file=sys.stderr, flush=True)
+                    elif evento["tipo"] == "token":
+                        print(evento["texto"], end="", flush=True)
+                print()
+                continue
+
+            resposta = executar_fluxo_assessor(
+                pergunta_usuario=user_input, 
+                session_id="PRECISA_MAS_NÃO_IMPORTA"
+            )
         
-        print(resposta)
+            print(resposta)
         
-    except Exception as e:
-            print("Erro ao consumir a API:", e)
-            continue
+        except Exception as e:
+                print("Erro ao consumir a API:", e)
+                continue
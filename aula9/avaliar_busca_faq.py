@@ -0,0 +1,74 @@
+"""
+Avaliação offline da busca do FAQ (recall@k) em dados/faq_eval.jsonl.
+
+Cada linha tem {pergunta, trecho}: a busca acerta se algum dos k primeiros chunks
+contém o trecho (comparação sem diferença de espaços/quebras de linha). Compara
+FAISS puro, BM25 puro e a busca híbrida, e mostra o tamanho médio do contexto que
+get_faq_context monta com o k dinâmico.
+
+Uso:
+    python avaliar_busca_faq.py
+    python avaliar_busca_faq.py --k 1 3 5
+
+Os embeddings das perguntas passam pelo cache (cache_embeddings), então só a
+primeira execução chama a API.
+"""
+from faq_tools import embed_question, get_busca
+from busca_hibrida import estimar_tokens, tokenizar
+import argparse
+import json
+import os
+import re
+import sys
+
+EVAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "faq_eval.jsonl")
+
+
+def _compacto(texto: str) -> str:
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="recall@k da busca do FAQ.")
+    parser.add_argument("--eval", default=EVAL_PATH)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 6])
+    args = parser.parse_args(argv)
+
+    with open(args.eval, encoding="utf-8") as f:
+        exemplos = [json.loads(linha) for linha in f if linha.strip()]
+
+    busca = get_busca()
+    textos = [_compacto(t) for t in busca.textos]
+    n = max(args.k)
+    acertos = {m: {k: 0 for k in args.k} for m in ("faiss", "bm25", "hibrida")}
+    tokens_contexto = chunks_contexto = 0
+
+    for e in exemplos:
+        trecho = _compacto(e["trecho"])
+        vetor = embed_question(e["pergunta"])
+        rankings = {
+            "faiss": busca._vetorial(vetor, n),
+            "bm25": busca._lexical(tokenizar(e["pergunta"]), n),
+            "hibrida": [i for i, _ in busca.ranquear(e["pergunta"], vetor, n)],
+        }
+        for metodo, ids in rankings.items():
+            for k in args.k:
+                acertos[metodo][k] += any(trecho in textos[i] for i in ids[:k])
+
+        escolhidos = busca.buscar(e["pergunta"], vetor)
+        chunks_contexto += len(escolhidos)
+        tokens_contexto += sum(estimar_tokens(busca.textos[i]) for i in escolhidos)
+
+    print(f"{len(exemplos)} perguntas, {len(busca.textos)} chunks")
+    print("método   " + "  ".join(f"recall@{k:<2}" for k in args.k))
+    for metodo, por_k in acertos.items():
+        print(f"{metodo:8} " + "  ".join(f"{por_k[k] / len(exemplos):9.1%}" for k in args.k))
+    print(
+        f"contexto dinâmico: {chunks_contexto / len(exemplos):.1f} chunks, "
+        f"~{tokens_contexto / len(exemplos):.0f} tokens por pergunta"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
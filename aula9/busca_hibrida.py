@@ -0,0 +1,129 @@
+"""
+Busca híbrida para o FAQ: BM25 local + vizinhos do FAISS, fundidos por Reciprocal
+Rank Fusion, reranqueados por cobertura dos termos da pergunta e cortados por um
+orçamento de tokens de contexto (k dinâmico).
+"""
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+import unicodedata
+import numpy as np
+import math
+import re
+import os
+
+# Contexto máximo enviado ao prompt do FAQ (~4 caracteres por token)
+FAQ_CONTEXT_TOKENS = int(os.getenv("FAQ_CONTEXT_TOKENS", "500"))
+FAQ_MAX_CHUNKS = int(os.getenv("FAQ_MAX_CHUNKS", "3"))
+# Candidatos de cada busca antes da fusão
+FAQ_CANDIDATES = int(os.getenv("FAQ_CANDIDATES", "10"))
+# Chunks com score abaixo dessa fração do melhor são descartados
+FAQ_MIN_SCORE_RATIO = float(os.getenv("FAQ_MIN_SCORE_RATIO", "0.6"))
+
+RRF_K = 60
+
+STOPWORDS = set("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas para pra
+com sem e ou que se me te lhe eu voce voces ele ela eles elas meu minha meus minhas seu sua
+seus suas nao sim ja mais muito como qual quais quando onde porque isso isto esse essa este
+esta ao aos ha tem ter ser sao foi era e posso pode podem consigo
+""".split())
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    texto = unicodedata.normalize("NFD", texto.lower())
+    texto = "".join(c for c in texto if unicodedata.category(c) != "Mn")
+    return [t for t in TOKEN.findall(texto) if len(t) > 1 and t not in STOPWORDS]
+
+
+def estimar_tokens(texto: str) -> int:
+    return len(texto) // 4 + 1
+
+
+class BM25:
+    """BM25 Okapi sobre uma lista fixa de documentos (o FAQ tem poucas dezenas de chunks)."""
+
+    def __init__(self, docs: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tfs = [Counter(tokenizar(d)) for d in docs]
+        self.tamanhos = [sum(tf.values()) for tf in self.tfs]
+        self.media = sum(self.tamanhos) / len(self.tamanhos) if self.tamanhos else 0.0
+        df = Counter(t for tf in self.tfs for t in tf)
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, termos: List[str]) -> List[float]:
+        resultado = []
+        for tf, tamanho in zip(self.tfs, self.tamanhos):
+            s = 0.0
+            norma = self.k1 * (1 - self.b + self.b * tamanho / (self.media or 1))
+            for t in termos:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (self.k1 + 1) / (f + norma)
+            resultado.append(s)
+        return resultado
+
+
+class BuscaHibrida:
+    def __init__(self, textos: List[str], index):
+        self.textos = textos
+        self.index = index
+        self.bm25 = BM25(textos)
+        self.termos = [set(tokenizar(t)) for t in textos]
+
+    def _vetorial(self, vetor: List[float], n: int) -> List[int]:
+        _, ids = self.index.search(np.asarray([vetor], dtype=np.float32), min(n, len(self.textos)))
+        return [int(i) for i in ids[0] if i >= 0]
+
+    def _lexical(self, termos: List[str], n: int) -> List[int]:
+        scores = self.bm25.scores(termos)
+        ordem = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        return [i for i in ordem[:n] if scores[i] > 0]
+
+    def _cobertura(self, termos_q: set, i: int) -> float:
+        # Reranker barato: fração dos termos da pergunta presentes no chunk
+        return len(termos_q & self.termos[i]) / len(termos_q) if termos_q else 0.0
+
+    def ranquear(self, pergunta: str, vetor: Optional[List[float]], n: int = FAQ_CANDIDATES) -> List[Tuple[int, float]]:
+        termos = tokenizar(pergunta)
+        listas = [self._lexical(termos, n)]
+        if vetor is not None:
+            listas.append(self._vetorial(vetor, n))
+
+        rrf = {}
+        for lista in listas:
+            for pos, i in enumerate(lista):
+                rrf[i] = rrf.get(i, 0.0) + 1.0 / (RRF_K + pos + 1)
+        if not rrf:
+            return []
+        melhor_rrf = max(rrf.values())
+        termos_q = set(termos)
+        pontuados = [(i, 0.5 * r / melhor_rrf + 0.5 * self._cobertura(termos_q, i)) for i, r in rrf.items()]
+        return sorted(pontuados, key=lambda x: x[1], reverse=True)
+
+    def buscar(
+        self,
+        pergunta: str,
+        vetor: Optional[List[float]],
+        k_max: int = FAQ_MAX_CHUNKS,
+        orcamento: int = FAQ_CONTEXT_TOKENS,
+    ) -> List[int]:
+        """Índices dos chunks escolhidos: o melhor sempre entra; os demais enquanto couberem no orçamento."""
+        ranqueados = self.ranquear(pergunta, vetor)
+        if not ranqueados:
+            return []
+        melhor = ranqueados[0][1]
+        escolhidos = [ranqueados[0][0]]
+        usados = estimar_tokens(self.textos[ranqueados[0][0]])
+        for i, score in ranqueados[1:]:
+            if len(escolhidos) >= k_max or score < FAQ_MIN_SCORE_RATIO * melhor:
+                break
+            custo = estimar_tokens(self.textos[i])
+            if usados + custo > orcamento:
+                break
+            escolhidos.append(i)
+            usados += custo
+        return escolhidos
@@ -0,0 +1,110 @@
+from langchain_core.embeddings import Embeddings
+from typing import Dict, List
+from array import array
+import threading
+import hashlib
+import sqlite3
+import os
+
+SQL_CREATE = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        model TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (model, sha256)
+    ) WITHOUT ROWID;
+"""
+# Limite de variáveis por statement do SQLite (999 nas versões antigas)
+SQLITE_MAX_VARS = 900
+
+
+def _sha256(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _to_blob(vetor: List[float]) -> bytes:
+    return array("f", vetor).tobytes()
+
+
+def _from_blob(blob: bytes) -> List[float]:
+    vetor = array("f")
+    vetor.frombytes(blob)
+    return vetor.tolist()
+
+
+class EmbeddingsCacheadas(Embeddings):
+    """
+    Embeddings com cache em SQLite por (modelo, sha256(texto)).
+    - hits não usam a rede
+    - misses são deduplicados e vão numa única chamada `embed_documents` ao modelo base
+    - reindexar um PDF editado só embeda os chunks cujo texto mudou
+    """
+
+    def __init__(self, base: Embeddings, model: str, path: str):
+        self.base = base
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: leitores de outros processos não bloqueiam a escrita do build
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(SQL_CREATE)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _buscar(self, model: str, chaves: List[str]) -> Dict[str, List[float]]:
+        encontrados = {}
+        with self._lock:
+            for i in range(0, len(chaves), SQLITE_MAX_VARS):
+                lote = chaves[i:i + SQLITE_MAX_VARS]
+                marcadores = ",".join("?" * len(lote))
+                cur = self._conn.execute(
+                    f"SELECT sha256, vector FROM embeddings WHERE model = ? AND sha256 IN ({marcadores})",
+                    [model, *lote],
+                )
+                for chave, blob in cur:
+                    encontrados[chave] = _from_blob(blob)
+        return encontrados
+
+    def _gravar(self, model: str, itens: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, sha256, vector) VALUES (?, ?, ?)",
+                [(model, chave, _to_blob(v)) for chave, v in itens.items()],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        chaves = [_sha256(t) for t in texts]
+        unicas = list(dict.fromkeys(chaves))
+        vetores = self._buscar(self.model, unicas)
+
+        faltando = [c for c in unicas if c not in vetores]
+        self.hits += len(unicas) - len(faltando)
+        self.misses += len(faltando)
+        if faltando:
+            texto_por_chave = dict(zip(chaves, texts))
+            novos = self.base.embed_documents([texto_por_chave[c] for c in faltando])
+            novos = dict(zip(faltando, novos))
+            self._gravar(self.model, novos)
+            vetores.update(novos)
+        return [vetores[c] for c in chaves]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Consulta e documento usam task_type diferentes no modelo base: chaves separadas
+        model = self.model + "#query"
+        chave = _sha256(text)
+        vetor = self._buscar(model, [chave]).get(chave)
+        if vetor is not None:
+            self.hits += 1
+            return vetor
+        self.misses += 1
+        vetor = self.base.embed_query(text)
+        self._gravar(model, {chave: vetor})
+        return vetor
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,147 @@
+from langchain_core.runnables import RunnableLambda
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+import numpy as np
+import threading
+import time
+import os
+
+load_dotenv()
+
+# Similaridade de cosseno mínima para considerar duas perguntas equivalentes
+FAQ_CACHE_THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.92"))
+FAQ_CACHE_TTL = float(os.getenv("FAQ_CACHE_TTL", str(24 * 3600)))
+FAQ_CACHE_SIZE = int(os.getenv("FAQ_CACHE_SIZE", "500"))
+
+
+def _normalizar(vetor) -> np.ndarray:
+    v = np.asarray(vetor, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+class CacheSemantico:
+    """
+    Cache de respostas do FAQ por similaridade da pergunta.
+    - entrada = (embedding normalizado, resposta, criado em)
+    - hit quando cosseno >= limiar com alguma pergunta já respondida
+    - TTL por entrada e despejo LRU acima de `max_itens`
+    - `versao` (hash do PDF): se mudar, o cache inteiro é descartado
+    """
+
+    def __init__(
+        self,
+        versao: str,
+        limiar: float = FAQ_CACHE_THRESHOLD,
+        ttl: float = FAQ_CACHE_TTL,
+        max_itens: int = FAQ_CACHE_SIZE,
+    ):
+        self.versao = versao
+        self.limiar = limiar
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # id -> (vetor, resposta, criado_em)
+        self._proximo_id = 0
+        self._matriz = None  # cache da pilha de vetores; refeita quando os itens mudam
+        self._ids = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.latencia_miss_media = 0.0
+        self.latencia_economizada = 0.0
+
+    def _expirar(self, agora: float):
+        vencidos = [i for i, (_, _, criado) in self._itens.items() if agora - criado > self.ttl]
+        for i in vencidos:
+            del self._itens[i]
+        if vencidos:
+            self._matriz = None
+
+    def _pilha(self):
+        if self._matriz is None:
+            self._ids = list(self._itens)
+            self._matriz = np.stack([self._itens[i][0] for i in self._ids]) if self._ids else None
+        return self._matriz
+
+    def buscar(self, vetor: np.ndarray, versao: str) -> Optional[str]:
+        with self._lock:
+            if versao != self.versao:
+                self._limpar()
+                self.versao = versao
+            self._expirar(time.monotonic())
+            matriz = self._pilha()
+            if matriz is not None:
+                sims = matriz @ vetor
+                j = int(sims.argmax())
+                if sims[j] >= self.limiar:
+                    i = self._ids[j]
+                    self._itens.move_to_end(i)
+                    self.hits += 1
+                    self.latencia_economizada += self.latencia_miss_media
+                    return self._itens[i][1]
+            self.misses += 1
+            return None
+
+    def guardar(self, vetor: np.ndarray, resposta: str, versao: str, latencia: float):
+        with self._lock:
+            if versao != self.versao:
+                return
+            # Média móvel da latência de um miss: base para estimar o tempo economizado por hit
+            if self.latencia_miss_media:
+                self.latencia_miss_media = 0.9 * self.latencia_miss_media + 0.1 * latencia
+            else:
+                self.latencia_miss_media = latencia
+            self._itens[self._proximo_id] = (vetor, resposta, time.monotonic())
+            self._proximo_id += 1
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+            self._matriz = None
+
+    def _limpar(self):
+        self._itens.clear()
+        self._matriz = None
+
+    def limpar(self):
+        with self._lock:
+            self._limpar()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._itens),
+                "saved_latency_s": self.latencia_economizada,
+                "miss_latency_avg_s": self.latencia_miss_media,
+            }
+
+
+def com_cache_semantico(
+    responder: Callable[[str, List[float]], str],
+    embed: Callable[[str], List[float]],
+    versao: Callable[[], str],
+    cache: CacheSemantico,
+) -> RunnableLambda:
+    """
+    Runnable {"input": pergunta} -> resposta. `embed` é chamado uma vez por pergunta e o
+    mesmo vetor vai para a busca no FAISS em caso de miss (`responder(pergunta, vetor)`).
+    """
+
+    def _invoke(x: dict) -> str:
+        pergunta = x["input"]
+        vetor_bruto = embed(pergunta)
+        vetor = _normalizar(vetor_bruto)
+        v = versao()
+        resposta = cache.buscar(vetor, v)
+        if resposta is not None:
+            return resposta
+        t0 = time.perf_counter()
+        resposta = responder(pergunta, vetor_bruto)
+        cache.guardar(vetor, resposta, v, time.perf_counter() - t0)
+        return resposta
+
+    return RunnableLambda(_invoke)
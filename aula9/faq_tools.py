@@ -1,34 +1,202 @@
+"""
+Contexto do FAQ (FAQ_assessor_v1.1.pdf) via FAISS.
+
+O índice e os chunks ficam em disco, em .faq_index/<chave>/, onde a chave combina o
+hash do PDF, os parâmetros do splitter e o modelo de embeddings. Na partida nada é
+lido nem embedado: no primeiro uso o índice é carregado com mmap e, só se a chave
+não existir (PDF ou parâmetros mudaram), é reconstruído e salvo.
+
+Uso (build antecipado, ex.: no deploy):
+    python faq_tools.py            # constrói se não existir
+    python faq_tools.py --forcar   # reconstrói
+"""
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from cache_embeddings import EmbeddingsCacheadas
+from busca_hibrida import BuscaHibrida, FAQ_MAX_CHUNKS
 from dotenv import load_dotenv
+from typing import List, Optional
+import threading
+import argparse
+import hashlib
+import shutil
+import faiss
+import json
+import sys
 import os
 
 load_dotenv()
 
 PDF_PATH = os.path.join(os.path.dirname(__file__), "FAQ_assessor_v1.1.pdf")
+INDEX_ROOT = os.getenv("FAQ_INDEX_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".faq_index")
+
+CHUNK_SIZE = 700
+CHUNK_OVERLAP = 150
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+
+def _hash_pdf() -> str:
+    with open(PDF_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _assinatura_pdf() -> tuple:
+    st = os.stat(PDF_PATH)
+    return st.st_mtime_ns, st.st_size
+
 
-loader = PyPDFLoader(PDF_PATH)
-docs = loader.load()
+# Versão atual do PDF; faq_version() re-hasheia quando mtime/tamanho mudam
+PDF_SHA256 = _hash_pdf()
+_pdf_assinatura = _assinatura_pdf()
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=700, chunk_overlap=150)
-chunks = splitter.split_documents(docs)
+
+def index_dir(pdf_sha256: Optional[str] = None) -> str:
+    """Diretório do índice para esta versão do PDF e parâmetros de chunking/embedding."""
+    chave = hashlib.sha256(
+        f"{pdf_sha256 or PDF_SHA256}:{CHUNK_SIZE}:{CHUNK_OVERLAP}:{EMBEDDING_MODEL}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(INDEX_ROOT, chave)
 
 
 api_key = os.getenv("GEMINI_API_KEY")
 if not api_key:
     raise ValueError("❌ GEMINI_API_KEY não encontrada no .env")
 
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=api_key,
-    transport="rest"
+# Chunks e perguntas já embedados saem do cache local, sem chamar a API
+embeddings = EmbeddingsCacheadas(
+    GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        google_api_key=api_key,
+        transport="rest"
+    ),
+    EMBEDDING_MODEL,
+    os.getenv("EMBEDDINGS_CACHE_PATH") or os.path.join(INDEX_ROOT, "embeddings.sqlite"),
 )
 
-db = FAISS.from_documents(chunks, embeddings)
 
-def get_faq_context(question: str, k: int = 6):
-    results = db.similarity_search(question, k=k)
-    context = "\n\n".join([doc.page_content for doc in results])
+def _split_pdf() -> List[Document]:
+    docs = PyPDFLoader(PDF_PATH).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return splitter.split_documents(docs)
+
+
+def build_index(destino: Optional[str] = None) -> FAISS:
+    """Embeda os chunks, grava index.faiss + chunks.json em `destino` (troca atômica do diretório)."""
+    destino = destino or index_dir()
+    chunks = _split_pdf()
+    db = FAISS.from_documents(chunks, embeddings)
+
+    tmp = f"{destino}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    faiss.write_index(db.index, os.path.join(tmp, "index.faiss"))
+    ordenados = [db.docstore.search(db.index_to_docstore_id[i]) for i in range(len(db.index_to_docstore_id))]
+    with open(os.path.join(tmp, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in ordenados], f, ensure_ascii=False)
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+    # Recarrega do disco: mesmos ids (posição do chunk) e índice em mmap
+    return load_index(destino)
+
+
+def load_index(origem: Optional[str] = None) -> Optional[FAISS]:
+    """Carrega o índice salvo com mmap (as páginas vêm do disco sob demanda); None se não existir."""
+    origem = origem or index_dir()
+    caminho = os.path.join(origem, "index.faiss")
+    if not os.path.exists(caminho):
+        return None
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        index = faiss.read_index(caminho, flag)
+    except RuntimeError:
+        # Tipo de índice sem suporte a mmap nesta versão do faiss
+        index = faiss.read_index(caminho)
+    with open(os.path.join(origem, "chunks.json"), encoding="utf-8") as f:
+        chunks = [Document(**c) for c in json.load(f)]
+    ids = {i: str(i) for i in range(len(chunks))}
+    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(chunks)})
+    return FAISS(embeddings, index, docstore, ids)
+
+
+_indice = None   # (FAISS, BuscaHibrida) da versão atual do PDF
+_db_lock = threading.Lock()
+
+
+def faq_version() -> str:
+    """
+    Hash do PDF do FAQ. Custa um os.stat por chamada: o arquivo só é lido de novo
+    quando mtime ou tamanho mudam. Se o conteúdo mudou, o índice em memória é
+    descartado e o próximo get_db() carrega (ou constrói) o da nova versão.
+    """
+    global PDF_SHA256, _pdf_assinatura, _indice
+    assinatura = _assinatura_pdf()
+    if assinatura != _pdf_assinatura:
+        with _db_lock:
+            if assinatura != _pdf_assinatura:
+                novo = _hash_pdf()
+                if novo != PDF_SHA256:
+                    PDF_SHA256 = novo
+                    _indice = None
+                _pdf_assinatura = assinatura
+    return PDF_SHA256
+
+
+def _carregar() -> tuple:
+    global _indice
+    faq_version()
+    indice = _indice
+    if indice is None:
+        with _db_lock:
+            if _indice is None:
+                db = load_index() or build_index()
+                textos = [db.docstore.search(db.index_to_docstore_id[i]).page_content for i in range(db.index.ntotal)]
+                _indice = (db, BuscaHibrida(textos, db.index))
+            indice = _indice
+    return indice
+
+
+def get_db() -> FAISS:
+    """Índice do FAQ, carregado (ou construído) no primeiro uso e de novo se o PDF mudar."""
+    return _carregar()[0]
+
+
+def get_busca() -> BuscaHibrida:
+    return _carregar()[1]
+
+
+def embed_question(question: str) -> List[float]:
+    return embeddings.embed_query(question)
+
+def get_faq_chunks(question: str, k: int = FAQ_MAX_CHUNKS, embedding: Optional[List[float]] = None) -> List[str]:
+    """Chunks mais relevantes (BM25 + FAISS + rerank), no máximo `k` e dentro de FAQ_CONTEXT_TOKENS."""
+    busca = get_busca()
+    # Com o embedding já calculado (ex.: pelo cache semântico) não embeda a pergunta de novo
+    if embedding is None:
+        embedding = embed_question(question)
+    return [busca.textos[i] for i in busca.buscar(question, embedding, k_max=k)]
+
+def get_faq_context(question: str, k: int = FAQ_MAX_CHUNKS, embedding: Optional[List[float]] = None):
+    context = "\n\n".join(get_faq_chunks(question, k, embedding))
     return context
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Constrói o índice FAISS do FAQ em disco.")
+    parser.add_argument("--forcar", action="store_true", help="Reconstrói mesmo se o índice já existir.")
+    args = parser.parse_args(argv)
+
+    if not args.forcar and load_index() is not None:
+        print(f"Índice atual: {index_dir()}")
+        return 0
+    db = build_index()
+    print(f"Índice construído: {index_dir()} ({db.index.ntotal} chunks)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple
+from bisect import bisect_right
 import re
-from typing import List, Tuple
+
+try:
+    # Aho-Corasick (pyahocorasick) para os termos literais; sem ele, uma regex de alternação
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # Palavras/frases que indicam tentativa de burlar o sistema → BLOQUEAR
 TERMOS_BLOQUEAR = [
@@ -37,10 +45,10 @@ PADROES_AVISO = [
     re.compile(r"\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b"),               # CNPJ
     re.compile(r"\b\d{1,2}\.?\d{3}\.?\d{3}-?[0-9Xx]\b"),                  # RG (simplificado)
     re.compile(r"\b(?:\d[ -]*?){13,19}\b"),                               # cartão (simplificado)
-    re.compile(r"\b[\w\.-]+@[\w\.-]+\.\w{2,}\b"),                         # e-mail
+    re.compile(r"\b[\w\.-]{1,64}@[\w\.-]{1,255}\.\w{2,}\b"),               # e-mail (limites evitam backtracking quadrático)
     re.compile(r"\b(?:\+?55\s?)?(?:\(?\d{2}\)?\s?)?\d{4,5}-?\d{4}\b"),    # telefone BR
     re.compile(r"\b[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}\b"), # UUID (chave PIX aleatória)
-    re.compile(r"(?i)\b(ag(e|ê)ncia|conta|iban)\b.*\b\d{3,}\b"),          # dados bancários
+    re.compile(r"(?i)\b(ag(e|ê)ncia|conta|iban)\b.{0,100}\b\d{3,}\b"),    # dados bancários (número até 100 caracteres depois)
 ]
 
 # Substituições para mascarar dados sensíveis
@@ -48,11 +56,156 @@ PADROES_SANITIZAR = [
     (re.compile(r"(\d{3})\.?(\d{3})\.?(\d{3})-?(\d{2})"), r"\1.\2.***-**"),          # CPF
     (re.compile(r"(\d{2})\.?(\d{3})\.?(\d{3})/?:?(\d{4})-?(\d{2})"), r"\1.\2.***/*-**"),  # CNPJ
     (re.compile(r"(\d{4})\d{9,15}"), r"\1************"),                            # cartão
-    (re.compile(r"([\w\.-]+)@([\w\.-]+\.\w{2,})"), r"***@***"),                     # e-mail
+    (re.compile(r"\b([\w\.-]{1,64})@([\w\.-]{1,255}\.\w{2,})"), r"***@***"),        # e-mail
     (re.compile(r"((?:\+?55\s?)?(?:\(?\d{2}\)?\s?)?)\d{4,5}-?\d{4}"), r"\1*****-****"),  # telefone
 ]
 
 
+MENSAGEM_BLOQUEAR = "Não posso atender esse pedido. Posso ajudar com finanças ou agenda."
+MENSAGEM_AVISAR = "Vamos manter uma conversa respeitosa. Como posso ajudar com finanças ou agenda?"
+MENSAGEM_SANITIZAR = "Detectei dados sensíveis. Omiti/mascarei informações para sua segurança. Deseja prosseguir?"
+
+
+# ---------------------------------------------------------------------------
+# Matcher compilado uma única vez no import
+#
+# Cada regex tem condições necessárias baratas: literais que precisam aparecer no
+# texto em minúsculas (âncoras) e/ou uma sequência mínima de dígitos. Uma passada
+# de Aho-Corasick encontra os termos de bloqueio e as âncoras de uma vez e uma
+# passada de `\d+` mede os dígitos; só as regex cujas condições foram atendidas
+# rodam, sobre o texto original. Como as condições são necessárias, o resultado é
+# idêntico ao de rodar todas as regras em sequência.
+# ---------------------------------------------------------------------------
+
+PADROES_PROFANIDADE = [re.compile(fr"(?i)\b{re.escape(termo)}\b") for termo in PROFANIDADE_PESADA]
+
+# (âncoras em minúsculas ou None, (maior sequência de dígitos, total de dígitos) ou None)
+CONDICOES_BLOQUEAR = [
+    (("ignore", "desconsidere"), None),
+    (("prompt",), None),
+    (("api", "chave", "token"), None),
+    (("union", "drop", "truncate", "xp_", "sleep("), None),
+    (("--", ";", "/*", "*/"), None),
+    (("bomba", "clonar", "phishing"), None),
+    (("suic", "me matar", "mutila"), None),
+    (("sexual",), None),
+]
+CONDICOES_PROFANIDADE = [((termo.lower(),), None) for termo in PROFANIDADE_PESADA]
+CONDICOES_AVISO = [
+    (None, (3, 11)),                                   # CPF
+    (None, (3, 14)),                                   # CNPJ
+    (None, (3, 7)),                                    # RG
+    (None, (1, 13)),                                   # cartão
+    (("@",), None),                                    # e-mail
+    (None, (4, 8)),                                    # telefone
+    (("-",), None),                                    # UUID
+    (("agencia", "agência", "conta", "iban"), (3, 3)),  # dados bancários
+]
+
+# Regras na ordem de prioridade da verificação: (rótulo do gatilho, regex, âncoras, dígitos)
+REGRAS = (
+    [(f"PADRAO_BLOQUEAR:{p.pattern[:30]}...", p, *c) for p, c in zip(PADROES_BLOQUEAR, CONDICOES_BLOQUEAR)]
+    + [(f"PROFANIDADE:{t}", p, *c) for t, p, c in zip(PROFANIDADE_PESADA, PADROES_PROFANIDADE, CONDICOES_PROFANIDADE)]
+    + [(f"PADRAO_AVISO:{p.pattern[:30]}...", p, *c) for p, c in zip(PADROES_AVISO, CONDICOES_AVISO)]
+)
+FIM_BLOQUEAR = len(PADROES_BLOQUEAR)
+FIM_PROFANIDADE = FIM_BLOQUEAR + len(PADROES_PROFANIDADE)
+
+TERMOS_BLOQUEAR_LOWER = [t.lower() for t in TERMOS_BLOQUEAR]
+
+# literal -> [("T", índice do termo) | ("R", índice da regra)]
+LITERAIS = {}
+for _i, _termo in enumerate(TERMOS_BLOQUEAR_LOWER):
+    LITERAIS.setdefault(_termo, []).append(("T", _i))
+for _i, (_, _, _ancoras, _) in enumerate(REGRAS):
+    for _a in _ancoras or ():
+        LITERAIS.setdefault(_a, []).append(("R", _i))
+
+if ahocorasick is not None:
+    _automato = ahocorasick.Automaton()
+    for _literal, _alvos in LITERAIS.items():
+        _automato.add_word(_literal, _alvos)
+    _automato.make_automaton()
+else:
+    _automato = None
+
+DIGITO = re.compile(r"\d")
+DIGITOS = re.compile(r"\d+")
+# Caracteres que o IGNORECASE do `re` iguala a letras ASCII, mas que str.lower() não
+# converte (ex.: "ſ" ~ "s", "İ" ~ "i"): com eles as âncoras não valem e tudo roda
+DOBRAS_ESPECIAIS = re.compile("[\u0130\u0131\u017f\u212a\u212b]")
+
+
+def _literais_presentes(texto_lower: str) -> Tuple[Optional[int], Set[int]]:
+    """(primeiro termo de bloqueio na ordem da lista ou None, regras com alguma âncora presente)."""
+    termos = set()
+    regras = set()
+    if _automato is not None:
+        for _, alvos in _automato.iter(texto_lower):
+            for tipo, i in alvos:
+                (termos if tipo == "T" else regras).add(i)
+    else:
+        for literal, alvos in LITERAIS.items():
+            if literal in texto_lower:
+                for tipo, i in alvos:
+                    (termos if tipo == "T" else regras).add(i)
+    return min(termos, default=None), regras
+
+
+def _perfil_digitos(texto: str) -> Tuple[int, int]:
+    """(maior sequência de dígitos, total de dígitos)."""
+    if DIGITO.search(texto) is None:
+        return 0, 0
+    sequencias = [len(s) for s in DIGITOS.findall(texto)]
+    return max(sequencias), sum(sequencias)
+
+
+def _filtrar_regras(ancoradas: Set[int], maior: int, total: int, dobra_especial: bool) -> List[int]:
+    if dobra_especial:
+        return list(range(len(REGRAS)))
+    candidatas = []
+    for i, (_, _, ancoras, digitos) in enumerate(REGRAS):
+        if ancoras is not None and i not in ancoradas:
+            continue
+        if digitos is not None and (maior < digitos[0] or total < digitos[1]):
+            continue
+        candidatas.append(i)
+    return candidatas
+
+
+def regras_candidatas(texto: str, texto_lower: str) -> Tuple[Optional[int], List[int]]:
+    """Termo de bloqueio encontrado e regras (em ordem) cujas condições necessárias foram atendidas."""
+    termo, ancoradas = _literais_presentes(texto_lower)
+    maior, total = _perfil_digitos(texto)
+    return termo, _filtrar_regras(ancoradas, maior, total, DOBRAS_ESPECIAIS.search(texto) is not None)
+
+
+def _decidir(texto: str, termo: Optional[int], candidatas: List[int]) -> Tuple[str, str, List[str]]:
+    # 1) Bloqueio por termos explícitos
+    if termo is not None:
+        return "BLOQUEAR", MENSAGEM_BLOQUEAR, [f"TERMO:{TERMOS_BLOQUEAR[termo]}"]
+
+    gatilhos = []
+    for i in candidatas:
+        rotulo, padrao, _, _ = REGRAS[i]
+        if not padrao.search(texto):
+            continue
+        # 2) Padrões de ataque / ilegalidade
+        if i < FIM_BLOQUEAR:
+            return "BLOQUEAR", MENSAGEM_BLOQUEAR, [rotulo]
+        # 3) Profanidade pesada → Aviso
+        if i < FIM_PROFANIDADE:
+            return "AVISAR", MENSAGEM_AVISAR, [rotulo]
+        # 4) Dados sensíveis → Sanitização
+        gatilhos.append(rotulo)
+
+    if gatilhos:
+        return "SANITIZAR", MENSAGEM_SANITIZAR, gatilhos + ["SANITIZADO"]
+
+    # 5) Tudo ok → Permitir continuar
+    return "PERMITIR", "", gatilhos
+
+
 def verificar_guardrail(texto: str) -> Tuple[str, str, List[str]]:
     """
     Retorna (acao, mensagem, gatilhos)
@@ -60,39 +213,154 @@ def verificar_guardrail(texto: str) -> Tuple[str, str, List[str]]:
     mensagem: resposta sugerida ao usuário
     gatilhos: lista com padrões que dispararam (para auditoria)
     """
-    gatilhos = []
+    termo, candidatas = regras_candidatas(texto, texto.lower())
+    return _decidir(texto, termo, candidatas)
 
-    # 1) Bloqueio por termos explícitos
-    for termo in TERMOS_BLOQUEAR:
-        if termo.lower() in texto.lower():
-            gatilhos.append(f"TERMO:{termo}")
-            return "BLOQUEAR", "Não posso atender esse pedido. Posso ajudar com finanças ou agenda.", gatilhos
-
-    # 2) Bloqueio por padrões de ataque / ilegalidade
-    for padrao in PADROES_BLOQUEAR:
-        if padrao.search(texto):
-            gatilhos.append(f"PADRAO_BLOQUEAR:{padrao.pattern[:30]}...")
-            return "BLOQUEAR", "Não posso atender esse pedido. Posso ajudar com finanças ou agenda.", gatilhos
-
-    # 3) Profanidade pesada → Aviso
-    for termo in PROFANIDADE_PESADA:
-        if re.search(fr"(?i)\b{re.escape(termo)}\b", texto):
-            gatilhos.append(f"PROFANIDADE:{termo}")
-            return "AVISAR", "Vamos manter uma conversa respeitosa. Como posso ajudar com finanças ou agenda?", gatilhos
-
-    # 4) Dados sensíveis → Sanitização
-    encontrou_dado_sensivel = False
-    for padrao in PADROES_AVISO:
-        if padrao.search(texto):
-            gatilhos.append(f"PADRAO_AVISO:{padrao.pattern[:30]}...")
-            encontrou_dado_sensivel = True
-
-    if encontrou_dado_sensivel:
-        texto_sanitizado = texto
-        for padrao, substituicao in PADROES_SANITIZAR:
-            texto_sanitizado = padrao.sub(substituicao, texto_sanitizado)
-
-        return "SANITIZAR", "Detectei dados sensíveis. Omiti/mascarei informações para sua segurança. Deseja prosseguir?", gatilhos + ["SANITIZADO"]
 
-    # 5) Tudo ok → Permitir continuar
-    return "PERMITIR", "", gatilhos
+def sanitizar(texto: str) -> str:
+    """Mascara CPF, CNPJ, cartão, e-mail e telefone (PADROES_SANITIZAR, em ordem)."""
+    for padrao, substituicao in PADROES_SANITIZAR:
+        texto = padrao.sub(substituicao, texto)
+    return texto
+
+
+# ---------------------------------------------------------------------------
+# Lote
+# ---------------------------------------------------------------------------
+
+# Nenhuma regra atravessa o separador: "." para em "\n", "\s" para em "\x00" e
+# nenhum literal contém esses caracteres
+SEPARADOR_LOTE = "\n\x00"
+# Textos por tarefa quando o lote é dividido entre processos
+GUARDRAIL_FATIA = 2000
+
+
+def _inicios(partes: Sequence[str]) -> List[int]:
+    inicios = []
+    pos = 0
+    for p in partes:
+        inicios.append(pos)
+        pos += len(p) + len(SEPARADOR_LOTE)
+    return inicios
+
+
+def _candidatas_lote(textos: Sequence[str]) -> List[Tuple[Optional[int], List[int]]]:
+    """regras_candidatas para vários textos, com uma passada de Aho-Corasick sobre o lote concatenado."""
+    n = len(textos)
+    lowers = [t.lower() for t in textos]
+    # lower() pode mudar o tamanho do texto (ex.: "İ"), então cada junção tem seus offsets
+    inicios_lower = _inicios(lowers)
+    inicios = _inicios(textos)
+    junto_lower = SEPARADOR_LOTE.join(lowers)
+    junto = SEPARADOR_LOTE.join(textos)
+
+    termos = [None] * n
+    ancoradas = [set() for _ in range(n)]
+
+    def _marcar(fim: int, alvos):
+        k = bisect_right(inicios_lower, fim) - 1
+        for tipo, i in alvos:
+            if tipo == "R":
+                ancoradas[k].add(i)
+            elif termos[k] is None or i < termos[k]:
+                termos[k] = i
+
+    if _automato is not None:
+        for fim, alvos in _automato.iter(junto_lower):
+            _marcar(fim, alvos)
+    else:
+        for literal, alvos in LITERAIS.items():
+            pos = junto_lower.find(literal)
+            while pos >= 0:
+                _marcar(pos, alvos)
+                pos = junto_lower.find(literal, pos + 1)
+
+    especiais = {bisect_right(inicios, m.start()) - 1 for m in DOBRAS_ESPECIAIS.finditer(junto)}
+
+    # Dígitos por texto: o findall em C sai mais barato que mapear cada sequência de volta ao texto
+    return [
+        (termos[k], _filtrar_regras(ancoradas[k], *_perfil_digitos(textos[k]), k in especiais))
+        for k in range(n)
+    ]
+
+
+def _verificar_fatia(textos: Sequence[str]) -> List[Tuple[str, str, List[str]]]:
+    return [_decidir(t, termo, candidatas) for t, (termo, candidatas) in zip(textos, _candidatas_lote(textos))]
+
+
+def verificar_guardrail_batch(
+    textos: Sequence[str], workers: int = 1, fatia: int = GUARDRAIL_FATIA
+) -> List[Tuple[str, str, List[str]]]:
+    """
+    verificar_guardrail para muitos textos (ex.: reprocessar um histórico de mensagens),
+    mesmo resultado por posição. As varreduras de literais e dígitos rodam uma vez
+    sobre o lote inteiro; só as regex candidatas rodam por texto. Com `workers` > 1
+    e mais de `fatia` textos, as fatias vão para um pool de processos (regex segura
+    o GIL, então threads não ajudariam).
+    Equivalência com a versão item a item: tests/test_guardrail.py.
+    """
+    textos = list(textos)
+    if not textos:
+        return []
+    if workers <= 1 or len(textos) <= fatia:
+        return _verificar_fatia(textos)
+    fatias = [textos[i:i + fatia] for i in range(0, len(textos), fatia)]
+    resultado = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for parcial in pool.map(_verificar_fatia, fatias):
+            resultado.extend(parcial)
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Streaming
+# ---------------------------------------------------------------------------
+
+# Caracteres finais retidos a cada pedaço: um dado sensível maior que isso pode
+# sair parcialmente sem máscara
+GUARDRAIL_JANELA_STREAM = 64
+
+
+class MascaradorStream:
+    """
+    Mascara dados sensíveis (sanitizar) em texto que chega aos pedaços, como os
+    tokens de um LLM em streaming, sem esperar a resposta inteira.
+
+    Uso:
+        m = MascaradorStream()
+        for token in tokens:
+            yield m.feed(token)
+        yield m.flush()
+
+    Só os últimos `janela` caracteres ficam retidos; o corte nunca cai no meio de
+    um trecho que algum padrão de PADROES_SANITIZAR já reconhece.
+    """
+
+    def __init__(self, janela: int = GUARDRAIL_JANELA_STREAM):
+        self.janela = janela
+        self._pendente = ""
+
+    def _corte_seguro(self, corte: int) -> int:
+        trechos = [m.span() for padrao, _ in PADROES_SANITIZAR for m in padrao.finditer(self._pendente)]
+        mudou = True
+        while mudou:
+            mudou = False
+            for inicio, fim in trechos:
+                if inicio < corte < fim:
+                    corte = inicio
+                    mudou = True
+        return corte
+
+    def feed(self, trecho: str) -> str:
+        self._pendente += trecho
+        if len(self._pendente) <= self.janela:
+            return ""
+        corte = self._corte_seguro(len(self._pendente) - self.janela)
+        if corte <= 0:
+            return ""
+        saida, self._pendente = self._pendente[:corte], self._pendente[corte:]
+        return sanitizar(saida)
+
+    def flush(self) -> str:
+        saida, self._pendente = self._pendente, ""
+        return sanitizar(saida)
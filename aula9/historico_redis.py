@@ -0,0 +1,300 @@
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+import threading
+import json
+import time
+import os
+import redis
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", f"redis://localhost:{os.getenv('REDIS_CACHE_PORT', '6379')}/0")
+
+# Sessão expira após esse tempo sem uso (segundos); cada leitura/escrita renova
+HISTORY_TTL = int(os.getenv("HISTORY_TTL", str(7 * 24 * 3600)))
+# Mensagens mantidas por sessão (as mais antigas são descartadas)
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "100"))
+# Cache LRU em memória na frente do Redis: sessões quentes não vão à rede
+HISTORY_LRU_SIZE = int(os.getenv("HISTORY_LRU_SIZE", "1000"))
+# Validade das entradas do LRU; limita a defasagem quando outro processo escreve na mesma sessão
+HISTORY_LRU_TTL = float(os.getenv("HISTORY_LRU_TTL", "30"))
+
+KEY_PREFIX = "assessor:historico:"
+
+
+class HistoricoLRU:
+    """
+    LRU thread-safe de session_id -> lista de mensagens (+ um anexo opcional, ex.: o
+    resumo da sessão já decodificado), com validade por entrada. O anexo segue a
+    geração da lista: qualquer escrita o invalida junto.
+
+    Toda escrita dá uma geração nova à sessão. put() só aceita a lista se a geração
+    lida antes do LRANGE ainda for a atual e não houver escrita em andamento, então
+    uma leitura concorrente com um RPUSH nunca deixa no cache a lista de antes da
+    escrita. A própria escrita deixa a entrada quente com a lista lida no MULTI,
+    a menos que outra escrita da mesma sessão tenha se sobreposto a ela (aí a
+    entrada fica vazia e a próxima leitura vai ao Redis).
+    """
+
+    def __init__(self, capacidade: int = HISTORY_LRU_SIZE, ttl: float = HISTORY_LRU_TTL):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._dados = OrderedDict()   # session_id -> (mensagens ou None, instante, geração, anexo)
+        self._escritas = {}           # session_id -> escritas em andamento
+        self._lock = threading.Lock()
+        self._contador = 0            # gerações são globais e crescentes
+        self._piso = 0                # maior geração já removida do LRU
+        self.hits = 0
+        self.misses = 0
+
+    def _geracao_atual(self, session_id: str) -> int:
+        item = self._dados.get(session_id)
+        return item[2] if item is not None else self._piso
+
+    def _inserir(self, session_id: str, item: tuple):
+        self._dados[session_id] = item
+        self._dados.move_to_end(session_id)
+        while len(self._dados) > self.capacidade:
+            _, (_, _, geracao, _) = self._dados.popitem(last=False)
+            self._piso = max(self._piso, geracao)
+
+    def _guardar(self, session_id: str, mensagens, instante: float, anexo=None) -> int:
+        """Grava numa geração nova (qualquer put() com a geração anterior é recusado)."""
+        self._contador += 1
+        self._inserir(session_id, (mensagens, instante, self._contador, anexo))
+        return self._contador
+
+    def geracao(self, session_id: str) -> int:
+        """Leia antes de ir ao Redis e passe para put()/put_anexo()."""
+        with self._lock:
+            return self._geracao_atual(session_id)
+
+    def get(self, session_id: str, validade: Optional[float] = None) -> Optional[Tuple[List[BaseMessage], Any]]:
+        """(mensagens, anexo ou None) se a entrada tem menos de `validade` (ou self.ttl) segundos."""
+        validade = self.ttl if validade is None else min(self.ttl, validade)
+        with self._lock:
+            item = self._dados.get(session_id)
+            if item is None or item[0] is None or time.monotonic() - item[1] > validade:
+                self.misses += 1
+                return None
+            self._dados.move_to_end(session_id)
+            self.hits += 1
+            return list(item[0]), item[3]
+
+    def put(self, session_id: str, mensagens: List[BaseMessage], geracao: int, anexo=None):
+        if self.capacidade <= 0:
+            return
+        with self._lock:
+            if self._escritas.get(session_id) or self._geracao_atual(session_id) != geracao:
+                return    # houve (ou há) escrita depois da leitura: a lista pode estar velha
+            self._inserir(session_id, (list(mensagens), time.monotonic(), geracao, anexo))
+
+    def put_anexo(self, session_id: str, anexo, geracao: int):
+        """Completa uma entrada que tem a lista, mas não o anexo (ex.: depois de descartar_anexo)."""
+        if self.capacidade <= 0:
+            return
+        with self._lock:
+            item = self._dados.get(session_id)
+            if item is None or item[0] is None or self._escritas.get(session_id) or item[2] != geracao:
+                return
+            self._dados[session_id] = (item[0], item[1], geracao, anexo)
+
+    def iniciar_escrita(self, session_id: str) -> Tuple[int, bool]:
+        """Antes do MULTI: invalida a entrada. Devolve (geração, se é a única escrita da sessão)."""
+        if self.capacidade <= 0:
+            return 0, False
+        with self._lock:
+            self._escritas[session_id] = self._escritas.get(session_id, 0) + 1
+            return self._guardar(session_id, None, 0.0), self._escritas[session_id] == 1
+
+    def concluir_escrita(self, session_id: str, geracao: int, sozinha: bool, mensagens: Optional[List[BaseMessage]] = None, anexo=None):
+        """
+        Depois do MULTI, com a lista lida na transação (None se ela falhou). Sem outra
+        escrita sobreposta, a lista entra no cache numa geração nova; senão a entrada
+        fica vazia, porque não dá para saber qual das listas é a mais recente.
+        """
+        if self.capacidade <= 0:
+            return
+        with self._lock:
+            restantes = self._escritas.get(session_id, 1) - 1
+            if restantes:
+                self._escritas[session_id] = restantes
+            else:
+                self._escritas.pop(session_id, None)
+            if mensagens is not None and sozinha and self._geracao_atual(session_id) == geracao:
+                self._guardar(session_id, list(mensagens), time.monotonic(), anexo)
+            else:
+                self._guardar(session_id, None, 0.0)
+
+    def descartar_anexo(self, session_id: str):
+        """O anexo mudou sem escrita no histórico (ex.: resumo regravado): mantém só a lista."""
+        if self.capacidade <= 0:
+            return
+        with self._lock:
+            item = self._dados.get(session_id)
+            if item is not None:
+                self._guardar(session_id, item[0], item[1])
+
+    def invalidar(self, session_id: str):
+        if self.capacidade <= 0:
+            return
+        with self._lock:
+            self._guardar(session_id, None, 0.0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(1 for mensagens, _, _, _ in self._dados.values() if mensagens is not None)
+
+
+class RedisChatMessageHistory(BaseChatMessageHistory):
+    """
+    Histórico de uma sessão numa lista do Redis (uma mensagem JSON por item).
+    - TTL por sessão, renovado em toda escrita e em toda leitura que vai ao Redis
+    - no máximo `max_messages` mensagens (LTRIM)
+    - leitura e escrita em um único round trip (pipeline), com espaço para
+      comandos extras do chamador (ler/gravar)
+    - LRU em memória compartilhado entre as sessões do processo
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        client: "redis.Redis",
+        cache: Optional[HistoricoLRU] = None,
+        ttl: int = HISTORY_TTL,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+    ):
+        self.session_id = session_id
+        self.client = client
+        self.cache = cache
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.key = KEY_PREFIX + session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.ler()[0]
+
+    def ler(
+        self,
+        extras: Optional[Callable[["redis.client.Pipeline"], None]] = None,
+        anexo: Optional[Callable[[list], Any]] = None,
+    ) -> Tuple[List[BaseMessage], Any]:
+        """
+        Mensagens + resultados dos comandos que `extras(pipe)` adiciona ao pipeline
+        (ex.: HGETALL do resumo), num único round trip. Com a sessão no LRU, só os
+        extras vão ao Redis (sem extras, nada vai).
+
+        Com `anexo`, devolve anexo(resultados dos extras) no lugar dos resultados e
+        guarda esse valor no LRU junto com a lista: com os dois no cache, a leitura
+        não vai ao Redis.
+
+        O EXPIRE acompanha o LRANGE e toda escrita, e uma entrada do LRU só vale por
+        metade do TTL: um acerto sempre encontra a chave com pelo menos metade do
+        TTL pela frente, sem renovar a cada leitura.
+        """
+        cached = valor = None
+        if self.cache is not None:
+            geracao = self.cache.geracao(self.session_id)
+            cached = self.cache.get(self.session_id, validade=self.ttl / 2)
+        if cached is not None:
+            mensagens, valor = cached
+            if anexo is not None and valor is not None:
+                return mensagens, valor
+            if anexo is None and extras is None:
+                return mensagens, []
+
+        pipe = self.client.pipeline(transaction=False)
+        if cached is None:
+            pipe.lrange(self.key, 0, -1)
+            pipe.expire(self.key, self.ttl)
+        if extras is not None:
+            extras(pipe)
+        resultados = pipe.execute()
+        if cached is None:
+            mensagens = messages_from_dict([json.loads(i) for i in resultados[0]])
+            resultados = resultados[2:]
+        if anexo is None:
+            if cached is None and self.cache is not None:
+                self.cache.put(self.session_id, mensagens, geracao)
+            return mensagens, resultados
+
+        valor = anexo(resultados)
+        if self.cache is not None:
+            if cached is None:
+                self.cache.put(self.session_id, mensagens, geracao, valor)
+            else:
+                self.cache.put_anexo(self.session_id, valor, geracao)
+        return mensagens, valor
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            self.gravar(messages)
+
+    def gravar(
+        self,
+        messages: Sequence[BaseMessage],
+        extras: Optional[Callable[["redis.client.Pipeline"], None]] = None,
+        anexo: Optional[Callable[[list], Any]] = None,
+    ) -> Tuple[List[BaseMessage], Any]:
+        """
+        Como add_messages, mas devolve a lista completa lida na mesma transação
+        (MULTI) da escrita + os resultados de `extras(pipe)` (ou anexo(resultados),
+        como em ler). A lista lida, e o anexo, também vão para o LRU, então a leitura
+        seguinte (próxima chain ou próximo turno) não precisa ir ao Redis.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(self.key, *[json.dumps(message_to_dict(m), ensure_ascii=False) for m in messages])
+        pipe.ltrim(self.key, -self.max_messages, -1)
+        pipe.expire(self.key, self.ttl)
+        if extras is not None:
+            extras(pipe)
+        pipe.lrange(self.key, 0, -1)
+
+        if self.cache is not None:
+            # Antes do MULTI: leituras em andamento não gravam mais a lista antiga no LRU
+            geracao, sozinha = self.cache.iniciar_escrita(self.session_id)
+        mensagens = valor = None
+        try:
+            resultados = pipe.execute()
+            mensagens = messages_from_dict([json.loads(i) for i in resultados[-1]])
+            resultados = resultados[3:-1]
+            if anexo is not None:
+                valor = anexo(resultados)
+        finally:
+            if self.cache is not None:
+                self.cache.concluir_escrita(self.session_id, geracao, sozinha, mensagens, valor)
+        return mensagens, (valor if anexo is not None else resultados)
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+        if self.cache is not None:
+            self.cache.invalidar(self.session_id)
+
+
+_client = None
+_cache = HistoricoLRU()
+
+
+def get_redis() -> "redis.Redis":
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def get_session_history(session_id: str) -> RedisChatMessageHistory:
+    """Fábrica para RunnableWithMessageHistory."""
+    return RedisChatMessageHistory(session_id, client=get_redis(), cache=_cache)
+
+
+def get_history_cache() -> HistoricoLRU:
+    """LRU compartilhado pelas sessões do processo (o de get_session_history)."""
+    return _cache
+
+
+def history_cache_metrics() -> dict:
+    return {"hits": _cache.hits, "misses": _cache.misses, "sessions": len(_cache)}
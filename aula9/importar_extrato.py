@@ -0,0 +1,383 @@
+"""
+Importa extratos bancários (CSV ou OFX) direto para `transactions`, sem passar pelo LLM.
+
+Uso:
+    python importar_extrato.py extrato.csv
+    python importar_extrato.py extrato.ofx --lote 10000
+    python importar_extrato.py extrato.csv --mascarar-pii
+    python importar_extrato.py extrato.csv --delimitador ";" --col-data "Data Lançamento" --col-valor "Valor (R$)"
+
+Pipeline em geradores (ler -> mapear -> lotes), então a memória fica limitada ao tamanho
+do lote mesmo para arquivos com milhões de linhas. Cada lote vai por COPY para uma tabela
+temporária e é inserido em `transactions` com o hash de (occurred_at, amount, source_text)
+em import_hash; o índice único da migração 005 + ON CONFLICT DO NOTHING descarta as linhas
+já importadas, inclusive por outra importação rodando ao mesmo tempo.
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional
+from zoneinfo import ZoneInfo
+from pg_pool import get_pool
+from guardrail import sanitizar
+import argparse
+import unicodedata
+import hashlib
+import csv
+import io
+import re
+import sys
+import time
+
+FUSO_LOCAL = ZoneInfo("America/Sao_Paulo")
+
+# Nomes de coluna aceitos por padrão (comparados sem acento/caixa)
+COLUNAS_DATA = ["data", "date", "data lancamento", "data da transacao", "dt"]
+COLUNAS_VALOR = ["valor", "amount", "valor (r$)", "quantia"]
+COLUNAS_DESCRICAO = ["descricao", "description", "historico", "memo", "lancamento", "estabelecimento"]
+COLUNAS_PAGAMENTO = ["forma de pagamento", "payment_method", "meio"]
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+def _sem_acento(texto: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFD", texto.strip().lower())
+        if unicodedata.category(c) != "Mn"
+    )
+
+
+def ler_csv(caminho: str, delimitador: Optional[str] = None, encoding: str = "utf-8-sig") -> Iterator[Dict[str, str]]:
+    """Gera uma linha por vez como dict {coluna: valor}."""
+    with open(caminho, newline="", encoding=encoding) as f:
+        if delimitador is None:
+            amostra = f.read(4096)
+            f.seek(0)
+            delimitador = ";" if amostra.count(";") > amostra.count(",") else ","
+        for linha in csv.DictReader(f, delimiter=delimitador):
+            yield linha
+
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def ler_ofx(caminho: str, encoding: str = "latin-1", bloco: int = 64 * 1024) -> Iterator[Dict[str, str]]:
+    """
+    Gera um dict por <STMTTRN> lendo o arquivo em blocos.
+    Aceita OFX 1.x (SGML, sem tags de fechamento) e 2.x (XML).
+    """
+    atual = None
+    resto = ""
+    with open(caminho, encoding=encoding, errors="replace") as f:
+        while True:
+            dados = f.read(bloco)
+            texto = resto + dados
+            if dados:
+                # Só processa até o último '<' para não cortar uma tag no meio
+                corte = texto.rfind("<")
+                if corte <= 0:
+                    resto = texto
+                    continue
+                texto, resto = texto[:corte], texto[corte:]
+            else:
+                resto = ""
+
+            for fechamento, tag, valor in OFX_TAG.findall(texto):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if fechamento:
+                        if atual is not None:
+                            yield atual
+                        atual = None
+                    else:
+                        atual = {}
+                elif atual is not None and not fechamento:
+                    atual[tag] = valor.strip()
+
+            if not dados:
+                break
+
+
+# ---------------------------------------------------------------------------
+# Mapeamento para o schema de `transactions`
+# ---------------------------------------------------------------------------
+
+VALOR_PATTERN = re.compile(r"[+-]?\d+(?:[.,]\d+)*")
+
+
+def _grupos_milhar(grupos: List[str]) -> bool:
+    return 1 <= len(grupos[0]) <= 3 and all(len(g) == 3 for g in grupos[1:])
+
+
+def parse_valor(texto: str) -> Decimal:
+    """
+    Aceita '1.234,56', '1,234.56', '-45.00', 'R$ 10,00', '(12,30)', '1.234.567'.
+    O último separador ('.' ou ',') é o decimal e o outro só pode agrupar milhares.
+    Um único separador seguido de exatamente 3 dígitos ('1.234', '1,234') é ambíguo
+    e gera ValueError, assim como agrupamentos inválidos ('1.23,45').
+    """
+    t = texto.strip().replace("R$", "").replace(" ", "").replace("\xa0", "")
+    negativo = t.startswith("(") and t.endswith(")")
+    t = t.strip("()")
+    if not VALOR_PATTERN.fullmatch(t):
+        raise ValueError(f"Valor inválido: {texto!r}")
+    sinal = t[0] if t[0] in "+-" else ""
+    t = t.lstrip("+-")
+
+    grupos = re.split(r"[.,]", t)
+    separadores = re.findall(r"[.,]", t)
+    if not separadores:
+        numero = t
+    elif len(set(separadores)) == 1 and len(separadores) > 1:
+        # '1.234.567' / '1,234,567': só milhares
+        if not _grupos_milhar(grupos):
+            raise ValueError(f"Valor inválido: {texto!r}")
+        numero = "".join(grupos)
+    elif len(separadores) == 1:
+        if len(grupos[1]) == 3:
+            raise ValueError(f"Valor ambíguo (milhar ou decimal?): {texto!r}")
+        numero = f"{grupos[0]}.{grupos[1]}"
+    else:
+        # Dois tipos de separador: o decimal aparece uma vez só, no fim
+        if separadores.count(separadores[-1]) > 1 or not _grupos_milhar(grupos[:-1]):
+            raise ValueError(f"Valor inválido: {texto!r}")
+        numero = "".join(grupos[:-1]) + "." + grupos[-1]
+
+    valor = Decimal(sinal + numero)
+    return -valor if negativo else valor
+
+
+def parse_data(texto: str) -> datetime:
+    t = texto.strip()
+    for formato in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(t, formato).replace(tzinfo=FUSO_LOCAL)
+        except ValueError:
+            pass
+    dt = datetime.fromisoformat(t)
+    return dt if dt.tzinfo else dt.replace(tzinfo=FUSO_LOCAL)
+
+
+def parse_data_ofx(texto: str) -> datetime:
+    """DTPOSTED no formato YYYYMMDD[HHMMSS[.XXX]][[-3:BRT]]."""
+    m = re.match(r"(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?", texto.strip())
+    if not m:
+        raise ValueError(f"DTPOSTED inválido: {texto!r}")
+    dt = datetime.strptime(m.group(1) + (m.group(2) or "000000"), "%Y%m%d%H%M%S")
+    if m.group(3):
+        return dt.replace(tzinfo=timezone(timedelta(hours=float(m.group(3)))))
+    return dt.replace(tzinfo=FUSO_LOCAL)
+
+
+def _achar_coluna(colunas: Iterable[str], candidatos: List[str], forcada: Optional[str]) -> Optional[str]:
+    if forcada:
+        return forcada
+    por_nome = {_sem_acento(c): c for c in colunas}
+    for candidato in candidatos:
+        if candidato in por_nome:
+            return por_nome[candidato]
+    return None
+
+
+def _linha_transacao(occurred_at: datetime, valor: Decimal, texto: str, payment_method: Optional[str]) -> dict:
+    return {
+        "occurred_at": occurred_at,
+        "amount": abs(valor).quantize(Decimal("0.01")),
+        "type_name": "INCOME" if valor > 0 else "EXPENSES",
+        "description": texto or None,
+        "payment_method": payment_method or None,
+        "source_text": texto or "importado",
+    }
+
+
+def mapear_csv(linhas: Iterator[Dict[str, str]], col_data=None, col_valor=None, col_descricao=None, col_pagamento=None) -> Iterator[dict]:
+    colunas = None
+    for linha in linhas:
+        if colunas is None:
+            nomes = list(linha.keys())
+            colunas = (
+                _achar_coluna(nomes, COLUNAS_DATA, col_data),
+                _achar_coluna(nomes, COLUNAS_VALOR, col_valor),
+                _achar_coluna(nomes, COLUNAS_DESCRICAO, col_descricao),
+                _achar_coluna(nomes, COLUNAS_PAGAMENTO, col_pagamento),
+            )
+            if not colunas[0] or not colunas[1]:
+                raise ValueError(f"Não encontrei colunas de data/valor em {nomes}; use --col-data/--col-valor.")
+        c_data, c_valor, c_desc, c_pag = colunas
+        try:
+            yield _linha_transacao(
+                parse_data(linha[c_data]),
+                parse_valor(linha[c_valor]),
+                (linha.get(c_desc) or "").strip() if c_desc else "",
+                (linha.get(c_pag) or "").strip() if c_pag else None,
+            )
+        except (ValueError, InvalidOperation, KeyError, TypeError):
+            yield None
+
+
+def mapear_ofx(registros: Iterator[Dict[str, str]]) -> Iterator[dict]:
+    for r in registros:
+        try:
+            texto = " ".join(p for p in (r.get("NAME"), r.get("MEMO")) if p)
+            yield _linha_transacao(
+                parse_data_ofx(r["DTPOSTED"]),
+                parse_valor(r["TRNAMT"]),
+                texto,
+                r.get("TRNTYPE"),
+            )
+        except (ValueError, InvalidOperation, KeyError):
+            yield None
+
+
+def chave_dedupe(linha: dict) -> str:
+    """Hash de (occurred_at, amount, source_text); vai para transactions.import_hash."""
+    bruto = f"{linha['occurred_at'].isoformat()}|{linha['amount']}|{linha['source_text']}"
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def em_lotes(linhas: Iterator[Optional[dict]], tamanho: int, stats: dict) -> Iterator[List[dict]]:
+    """Agrupa em lotes, descartando inválidas e duplicadas dentro do mesmo lote."""
+    lote = {}
+    for linha in linhas:
+        stats["lidas"] += 1
+        if linha is None:
+            stats["invalidas"] += 1
+            continue
+        chave = chave_dedupe(linha)
+        if chave in lote:
+            stats["duplicadas"] += 1
+            continue
+        linha["import_hash"] = chave
+        lote[chave] = linha
+        if len(lote) >= tamanho:
+            yield list(lote.values())
+            lote = {}
+    if lote:
+        yield list(lote.values())
+
+
+# ---------------------------------------------------------------------------
+# Escrita
+# ---------------------------------------------------------------------------
+
+SQL_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS import_staging (
+      occurred_at    TIMESTAMPTZ NOT NULL,
+      amount         NUMERIC(14,2) NOT NULL,
+      type_name      TEXT NOT NULL,
+      description    TEXT,
+      payment_method VARCHAR(32),
+      source_text    TEXT NOT NULL,
+      import_hash    CHAR(64) NOT NULL
+    ) ON COMMIT DELETE ROWS;
+"""
+
+SQL_COPY_STAGING = """
+    COPY import_staging (occurred_at, amount, type_name, description, payment_method, source_text, import_hash)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+SQL_MERGE_STAGING = """
+    INSERT INTO transactions
+        (amount, type, category_id, description, payment_method, occurred_at, source_text, import_hash)
+    SELECT s.amount, tt.id, NULL, s.description, s.payment_method, s.occurred_at, s.source_text, s.import_hash
+    FROM import_staging s
+    JOIN transaction_types tt ON UPPER(tt.type) = s.type_name
+    ON CONFLICT (import_hash, occurred_at) DO NOTHING;
+"""
+
+
+def _lote_csv(lote: List[dict]) -> io.StringIO:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    for l in lote:
+        w.writerow([
+            l["occurred_at"].isoformat(), l["amount"], l["type_name"],
+            l["description"], (l["payment_method"] or "")[:32] or None, l["source_text"],
+            l["import_hash"],
+        ])
+    buf.seek(0)
+    return buf
+
+
+def mascarar_lote(lote: List[dict], stats: dict):
+    """
+    Mascara dados sensíveis (CPF, cartão, e-mail...) nas descrições.
+    Roda sanitizar em toda linha: o veredito do guardrail não serve de filtro, porque
+    memos com ";" ou "--" saem como BLOQUEAR e o CPF passaria sem máscara.
+    """
+    for linha in lote:
+        mascarado = sanitizar(linha["source_text"])
+        descricao = sanitizar(linha["description"]) if linha["description"] else linha["description"]
+        if mascarado != linha["source_text"] or descricao != linha["description"]:
+            stats["mascaradas"] += 1
+        linha["source_text"] = mascarado
+        linha["description"] = descricao
+
+
+def importar(linhas: Iterator[Optional[dict]], tamanho_lote: int = 5000, relatorio=print, mascarar_pii: bool = False) -> dict:
+    stats = {"lidas": 0, "invalidas": 0, "duplicadas": 0, "inseridas": 0, "mascaradas": 0}
+    inicio = time.monotonic()
+
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_STAGING)
+            conn.commit()
+            for lote in em_lotes(linhas, tamanho_lote, stats):
+                if mascarar_pii:
+                    mascarar_lote(lote, stats)
+                cur.copy_expert(SQL_COPY_STAGING, _lote_csv(lote))
+                cur.execute(SQL_MERGE_STAGING)
+                inseridas = cur.rowcount
+                conn.commit()
+
+                stats["inseridas"] += inseridas
+                stats["duplicadas"] += len(lote) - inseridas
+                decorrido = time.monotonic() - inicio
+                relatorio(
+                    f"{stats['lidas']} lidas | {stats['inseridas']} inseridas | "
+                    f"{stats['duplicadas']} duplicadas | {stats['invalidas']} inválidas | "
+                    f"{stats['lidas'] / decorrido:,.0f} linhas/s"
+                )
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    stats["segundos"] = round(time.monotonic() - inicio, 3)
+    stats["linhas_por_segundo"] = round(stats["lidas"] / stats["segundos"], 1) if stats["segundos"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa extrato CSV/OFX para transactions.")
+    parser.add_argument("arquivo")
+    parser.add_argument("--formato", choices=["csv", "ofx"], help="Padrão: pela extensão do arquivo.")
+    parser.add_argument("--lote", type=int, default=5000, help="Linhas por COPY (padrão 5000).")
+    parser.add_argument("--delimitador")
+    parser.add_argument("--encoding")
+    parser.add_argument("--col-data")
+    parser.add_argument("--col-valor")
+    parser.add_argument("--col-descricao")
+    parser.add_argument("--col-pagamento")
+    parser.add_argument("--mascarar-pii", action="store_true", help="Mascara CPF/cartão/e-mail/telefone nas descrições.")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ("ofx" if args.arquivo.lower().endswith((".ofx", ".qfx")) else "csv")
+    if formato == "ofx":
+        linhas = mapear_ofx(ler_ofx(args.arquivo, encoding=args.encoding or "latin-1"))
+    else:
+        linhas = mapear_csv(
+            ler_csv(args.arquivo, args.delimitador, encoding=args.encoding or "utf-8-sig"),
+            args.col_data, args.col_valor, args.col_descricao, args.col_pagamento,
+        )
+
+    stats = importar(linhas, args.lote, relatorio=lambda m: print(m, file=sys.stderr), mascarar_pii=args.mascarar_pii)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Instrumentação do grafo: latência por nó, tokens e latência por chamada de LLM e
+duração de cada tool (o SQL das tools do pg_tools), com rótulos de nó, rota e tool.
+
+- `medir_no("roteador")`: decorator dos nós do LangGraph; abre o span do nó e
+  deixa nó/sessão/rota num contextvar para o que roda dentro dele.
+- `CallbackMetricas`: callback do LangChain (passe em config["callbacks"] do app);
+  mede chamadas de LLM (tokens de usage_metadata) e tools.
+- Exportadores locais: endpoint Prometheus em texto (`iniciar_exportador`, porta
+  METRICS_PORT) e spans em JSON lines no formato de span do OpenTelemetry
+  (TRACES_PATH; vazio desliga).
+
+As métricas não levam session_id por padrão (uma série por sessão explode a
+cardinalidade do Prometheus); os spans sempre levam. METRICS_LABEL_SESSION=1 inclui
+a sessão também nas métricas.
+"""
+from langchain_core.callbacks import BaseCallbackHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+from functools import wraps
+from dotenv import load_dotenv
+import threading
+import secrets
+import hashlib
+import bisect
+import json
+import time
+import os
+
+load_dotenv()
+
+METRICS_PORT = int(os.getenv("METRICS_PORT") or "0")
+METRICS_LABEL_SESSION = os.getenv("METRICS_LABEL_SESSION", "0") == "1"
+TRACES_PATH = os.getenv("TRACES_PATH", "")
+
+# Limites dos buckets dos histogramas (segundos)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SEM_NO = "-"
+
+# (nó, session_id, rota, span_id) do nó em execução
+_contexto: ContextVar[Optional[Tuple[str, str, str, str]]] = ContextVar("instrumentacao_contexto", default=None)
+
+
+class Metricas:
+    """Contadores, histogramas e gauges em memória, exportados no formato texto do Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._contadores = {}    # nome -> {labels: valor}
+        self._histogramas = {}   # nome -> {labels: [contagens por bucket..., soma, total]}
+        self._ajuda = {}
+        self._coletores = []     # (prefixo, função que devolve dict de números)
+
+    def descrever(self, nome: str, ajuda: str):
+        self._ajuda[nome] = ajuda
+
+    def incrementar(self, nome: str, valor: float = 1.0, **labels: str):
+        chave = tuple(sorted(labels.items()))
+        with self._lock:
+            serie = self._contadores.setdefault(nome, {})
+            serie[chave] = serie.get(chave, 0.0) + valor
+
+    def observar(self, nome: str, valor: float, **labels: str):
+        chave = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._histogramas.setdefault(nome, {})
+            dados = serie.get(chave)
+            if dados is None:
+                dados = serie[chave] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                dados[i] += 1
+            dados[-2] += valor
+            dados[-1] += 1
+
+    def registrar_coletor(self, prefixo: str, coletor: Callable[[], Dict[str, Any]]):
+        """Gauges lidos na hora da exportação (ex.: cache_faq.metrics, pool_metrics)."""
+        self._coletores.append((prefixo, coletor))
+
+    def exportar_texto(self) -> str:
+        linhas = []
+        with self._lock:
+            contadores = {n: dict(s) for n, s in self._contadores.items()}
+            histogramas = {n: {k: list(v) for k, v in s.items()} for n, s in self._histogramas.items()}
+
+        for nome, serie in sorted(contadores.items()):
+            linhas += self._cabecalho(nome, "counter")
+            linhas += [f"{nome}{_labels(k)} {v:g}" for k, v in serie.items()]
+
+        for nome, serie in sorted(histogramas.items()):
+            linhas += self._cabecalho(nome, "histogram")
+            for chave, dados in serie.items():
+                acumulado = 0
+                for limite, n in zip(self.buckets, dados):
+                    acumulado += n
+                    linhas.append(f"{nome}_bucket{_labels(chave + (('le', f'{limite:g}'),))} {acumulado}")
+                linhas.append(f"{nome}_bucket{_labels(chave + (('le', '+Inf'),))} {dados[-1]}")
+                linhas.append(f"{nome}_sum{_labels(chave)} {dados[-2]:g}")
+                linhas.append(f"{nome}_count{_labels(chave)} {dados[-1]}")
+
+        for prefixo, coletor in self._coletores:
+            try:
+                valores = coletor()
+            except Exception:
+                continue
+            for chave, valor in sorted(valores.items()):
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    linhas += [f"# TYPE {prefixo}_{chave} gauge", f"{prefixo}_{chave} {valor:g}"]
+        return "\n".join(linhas) + "\n"
+
+    def _cabecalho(self, nome: str, tipo: str):
+        ajuda = [f"# HELP {nome} {self._ajuda[nome]}"] if nome in self._ajuda else []
+        return ajuda + [f"# TYPE {nome} {tipo}"]
+
+    def limpar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(chave: Tuple[Tuple[str, str], ...]) -> str:
+    if not chave:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in chave) + "}"
+
+
+METRICAS = Metricas()
+METRICAS.descrever("assessor_node_seconds", "Duração de cada nó do grafo.")
+METRICAS.descrever("assessor_llm_seconds", "Duração de cada chamada de LLM.")
+METRICAS.descrever("assessor_llm_tokens_total", "Tokens de prompt e de completion por nó.")
+METRICAS.descrever("assessor_tool_seconds", "Duração de cada tool (consultas/escritas no Postgres).")
+METRICAS.descrever("assessor_erros_total", "Exceções por nó, LLM e tool.")
+
+
+class ExportadorSpans:
+    """Spans em JSON lines (campos do modelo de span do OpenTelemetry: traceId, spanId, parentSpanId...)."""
+
+    def __init__(self, caminho: str = TRACES_PATH):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def exportar(self, nome: str, span_id: str, pai: Optional[str], inicio: float, fim: float, atributos: dict, erro: Optional[str] = None):
+        if not self.caminho:
+            return
+        span = {
+            # Um trace por sessão: todos os turnos de uma conversa ficam agrupados
+            "traceId": hashlib.sha256(str(atributos.get("session_id", "")).encode()).hexdigest()[:32],
+            "spanId": span_id,
+            "parentSpanId": pai,
+            "name": nome,
+            "startTimeUnixNano": int(inicio * 1e9),
+            "endTimeUnixNano": int(fim * 1e9),
+            "attributes": atributos,
+            "status": {"code": "ERROR", "message": erro} if erro else {"code": "OK"},
+        }
+        linha = json.dumps(span, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(linha + "\n")
+
+
+SPANS = ExportadorSpans()
+
+
+def _rotulos(no: str, session_id: str, rota: str, **extra: str) -> Dict[str, str]:
+    rotulos = {"node": no, "route": rota or SEM_NO, **extra}
+    if METRICS_LABEL_SESSION:
+        rotulos["session"] = session_id or SEM_NO
+    return rotulos
+
+
+def medir_no(nome: str):
+    """Decorator de nó: histograma assessor_node_seconds{node, route} + span com a sessão."""
+    def decorar(func: Callable[[dict], dict]) -> Callable[[dict], dict]:
+        @wraps(func)
+        def no(state: dict) -> dict:
+            session_id = state.get("session_id", "")
+            rota = state.get("rota", "")
+            span_id = secrets.token_hex(8)
+            token = _contexto.set((nome, session_id, rota, span_id))
+            inicio, t0 = time.time(), time.perf_counter()
+            erro = None
+            saida = {}
+            try:
+                saida = func(state)
+                return saida
+            except Exception as e:
+                erro = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                _contexto.reset(token)
+                duracao = time.perf_counter() - t0
+                # O roteador só descobre a rota na saída
+                if isinstance(saida, dict):
+                    rota = saida.get("rota", rota)
+                METRICAS.observar("assessor_node_seconds", duracao, **_rotulos(nome, session_id, rota))
+                if erro:
+                    METRICAS.incrementar("assessor_erros_total", **_rotulos(nome, session_id, rota, kind="node"))
+                SPANS.exportar(
+                    f"node:{nome}", span_id, None, inicio, inicio + duracao,
+                    {"session_id": session_id, "route": rota, "node": nome}, erro,
+                )
+        return no
+    return decorar
+
+
+class CallbackMetricas(BaseCallbackHandler):
+    """Tokens e latência de cada LLM e duração de cada tool, atribuídos ao nó em execução."""
+
+    def __init__(self):
+        self._inicios = {}   # run_id -> (início epoch, perf_counter, nome, contexto)
+        self._lock = threading.Lock()
+
+    def _abrir(self, run_id, nome: str):
+        with self._lock:
+            self._inicios[run_id] = (time.time(), time.perf_counter(), nome, _contexto.get())
+
+    def _fechar(self, run_id):
+        with self._lock:
+            return self._inicios.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._abrir(run_id, (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name") or "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._abrir(run_id, (serialized or {}).get("name") or "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        aberto = self._fechar(run_id)
+        if aberto is None:
+            return
+        inicio, t0, modelo, contexto = aberto
+        no, session_id, rota, pai = contexto or (SEM_NO, "", "", None)
+        duracao = time.perf_counter() - t0
+        rotulos = _rotulos(no, session_id, rota)
+
+        uso = {}
+        for geracoes in response.generations:
+            for g in geracoes:
+                mensagem = getattr(g, "message", None)
+                for k, v in (getattr(mensagem, "usage_metadata", None) or {}).items():
+                    if isinstance(v, int):
+                        uso[k] = uso.get(k, 0) + v
+        METRICAS.observar("assessor_llm_seconds", duracao, **rotulos)
+        METRICAS.incrementar("assessor_llm_tokens_total", uso.get("input_tokens", 0), **rotulos, kind="prompt")
+        METRICAS.incrementar("assessor_llm_tokens_total", uso.get("output_tokens", 0), **rotulos, kind="completion")
+        SPANS.exportar(
+            f"llm:{modelo}", secrets.token_hex(8), pai, inicio, inicio + duracao,
+            {"session_id": session_id, "route": rota, "node": no, "model": modelo,
+             "prompt_tokens": uso.get("input_tokens", 0), "completion_tokens": uso.get("output_tokens", 0)},
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        aberto = self._fechar(run_id)
+        if aberto is None:
+            return
+        no, session_id, rota, _ = aberto[3] or (SEM_NO, "", "", None)
+        METRICAS.incrementar("assessor_erros_total", **_rotulos(no, session_id, rota, kind="llm"))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._abrir(run_id, (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def _fim_tool(self, run_id, erro: Optional[str] = None):
+        aberto = self._fechar(run_id)
+        if aberto is None:
+            return
+        inicio, t0, tool, contexto = aberto
+        no, session_id, rota, pai = contexto or (SEM_NO, "", "", None)
+        duracao = time.perf_counter() - t0
+        rotulos = _rotulos(no, session_id, rota, tool=tool)
+        METRICAS.observar("assessor_tool_seconds", duracao, **rotulos)
+        if erro:
+            METRICAS.incrementar("assessor_erros_total", **rotulos, kind="tool")
+        SPANS.exportar(
+            f"tool:{tool}", secrets.token_hex(8), pai, inicio, inicio + duracao,
+            {"session_id": session_id, "route": rota, "node": no, "tool": tool}, erro,
+        )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._fim_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._fim_tool(run_id, f"{type(error).__name__}: {error}")
+
+
+CALLBACK = CallbackMetricas()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = METRICAS.exportar_texto().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_exportador(porta: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics numa thread daemon; porta 0 (padrão sem METRICS_PORT) não inicia nada."""
+    if not porta:
+        return None
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    threading.Thread(target=servidor.serve_forever, name="metrics", daemon=True).start()
+    return servidor
@@ -0,0 +1,240 @@
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+from historico_redis import HistoricoLRU, RedisChatMessageHistory, get_history_cache, get_redis
+from dotenv import load_dotenv
+import threading
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Janela enviada ao modelo: últimas N trocas (humano + IA), limitadas por orçamento de tokens
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Tamanho alvo do resumo das mensagens que saíram da janela
+HISTORY_SUMMARY_WORDS = int(os.getenv("HISTORY_SUMMARY_WORDS", "120"))
+
+SUMMARY_PREFIX = "resumo:"
+RESUMO_KEY_PREFIX = "assessor:resumo:"
+
+prompt_resumo = ChatPromptTemplate.from_messages([
+    ("system",
+     """
+     Você mantém o resumo de uma conversa entre o usuário e o assistente J.A.R.V.I.S.
+     Atualize o RESUMO ATUAL incorporando as NOVAS MENSAGENS.
+     - Preserve fatos úteis para continuar a conversa: valores, datas, ids, categorias, compromissos e preferências.
+     - Descarte saudações e repetições.
+     - No máximo {max_palavras} palavras, em português, texto corrido.
+     - Responda apenas com o resumo atualizado.
+     """),
+    ("human", "RESUMO ATUAL:\n{resumo}\n\nNOVAS MENSAGENS:\n{mensagens}"),
+])
+
+
+def estimar_tokens(texto: str) -> int:
+    # Aproximação local (~4 caracteres por token) para não chamar a API a cada turno
+    return len(texto) // 4 + 1
+
+
+def _tokens(m: BaseMessage) -> int:
+    return estimar_tokens(m.content if isinstance(m.content, str) else str(m.content))
+
+
+def recortar_janela(
+    mensagens: List[BaseMessage], max_turnos: int = HISTORY_WINDOW_TURNS, orcamento: int = HISTORY_TOKEN_BUDGET
+) -> int:
+    """
+    Índice da primeira mensagem mantida literalmente: as mais recentes que cabem em
+    `max_turnos` mensagens humanas e em `orcamento` tokens, começando sempre num turno do usuário.
+    """
+    inicio = len(mensagens)
+    usados = 0
+    turnos = 0
+    for i in range(len(mensagens) - 1, -1, -1):
+        custo = _tokens(mensagens[i])
+        if usados + custo > orcamento:
+            break
+        usados += custo
+        if isinstance(mensagens[i], HumanMessage):
+            turnos += 1
+            inicio = i
+            if turnos >= max_turnos:
+                break
+    return inicio
+
+
+class ResumoStore:
+    """
+    Resumo incremental por sessão (hash no Redis):
+      texto     - resumo das mensagens já dobradas
+      resumidas - quantas mensagens (contagem absoluta) o resumo cobre
+      total     - quantas mensagens a sessão já recebeu
+    A contagem absoluta continua válida quando a lista de histórico é aparada (LTRIM).
+
+    O resumo decodificado vai para o LRU do histórico como anexo da lista (mesma
+    geração); gravar() o descarta de lá, já que o Resumidor escreve fora das
+    escritas do histórico.
+    """
+
+    def __init__(self, client=None, cache: Optional[HistoricoLRU] = None):
+        self.client = client
+        self.cache = cache
+
+    def _key(self, session_id: str) -> str:
+        return RESUMO_KEY_PREFIX + session_id
+
+    @staticmethod
+    def decodificar(dados: dict) -> dict:
+        """Resultado do HGETALL -> {texto, resumidas, total}."""
+        dados = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v for k, v in dados.items()}
+        return {
+            "texto": dados.get("texto", ""),
+            "resumidas": int(dados.get("resumidas", 0)),
+            "total": int(dados.get("total", 0)),
+        }
+
+    def ler(self, session_id: str) -> dict:
+        return self.decodificar((self.client or get_redis()).hgetall(self._key(session_id)))
+
+    def ler_no(self, pipe, session_id: str):
+        """Adiciona a leitura a um pipeline de outra operação (resultado: decodificar)."""
+        pipe.hgetall(self._key(session_id))
+
+    def renovar_no(self, pipe, session_id: str, ttl: int):
+        """EXPIRE do resumo junto com o do histórico."""
+        pipe.expire(self._key(session_id), ttl)
+
+    def contar_no(self, pipe, session_id: str, n: int, ttl: int):
+        pipe.hincrby(self._key(session_id), "total", n)
+        pipe.expire(self._key(session_id), ttl)
+
+    def contar(self, session_id: str, n: int, ttl: int):
+        pipe = (self.client or get_redis()).pipeline(transaction=False)
+        self.contar_no(pipe, session_id, n, ttl)
+        pipe.execute()
+
+    def gravar(self, session_id: str, texto: str, resumidas: int):
+        (self.client or get_redis()).hset(self._key(session_id), mapping={"texto": texto, "resumidas": resumidas})
+        (self.cache if self.cache is not None else get_history_cache()).descartar_anexo(session_id)
+
+    def limpar(self, session_id: str):
+        (self.client or get_redis()).delete(self._key(session_id))
+
+
+class Resumidor:
+    """Dobra no resumo, em segundo plano, as mensagens que saíram da janela (uma tarefa por sessão)."""
+
+    def __init__(self, llm, store: ResumoStore, max_workers: int = 2):
+        self.chain = prompt_resumo | llm | StrOutputParser()
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resumo")
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+
+    def agendar(self, session_id: str, mensagens: List[BaseMessage], estado: dict):
+        """`mensagens` e `estado` (ResumoStore.ler) são um retrato lido pelo chamador junto com a escrita."""
+        with self._lock:
+            if session_id in self._em_andamento:
+                return
+            self._em_andamento.add(session_id)
+        self._executor.submit(self._resumir, session_id, list(mensagens), estado)
+
+    def _resumir(self, session_id: str, mensagens: List[BaseMessage], estado: dict):
+        try:
+            # Sessões anteriores ao contador: assume que nada foi aparado ainda
+            primeira_abs = max(estado["total"], len(mensagens)) - len(mensagens)
+            corte = recortar_janela(mensagens)
+            # Mensagens fora da janela que o resumo ainda não cobre
+            de = max(estado["resumidas"] - primeira_abs, 0)
+            novas = mensagens[de:corte]
+            if not novas:
+                return
+            texto = self.chain.invoke({
+                "resumo": estado["texto"] or "(vazio)",
+                "mensagens": get_buffer_string(novas, human_prefix="Usuário", ai_prefix="Assistente"),
+                "max_palavras": HISTORY_SUMMARY_WORDS,
+            })
+            self.store.gravar(session_id, texto.strip(), primeira_abs + corte)
+        except Exception:
+            logger.exception("Falha ao resumir o histórico da sessão %s", session_id)
+        finally:
+            with self._lock:
+                self._em_andamento.discard(session_id)
+
+
+class JanelaHistorico(BaseChatMessageHistory):
+    """
+    Visão limitada do histórico para os prompts: resumo das mensagens antigas +
+    últimas trocas literais dentro do orçamento de tokens. Gravações vão para o
+    histórico completo (`base`) e disparam o resumo em segundo plano quando algo
+    sai da janela, então sessões longas custam por turno o mesmo que as curtas.
+    """
+
+    def __init__(self, session_id: str, base: BaseChatMessageHistory, store: ResumoStore, resumidor: Resumidor, ttl: int):
+        self.session_id = session_id
+        self.base = base
+        self.store = store
+        self.resumidor = resumidor
+        self.ttl = ttl
+
+    def _ler(self) -> Tuple[List[BaseMessage], dict]:
+        if isinstance(self.base, RedisChatMessageHistory):
+            # Lista + resumo do LRU; faltando algum, LRANGE + HGETALL (e EXPIRE dos dois) num round trip só
+            def extras(pipe):
+                self.store.ler_no(pipe, self.session_id)
+                self.store.renovar_no(pipe, self.session_id, self.ttl)
+
+            return self.base.ler(extras, anexo=lambda resultados: self.store.decodificar(resultados[0]))
+        return self.base.messages, self.store.ler(self.session_id)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        mensagens, estado = self._ler()
+        janela = mensagens[recortar_janela(mensagens):]
+        if estado["texto"]:
+            return [SystemMessage(content=f"{SUMMARY_PREFIX} {estado['texto']}")] + janela
+        return janela
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        if isinstance(self.base, RedisChatMessageHistory):
+            # Escrita, contador e o retrato (lista + resumo) na mesma transação; o retrato fica no LRU
+            def extras(pipe):
+                self.store.contar_no(pipe, self.session_id, len(messages), self.ttl)
+                self.store.ler_no(pipe, self.session_id)
+
+            mensagens, estado = self.base.gravar(
+                messages, extras, anexo=lambda resultados: self.store.decodificar(resultados[2])
+            )
+        else:
+            self.base.add_messages(messages)
+            self.store.contar(self.session_id, len(messages), self.ttl)
+            mensagens, estado = self.base.messages, self.store.ler(self.session_id)
+        if recortar_janela(mensagens) > 0:
+            self.resumidor.agendar(self.session_id, mensagens, estado)
+
+    def clear(self) -> None:
+        # Resumo antes da lista: base.clear() invalida o LRU depois que os dois já saíram do Redis
+        self.store.limpar(self.session_id)
+        self.base.clear()
+
+
+def com_janela(get_history: Callable[[str], BaseChatMessageHistory], llm, ttl: int) -> Callable[[str], JanelaHistorico]:
+    """
+    Envolve uma fábrica de histórico (ex.: historico_redis.get_session_history) com a
+    política de janela + resumo. `llm` é o modelo barato usado para resumir.
+    """
+    store = ResumoStore()
+    resumidor = Resumidor(llm, store)
+
+    def get_session_history(session_id: str) -> JanelaHistorico:
+        return JanelaHistorico(session_id, get_history(session_id), store, resumidor, ttl)
+
+    return get_session_history
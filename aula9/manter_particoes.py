@@ -0,0 +1,35 @@
+"""
+Cria as partições mensais futuras de transactions, meals e workouts (migrations/004).
+
+Uso:
+    python manter_particoes.py            # garante 12 meses à frente
+    python manter_particoes.py --meses 24
+
+Idempotente; agende diariamente (cron/systemd timer). Se alguma linha cair na partição
+DEFAULT antes do mês existir, ela é movida para a partição nova quando esta é criada.
+"""
+from pg_pool import get_pool
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cria partições mensais futuras.")
+    parser.add_argument("--meses", type=int, default=12, help="Meses à frente (padrão 12).")
+    args = parser.parse_args(argv)
+
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT ensure_future_partitions(%s);", (args.meses,))
+            criadas = cur.fetchone()[0]
+            conn.commit()
+            print(f"{criadas} partição(ões) criada(s).")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+-- Busca por texto em transactions (source_text/description) via pg_trgm + unaccent.
+-- Substitui o ILIKE '%x%' (seq scan) por um índice GIN de trigramas sobre o texto
+-- normalizado (minúsculo, sem acento). Usado por query_transactions e update_transaction.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() é STABLE; o wrapper com dicionário explícito pode ser IMMUTABLE e indexado
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+  LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE OR REPLACE FUNCTION transaction_search_text(source_text text, description text) RETURNS text
+  LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT lower(f_unaccent(coalesce(source_text, '') || ' ' || coalesce(description, ''))) $$;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_search_trgm
+  ON transactions USING gin (transaction_search_text(source_text, description) gin_trgm_ops);
@@ -0,0 +1,8 @@
+-- Paginação por keyset em query_transactions: ORDER BY occurred_at, id e filtro
+-- (occurred_at, id) < (...). Com o id no índice, filtro, ordenação e continuação
+-- saem da mesma varredura, sem Sort. Mantém o nome usado por verificar_planos.py.
+
+DROP INDEX IF EXISTS idx_transactions_occurred_at;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_occurred_at
+  ON transactions (occurred_at DESC, id DESC);
@@ -0,0 +1,96 @@
+-- Rollup de saldo por dia local (America/Sao_Paulo), tipo e categoria.
+-- total_balance/daily_balance leem daqui em O(dias) em vez de somar transactions inteira.
+-- Mantido por triggers de statement (com transition tables), então vale para
+-- add_transaction, update_transaction, bulk, importador e qualquer SQL manual.
+
+CREATE TABLE IF NOT EXISTS transaction_daily_rollup (
+  day          DATE NOT NULL,
+  type         INT NOT NULL,
+  category_id  INT,
+  total        NUMERIC(16,2) NOT NULL DEFAULT 0,
+  tx_count     BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT uq_transaction_daily_rollup UNIQUE NULLS NOT DISTINCT (day, type, category_id)
+);
+
+-- Aplica deltas agregados. A ordem fixa das chaves evita deadlock entre escritas
+-- concorrentes; o ON CONFLICT trava a linha do rollup, então somas concorrentes não se perdem.
+CREATE OR REPLACE FUNCTION transaction_rollup_sync() RETURNS trigger
+  LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO transaction_daily_rollup AS r (day, type, category_id, total, tx_count)
+    SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date, type, category_id, SUM(amount), COUNT(*)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT ON CONSTRAINT uq_transaction_daily_rollup DO UPDATE
+      SET total = r.total + EXCLUDED.total, tx_count = r.tx_count + EXCLUDED.tx_count;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO transaction_daily_rollup AS r (day, type, category_id, total, tx_count)
+    SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date, type, category_id, -SUM(amount), -COUNT(*)
+    FROM old_rows
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    ON CONFLICT ON CONSTRAINT uq_transaction_daily_rollup DO UPDATE
+      SET total = r.total + EXCLUDED.total, tx_count = r.tx_count + EXCLUDED.tx_count;
+
+  ELSE
+    INSERT INTO transaction_daily_rollup AS r (day, type, category_id, total, tx_count)
+    SELECT day, type, category_id, SUM(amount), SUM(n)
+    FROM (
+      SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date AS day, type, category_id, amount, 1 AS n
+      FROM new_rows
+      UNION ALL
+      SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date, type, category_id, -amount, -1
+      FROM old_rows
+    ) d
+    GROUP BY 1, 2, 3
+    HAVING SUM(amount) <> 0 OR SUM(n) <> 0
+    ORDER BY 1, 2, 3
+    ON CONFLICT ON CONSTRAINT uq_transaction_daily_rollup DO UPDATE
+      SET total = r.total + EXCLUDED.total, tx_count = r.tx_count + EXCLUDED.tx_count;
+  END IF;
+  RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_transactions_rollup_ins ON transactions;
+CREATE TRIGGER trg_transactions_rollup_ins
+  AFTER INSERT ON transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+DROP TRIGGER IF EXISTS trg_transactions_rollup_upd ON transactions;
+CREATE TRIGGER trg_transactions_rollup_upd
+  AFTER UPDATE ON transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+DROP TRIGGER IF EXISTS trg_transactions_rollup_del ON transactions;
+CREATE TRIGGER trg_transactions_rollup_del
+  AFTER DELETE ON transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+-- Reconstrói do zero. SHARE bloqueia escritas em transactions até o COMMIT,
+-- então o rollup reconstruído é exatamente a soma da tabela.
+CREATE OR REPLACE FUNCTION transaction_rollup_rebuild() RETURNS bigint
+  LANGUAGE plpgsql
+AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE transactions IN SHARE MODE;
+  DELETE FROM transaction_daily_rollup;
+  INSERT INTO transaction_daily_rollup (day, type, category_id, total, tx_count)
+  SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date, type, category_id, SUM(amount), COUNT(*)
+  FROM transactions
+  GROUP BY 1, 2, 3;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END
+$$;
+
+SELECT transaction_rollup_rebuild();
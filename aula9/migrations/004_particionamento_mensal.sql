@@ -0,0 +1,203 @@
+-- Particionamento mensal por RANGE de transactions (occurred_at), meals (occurred_at)
+-- e workouts (scheduled_at).
+--
+-- Cada tabela é recriada como particionada, os dados são copiados e a antiga é removida,
+-- tudo na transação da migração. Partições mensais são criadas do mês mais antigo com
+-- dados até 12 meses à frente, mais uma partição DEFAULT de segurança. Para manter
+-- meses futuros, agende `python manter_particoes.py` (ex.: cron diário).
+--
+-- Consequências:
+-- - a PK passa a ser (id, <coluna de data>), exigência do Postgres para tabelas particionadas;
+-- - exercises/meal_items ganham a coluna de data do pai para manter a FK composta;
+-- - os filtros por intervalo de occurred_at das tools (user-006) fazem partition pruning.
+
+-- ---------------------------------------------------------------------------
+-- Criação de partições
+-- ---------------------------------------------------------------------------
+
+-- Garante partições mensais [p_from, p_to] (meses locais America/Sao_Paulo) para p_parent.
+-- Linhas que já caíram na DEFAULT para um mês novo são movidas para a partição criada.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(p_parent text, p_column text, p_from date, p_to date)
+  RETURNS int
+  LANGUAGE plpgsql
+AS $$
+DECLARE
+  m        date := date_trunc('month', p_from)::date;
+  part     text;
+  lo       timestamptz;
+  hi       timestamptz;
+  created  int := 0;
+BEGIN
+  WHILE m <= p_to LOOP
+    part := format('%s_p%s', p_parent, to_char(m, 'YYYY_MM'));
+    lo := m::timestamp AT TIME ZONE 'America/Sao_Paulo';
+    hi := (m + interval '1 month')::timestamp AT TIME ZONE 'America/Sao_Paulo';
+
+    IF to_regclass(part) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part, p_parent);
+      IF to_regclass(p_parent || '_default') IS NOT NULL THEN
+        EXECUTE format(
+          'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+          p_parent || '_default', p_column, lo, p_column, hi, part
+        );
+      END IF;
+      EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', p_parent, part, lo, hi);
+      created := created + 1;
+    END IF;
+
+    m := (m + interval '1 month')::date;
+  END LOOP;
+  RETURN created;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION ensure_future_partitions(p_months_ahead int DEFAULT 12)
+  RETURNS int
+  LANGUAGE sql
+AS $$
+  SELECT ensure_monthly_partitions('transactions', 'occurred_at', CURRENT_DATE, (CURRENT_DATE + make_interval(months => p_months_ahead))::date)
+       + ensure_monthly_partitions('meals', 'occurred_at', CURRENT_DATE, (CURRENT_DATE + make_interval(months => p_months_ahead))::date)
+       + ensure_monthly_partitions('workouts', 'scheduled_at', CURRENT_DATE, (CURRENT_DATE + make_interval(months => p_months_ahead))::date);
+$$;
+
+-- ---------------------------------------------------------------------------
+-- transactions
+-- ---------------------------------------------------------------------------
+
+ALTER TABLE transactions RENAME TO transactions_legacy;
+ALTER SEQUENCE transactions_id_seq OWNED BY NONE;
+ALTER INDEX IF EXISTS idx_transactions_occurred_at RENAME TO idx_transactions_occurred_at_legacy;
+ALTER INDEX IF EXISTS idx_transactions_category_time RENAME TO idx_transactions_category_time_legacy;
+ALTER INDEX IF EXISTS idx_transactions_search_trgm RENAME TO idx_transactions_search_trgm_legacy;
+
+CREATE TABLE transactions (
+  id             BIGINT NOT NULL DEFAULT nextval('transactions_id_seq'),
+  amount         NUMERIC(14,2) NOT NULL,
+  type           INT REFERENCES transaction_types(id) NOT NULL DEFAULT 2,
+  category_id    INT REFERENCES categories(id) ON DELETE SET NULL,
+  description    TEXT,
+  payment_method VARCHAR(32),
+  occurred_at    TIMESTAMPTZ NOT NULL,
+  source_text    TEXT NOT NULL,
+  PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id;
+
+CREATE INDEX idx_transactions_occurred_at ON transactions (occurred_at DESC, id DESC);
+CREATE INDEX idx_transactions_category_time ON transactions (category_id, occurred_at DESC);
+CREATE INDEX idx_transactions_search_trgm
+  ON transactions USING gin (transaction_search_text(source_text, description) gin_trgm_ops);
+
+CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;
+
+SELECT ensure_monthly_partitions(
+  'transactions', 'occurred_at',
+  COALESCE((SELECT MIN(occurred_at AT TIME ZONE 'America/Sao_Paulo')::date FROM transactions_legacy), CURRENT_DATE),
+  (CURRENT_DATE + interval '12 months')::date
+);
+
+-- Cópia antes das triggers: o rollup (migração 003) já contém essas linhas
+INSERT INTO transactions (id, amount, type, category_id, description, payment_method, occurred_at, source_text)
+SELECT id, amount, type, category_id, description, payment_method, occurred_at, source_text
+FROM transactions_legacy;
+
+DROP TABLE transactions_legacy;
+
+CREATE TRIGGER trg_transactions_rollup_ins
+  AFTER INSERT ON transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+CREATE TRIGGER trg_transactions_rollup_upd
+  AFTER UPDATE ON transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+CREATE TRIGGER trg_transactions_rollup_del
+  AFTER DELETE ON transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION transaction_rollup_sync();
+
+-- ---------------------------------------------------------------------------
+-- meals (+ meal_items)
+-- ---------------------------------------------------------------------------
+
+ALTER TABLE meal_items DROP CONSTRAINT IF EXISTS meal_items_meal_id_fkey;
+ALTER TABLE meal_items ADD COLUMN IF NOT EXISTS meal_occurred_at TIMESTAMPTZ;
+UPDATE meal_items mi SET meal_occurred_at = m.occurred_at FROM meals m WHERE m.id = mi.meal_id;
+
+ALTER TABLE meals RENAME TO meals_legacy;
+ALTER SEQUENCE meals_id_seq OWNED BY NONE;
+ALTER INDEX IF EXISTS idx_meals_date RENAME TO idx_meals_date_legacy;
+
+CREATE TABLE meals (
+  id            BIGINT NOT NULL DEFAULT nextval('meals_id_seq'),
+  title         TEXT NOT NULL,
+  occurred_at   TIMESTAMPTZ NOT NULL,
+  notes         TEXT,
+  source_text   TEXT NOT NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+ALTER SEQUENCE meals_id_seq OWNED BY meals.id;
+
+CREATE INDEX idx_meals_date ON meals (occurred_at DESC);
+
+CREATE TABLE meals_default PARTITION OF meals DEFAULT;
+
+SELECT ensure_monthly_partitions(
+  'meals', 'occurred_at',
+  COALESCE((SELECT MIN(occurred_at AT TIME ZONE 'America/Sao_Paulo')::date FROM meals_legacy), CURRENT_DATE),
+  (CURRENT_DATE + interval '12 months')::date
+);
+
+INSERT INTO meals SELECT id, title, occurred_at, notes, source_text, created_at FROM meals_legacy;
+DROP TABLE meals_legacy;
+
+ALTER TABLE meal_items
+  ADD CONSTRAINT meal_items_meal_fkey FOREIGN KEY (meal_id, meal_occurred_at)
+  REFERENCES meals (id, occurred_at) ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- ---------------------------------------------------------------------------
+-- workouts (+ exercises)
+-- ---------------------------------------------------------------------------
+
+ALTER TABLE exercises DROP CONSTRAINT IF EXISTS exercises_workout_id_fkey;
+ALTER TABLE exercises ADD COLUMN IF NOT EXISTS workout_scheduled_at TIMESTAMPTZ;
+UPDATE exercises e SET workout_scheduled_at = w.scheduled_at FROM workouts w WHERE w.id = e.workout_id;
+
+ALTER TABLE workouts RENAME TO workouts_legacy;
+ALTER SEQUENCE workouts_id_seq OWNED BY NONE;
+ALTER INDEX IF EXISTS idx_workouts_date RENAME TO idx_workouts_date_legacy;
+
+CREATE TABLE workouts (
+  id            BIGINT NOT NULL DEFAULT nextval('workouts_id_seq'),
+  title         TEXT NOT NULL,
+  notes         TEXT,
+  scheduled_at  TIMESTAMPTZ NOT NULL,
+  duration_min  INT,
+  source_text   TEXT NOT NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, scheduled_at)
+) PARTITION BY RANGE (scheduled_at);
+
+ALTER SEQUENCE workouts_id_seq OWNED BY workouts.id;
+
+CREATE INDEX idx_workouts_date ON workouts (scheduled_at DESC);
+
+CREATE TABLE workouts_default PARTITION OF workouts DEFAULT;
+
+SELECT ensure_monthly_partitions(
+  'workouts', 'scheduled_at',
+  COALESCE((SELECT MIN(scheduled_at AT TIME ZONE 'America/Sao_Paulo')::date FROM workouts_legacy), CURRENT_DATE),
+  (CURRENT_DATE + interval '12 months')::date
+);
+
+INSERT INTO workouts SELECT id, title, notes, scheduled_at, duration_min, source_text, created_at FROM workouts_legacy;
+DROP TABLE workouts_legacy;
+
+ALTER TABLE exercises
+  ADD CONSTRAINT exercises_workout_fkey FOREIGN KEY (workout_id, workout_scheduled_at)
+  REFERENCES workouts (id, scheduled_at) ON DELETE CASCADE ON UPDATE CASCADE;
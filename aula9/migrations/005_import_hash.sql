@@ -0,0 +1,12 @@
+-- Dedupe do importar_extrato.py garantido pelo banco: import_hash é o sha256 de
+-- (occurred_at, amount, source_text) calculado na importação (chave_dedupe, antes de
+-- mascarar PII) e o INSERT usa ON CONFLICT DO NOTHING, então duas importações
+-- simultâneas do mesmo arquivo não duplicam linhas. Só linhas importadas têm o hash
+-- (NULL não conflita; linhas importadas antes desta migração ficam sem hash).
+-- Índice único em tabela particionada precisa da chave de partição; o hash já
+-- inclui occurred_at, então a unicidade é a mesma.
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS import_hash CHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_import_hash
+  ON transactions (import_hash, occurred_at);
@@ -0,0 +1,291 @@
+"""
+Modelos locais determinísticos no lugar do Gemini, para testes de carga offline.
+
+`instalar()` troca ChatGoogleGenerativeAI e GoogleGenerativeAIEmbeddings no pacote
+langchain_google_genai; precisa rodar ANTES de importar aula9/faq_tools. A partir daí:
+- cada chamada ao chat dorme latencia_s + tokens_saida / tokens_por_s (em streaming,
+  latencia_s até o primeiro pedaço e o resto distribuído entre eles) e responde no
+  formato que o prompt pede (roteador, especialistas com tool calls reais no Postgres,
+  orquestrador, FAQ, resumo), identificado pelo início da mensagem de sistema;
+- embeddings são vetores de hashing dos termos (mesmo texto, mesmo vetor);
+- USO acumula chamadas e tokens estimados por papel.
+"""
+from prompt_agentes import (
+    system_prompt_roteador,
+    system_prompt_financeiro,
+    system_prompt_agenda,
+    system_prompt_academia,
+    system_prompt_alimentacao,
+    system_prompt_orquestrador,
+    system_prompt_faq,
+    today,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.embeddings import Embeddings
+from pre_roteador import FORA_ESCOPO, RESPOSTA_SAUDACAO, SAUDACAO, classificar, formatar_rota, normalizar
+from busca_hibrida import estimar_tokens, tokenizar
+from typing import Any, Iterator, List, Optional, Tuple
+import threading
+import hashlib
+import json
+import math
+import time
+import sys
+import re
+
+PREFIXO = 60
+
+PAPEIS = {
+    "roteador": system_prompt_roteador[1],
+    "financeiro": system_prompt_financeiro[1],
+    "agenda": system_prompt_agenda[1],
+    "academia": system_prompt_academia[1],
+    "alimentacao": system_prompt_alimentacao[1],
+    "orquestrador": system_prompt_orquestrador[1],
+    "faq": system_prompt_faq[1],
+    "resumo": "Você mantém o resumo de uma conversa",
+}
+PAPEIS = {papel: re.sub(r"\s+", " ", texto).strip()[:PREFIXO] for papel, texto in PAPEIS.items()}
+
+RESPOSTA_FORA_ESCOPO = "Posso ajudar com finanças, agenda, treinos ou alimentação. Quer ver seu saldo ou seus compromissos?"
+ENCHIMENTO = "Detalhe sintético para completar o tamanho da resposta."
+
+PERGUNTA_ORIGINAL = re.compile(r"PERGUNTA_ORIGINAL=(.*)")
+VALOR = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+class UsoTokens:
+    """Chamadas e tokens (estimados) por papel, somados entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_papel = {}
+
+    def registrar(self, papel: str, entrada: int, saida: int):
+        with self._lock:
+            atual = self.por_papel.setdefault(papel, {"chamadas": 0, "entrada": 0, "saida": 0})
+            atual["chamadas"] += 1
+            atual["entrada"] += entrada
+            atual["saida"] += saida
+
+    def zerar(self):
+        with self._lock:
+            self.por_papel = {}
+
+
+USO = UsoTokens()
+
+
+def identificar_papel(mensagens: List[BaseMessage]) -> str:
+    for m in mensagens:
+        if isinstance(m, SystemMessage):
+            inicio = re.sub(r"\s+", " ", str(m.content)).strip()[:PREFIXO]
+            for papel, prefixo in PAPEIS.items():
+                if inicio.startswith(prefixo):
+                    return papel
+    return "outro"
+
+
+def _ultimo_humano(mensagens: List[BaseMessage]) -> str:
+    for m in reversed(mensagens):
+        if isinstance(m, HumanMessage):
+            return str(m.content)
+    return ""
+
+
+def _encher(texto: str, tokens: int) -> str:
+    while estimar_tokens(texto) < tokens:
+        texto += " " + ENCHIMENTO
+    return texto
+
+
+class ChatFalso(BaseChatModel):
+    """Chat determinístico com latência de rede + geração simulada."""
+
+    modelo: str = "falso"
+    latencia_s: float = 0.4
+    tokens_por_s: float = 80.0
+    tokens_resposta: int = 60
+    # Sem escrita, pedidos de lançamento viram consultas (o banco local não recebe dados sintéticos)
+    escrita: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-falso"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _roteador(self, texto: str) -> str:
+        rota, _, _ = classificar(texto)
+        if rota == SAUDACAO:
+            return RESPOSTA_SAUDACAO
+        if rota is None or rota == FORA_ESCOPO:
+            return RESPOSTA_FORA_ESCOPO
+        return formatar_rota(rota, texto)
+
+    def _tool_call(self, papel: str, pergunta: str, nomes: set) -> Optional[dict]:
+        if papel != "financeiro":
+            return None
+        norm = normalizar(pergunta)
+        valor = VALOR.search(norm)
+        if self.escrita and valor and re.search(r"\b(gastei|paguei|comprei)\b", norm) and "add_transaction" in nomes:
+            nome, args = "add_transaction", {
+                "amount": float(valor.group(0).replace(",", ".")),
+                "source_text": f"[carga] {pergunta}",
+                "type_name": "EXPENSES",
+                "category_name": "outros",
+            }
+        elif "saldo" in norm and "total_balance" in nomes:
+            nome, args = "total_balance", {}
+        elif "hoje" in norm and "daily_balance" in nomes:
+            nome, args = "daily_balance", {"date_local": today.date().isoformat()}
+        elif "query_transactions" in nomes:
+            nome, args = "query_transactions", {"date_from_local": today.date().replace(day=1).isoformat(), "limit": 10}
+        else:
+            return None
+        return {"name": nome, "args": args, "id": f"call_{hashlib.sha1(pergunta.encode()).hexdigest()[:12]}"}
+
+    def _especialista(self, papel: str, mensagens: List[BaseMessage], tools: List[dict]) -> AIMessage:
+        pedido = _ultimo_humano(mensagens)
+        achou = PERGUNTA_ORIGINAL.search(pedido)
+        pergunta = achou.group(1).strip() if achou else pedido.strip()
+
+        # Depois do último pedido já existe resultado de tool: hora de responder
+        resultados = []
+        for m in reversed(mensagens):
+            if isinstance(m, HumanMessage):
+                break
+            if isinstance(m, ToolMessage):
+                resultados.append(str(m.content))
+        if not resultados:
+            chamada = self._tool_call(papel, pergunta, {t["function"]["name"] for t in tools})
+            if chamada:
+                return AIMessage(content="", tool_calls=[chamada])
+
+        resposta = {
+            "dominio": papel,
+            "intencao": "consultar" if resultados else "responder",
+            "resposta": _encher(f"Resposta sintética para: {pergunta}", self.tokens_resposta),
+            "recomendacao": "Quer ver o detalhamento?" if resultados else "",
+        }
+        if not resultados:
+            resposta["esclarecer"] = "Pode dar mais detalhes?"
+        return AIMessage(content=json.dumps(resposta, ensure_ascii=False))
+
+    def _orquestrador(self, entrada: str) -> str:
+        try:
+            dados = json.loads(entrada.strip().strip("`").removeprefix("json"))
+        except (json.JSONDecodeError, AttributeError):
+            return _encher(entrada.strip(), self.tokens_resposta)
+        linhas = [str(dados.get("resposta", ""))]
+        if dados.get("recomendacao"):
+            linhas += ["- *Recomendação*:", str(dados["recomendacao"])]
+        acompanhamento = dados.get("esclarecer") or dados.get("acompanhamento")
+        if acompanhamento:
+            linhas += ["- *Acompanhamento* (opcional):", str(acompanhamento)]
+        return "\n".join(linhas)
+
+    def _responder(self, mensagens: List[BaseMessage], tools: List[dict]) -> Tuple[str, AIMessage]:
+        papel = identificar_papel(mensagens)
+        if papel == "roteador":
+            return papel, AIMessage(content=self._roteador(_ultimo_humano(mensagens)))
+        if tools:
+            return papel, self._especialista(papel, mensagens, tools)
+        if papel == "orquestrador":
+            return papel, AIMessage(content=self._orquestrador(_ultimo_humano(mensagens)))
+        if papel == "faq":
+            contexto = _ultimo_humano(mensagens).split("CONTEXTO", 1)[-1].split("\n", 1)[-1]
+            return papel, AIMessage(content=_encher(f"Segundo o FAQ: {contexto[:200].strip()}", self.tokens_resposta))
+        return papel, AIMessage(content=_encher("Resumo sintético da conversa.", self.tokens_resposta))
+
+    def _preparar(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> Tuple[AIMessage, int]:
+        papel, mensagem = self._responder(messages, tools or [])
+        entrada = sum(estimar_tokens(str(m.content)) for m in messages)
+        saida = estimar_tokens(str(mensagem.content) + json.dumps([c["args"] for c in mensagem.tool_calls]))
+        mensagem.usage_metadata = {"input_tokens": entrada, "output_tokens": saida, "total_tokens": entrada + saida}
+        USO.registrar(papel, entrada, saida)
+        return mensagem, saida
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, tools: Optional[List[dict]] = None, **kwargs: Any) -> ChatResult:
+        mensagem, saida = self._preparar(messages, tools)
+        time.sleep(self.latencia_s + saida / self.tokens_por_s)
+        return ChatResult(generations=[ChatGeneration(message=mensagem)])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, tools: Optional[List[dict]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        """Mesmo conteúdo e mesmo tempo total de _generate, mas em pedaços: o primeiro chega após latencia_s."""
+        mensagem, saida = self._preparar(messages, tools)
+        time.sleep(self.latencia_s)
+        if mensagem.tool_calls:
+            time.sleep(saida / self.tokens_por_s)
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(mensagem.tool_calls)
+                ],
+                usage_metadata=mensagem.usage_metadata,
+            ))
+            return
+        partes = re.findall(r"\s*\S+", str(mensagem.content)) or [""]
+        for i, parte in enumerate(partes):
+            time.sleep(saida / self.tokens_por_s / len(partes))
+            ultimo = i == len(partes) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=parte, usage_metadata=mensagem.usage_metadata if ultimo else None,
+            ))
+
+
+class EmbeddingsFalsas(Embeddings):
+    """Hashing dos termos (tokenizar do BM25) em `dimensao` posições, normalizado."""
+
+    def __init__(self, dimensao: int = 256, latencia_s: float = 0.05):
+        self.dimensao = dimensao
+        self.latencia_s = latencia_s
+
+    def _vetor(self, texto: str) -> List[float]:
+        vetor = [0.0] * self.dimensao
+        for termo in tokenizar(texto) or [texto]:
+            h = int.from_bytes(hashlib.md5(termo.encode("utf-8")).digest()[:4], "little")
+            vetor[h % self.dimensao] += 1.0 if h & (1 << 31) else -1.0
+        norma = math.sqrt(sum(v * v for v in vetor)) or 1.0
+        return [v / norma for v in vetor]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latencia_s)
+        return [self._vetor(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def instalar(
+    latencia_s: float = 0.4,
+    tokens_por_s: float = 80.0,
+    tokens_resposta: int = 60,
+    escrita: bool = False,
+    latencia_embedding_s: float = 0.05,
+) -> None:
+    """Troca os modelos do Gemini pelos falsos; chame antes de importar aula9 ou faq_tools."""
+    carregados = [m for m in ("aula9", "faq_tools") if m in sys.modules]
+    if carregados:
+        raise RuntimeError(f"instalar() precisa rodar antes de importar {', '.join(carregados)}")
+
+    import langchain_google_genai
+    import langchain_google_genai.chat_models
+
+    def chat(model: str = "falso", **_) -> ChatFalso:
+        return ChatFalso(
+            modelo=model, latencia_s=latencia_s, tokens_por_s=tokens_por_s,
+            tokens_resposta=tokens_resposta, escrita=escrita,
+        )
+
+    def embeddings(**_) -> EmbeddingsFalsas:
+        return EmbeddingsFalsas(latencia_s=latencia_embedding_s)
+
+    langchain_google_genai.ChatGoogleGenerativeAI = chat
+    langchain_google_genai.chat_models.ChatGoogleGenerativeAI = chat
+    langchain_google_genai.GoogleGenerativeAIEmbeddings = embeddings
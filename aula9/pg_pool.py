@@ -0,0 +1,311 @@
+from contextlib import contextmanager, asynccontextmanager
+from collections import deque
+from dotenv import load_dotenv
+import threading
+import asyncio
+import time
+import psycopg2
+import os
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Tamanho do pool por processo (ajuste por worker)
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+# Tempo máximo de espera por uma conexão livre (segundos)
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+# Conexões ociosas além do mínimo são fechadas após esse tempo (segundos)
+PG_POOL_IDLE_TIMEOUT = float(os.getenv("PG_POOL_IDLE_TIMEOUT", "300"))
+# Conexões paradas há mais que isso recebem um SELECT 1 antes de serem entregues
+PG_POOL_CHECK_AFTER = float(os.getenv("PG_POOL_CHECK_AFTER", "30"))
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão ficou livre dentro do timeout."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexões psycopg2 compartilhado por todas as tools.
+    - health check no checkout (conexão fechada/quebrada é descartada)
+    - conexões ociosas acima de `minconn` são fechadas após `idle_timeout`
+    - `metrics()` expõe a saturação para dimensionar o pool por worker
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        minconn: int = PG_POOL_MIN,
+        maxconn: int = PG_POOL_MAX,
+        timeout: float = PG_POOL_TIMEOUT,
+        idle_timeout: float = PG_POOL_IDLE_TIMEOUT,
+        check_after: float = PG_POOL_CHECK_AFTER,
+    ):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamanho de pool inválido (0 <= min <= max, max >= 1).")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, último uso)
+        self._in_use = 0
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "reaped": 0,
+            "max_in_use": 0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        # Chamado também fora do lock (getconn); o RLock do Condition aceita reentrada
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reap(self, now: float):
+        # Chamado com o lock adquirido; as mais antigas ficam à esquerda
+        total = len(self._idle) + self._in_use
+        while self._idle and total > self.minconn:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            total -= 1
+            self._stats["reaped"] += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolEsgotado("Pool encerrado.")
+                now = time.monotonic()
+                self._reap(now)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.maxconn:
+                    conn, last_used = None, now
+                    self._in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolEsgotado(
+                        f"Sem conexões livres após {self.timeout}s (max={self.maxconn})."
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats["checkouts"] += 1
+            self._stats["max_in_use"] = max(self._stats["max_in_use"], self._in_use)
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += time.monotonic() - t0
+
+        # I/O fora do lock: conectar ou validar a conexão
+        try:
+            if conn is not None and not self._healthy(conn, time.monotonic() - last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        if not discard and not conn.closed:
+            try:
+                # Nunca devolve conexão com transação aberta
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._reap(time.monotonic())
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Uso:
+            with pool.connection() as conn:
+                ...
+        A conexão volta ao pool ao sair do bloco (com rollback do que não foi commitado).
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            idle = len(self._idle)
+            in_use = self._in_use
+            stats = dict(self._stats)
+        stats.update({
+            "min": self.minconn,
+            "max": self.maxconn,
+            "idle": idle,
+            "in_use": in_use,
+            "size": idle + in_use,
+            "saturation": in_use / self.maxconn,
+        })
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Pool único por processo, criado no primeiro uso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_URL)
+    return _pool
+
+
+def pool_metrics() -> dict:
+    return get_pool().metrics()
+
+
+# ---------------------------------------------------------------------------
+# Pool async (psycopg 3) usado pelas versões async das tools (`.ainvoke`)
+# ---------------------------------------------------------------------------
+
+# O AsyncConnectionPool fica preso ao event loop em que abriu: um pool por loop
+# (segundo asyncio.run, testes, servidor reiniciado no mesmo processo)
+_async_pools = {}   # loop -> (pool, asyncio.Lock)
+
+
+def _async_slot(loop):
+    slot = _async_pools.get(loop)
+    if slot is None:
+        # Pools de loops já fechados não podem mais ser fechados com await; só saem do mapa
+        for antigo in [l for l in _async_pools if l.is_closed()]:
+            del _async_pools[antigo]
+        slot = _async_pools[loop] = [None, asyncio.Lock()]
+    return slot
+
+
+async def get_async_pool():
+    """Pool async do event loop corrente, aberto no primeiro uso dentro dele."""
+    slot = _async_slot(asyncio.get_running_loop())
+    if slot[0] is None:
+        async with slot[1]:
+            if slot[0] is None:
+                from psycopg_pool import AsyncConnectionPool
+
+                pool = AsyncConnectionPool(
+                    DATABASE_URL,
+                    min_size=PG_POOL_MIN,
+                    max_size=PG_POOL_MAX,
+                    timeout=PG_POOL_TIMEOUT,
+                    max_idle=PG_POOL_IDLE_TIMEOUT,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                slot[0] = pool
+    return slot[0]
+
+
+@asynccontextmanager
+async def aget_conn():
+    """
+    Uso:
+        async with aget_conn() as conn:
+            ...
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+def async_pool_metrics() -> dict:
+    """Estatísticas do pool do loop corrente (ou do único pool aberto, fora de um loop)."""
+    try:
+        slot = _async_pools.get(asyncio.get_running_loop())
+    except RuntimeError:
+        abertos = [s for s in _async_pools.values() if s[0] is not None]
+        slot = abertos[0] if len(abertos) == 1 else None
+    if slot is None or slot[0] is None:
+        return {}
+    return slot[0].get_stats()
+
+
+async def close_async_pool():
+    slot = _async_pools.pop(asyncio.get_running_loop(), None)
+    if slot is not None and slot[0] is not None:
+        await slot[0].close()
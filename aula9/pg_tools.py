@@ -1,18 +1,21 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List, Tuple
+from datetime import date, datetime, time as time_of_day, timedelta
+from zoneinfo import ZoneInfo
 from langchain.tools import tool
-from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from pg_pool import get_pool, aget_conn
 import unicodedata
-import psycopg2
+import base64
+import json
+import threading
+import time
 import os
 
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
 
 def get_conn():
-    return psycopg2.connect(DATABASE_URL)
+    """Empresta uma conexão do pool do processo (use com `with`)."""
+    return get_pool().connection()
 
 
 TYPE_LIST = {
@@ -30,29 +33,113 @@ TYPE_LIST = {
 }
 
 
+def normalize(text: str) -> str:
+    text = text.upper()
+    text = "".join(
+        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
+    )
+    return text
+
+
+# transaction_types e categories quase nunca mudam: carregadas uma vez e
+# reaproveitadas por todas as tools até expirar o TTL (ou invalidate_lookup_cache()).
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "600"))
+# Intervalo mínimo entre recargas causadas por nomes desconhecidos
+LOOKUP_MISS_RELOAD = float(os.getenv("LOOKUP_MISS_RELOAD", "5"))
+
+SQL_LOOKUPS = """
+    SELECT 'type', id, type FROM transaction_types
+    UNION ALL
+    SELECT 'category', id, name FROM categories;
+"""
+
+
+class LookupCache:
+    """Mapas normalize(nome) -> id de transaction_types e categories, com TTL."""
+
+    def __init__(self, ttl: float = LOOKUP_CACHE_TTL, miss_reload: float = LOOKUP_MISS_RELOAD):
+        self.ttl = ttl
+        self.miss_reload = miss_reload
+        self._maps = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, name: str, allow_reload: bool = True) -> Tuple[bool, Optional[int]]:
+        """
+        Retorna (resolvido, id). `resolvido=False` indica que o chamador deve
+        recarregar do banco (cache vazio, expirado ou nome desconhecido).
+        """
+        maps, age = self._maps, time.monotonic() - self._loaded_at
+        if maps is None or age > self.ttl:
+            return False, None
+        found = maps[kind].get(normalize(name))
+        if found is None and allow_reload and age > self.miss_reload:
+            return False, None
+        return True, found
+
+    def fill(self, rows):
+        maps = {"type": {}, "category": {}}
+        for kind, id_, name in rows:
+            maps[kind][normalize(name)] = id_
+        with self._lock:
+            self._maps = maps
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._maps = None
+            self._loaded_at = 0.0
+
+
+_lookup_cache = LookupCache()
+
+
+def invalidate_lookup_cache():
+    """Chame após alterar transaction_types/categories."""
+    _lookup_cache.invalidate()
+
+
+def _lookup_id(cur, kind: str, name: str) -> Optional[int]:
+    ok, found = _lookup_cache.get(kind, name)
+    if ok:
+        return found
+    cur.execute(SQL_LOOKUPS)
+    _lookup_cache.fill(cur.fetchall())
+    return _lookup_cache.get(kind, name, allow_reload=False)[1]
+
+
+async def _alookup_id(cur, kind: str, name: str) -> Optional[int]:
+    ok, found = _lookup_cache.get(kind, name)
+    if ok:
+        return found
+    await cur.execute(SQL_LOOKUPS)
+    _lookup_cache.fill(await cur.fetchall())
+    return _lookup_cache.get(kind, name, allow_reload=False)[1]
+
+
+def _type_key(type_name: str) -> str:
+    t = type_name.strip().upper()
+    return TYPE_LIST.get(t, t)
+
+
 def _resolve_type_id(
     cur, type_id: Optional[int], type_name: Optional[str]
 ) -> Optional[int]:
     if type_name:
-        t = type_name.strip().upper()
-        if t in TYPE_LIST:
-            t = TYPE_LIST[t]
-        cur.execute(
-            "SELECT id FROM transaction_types WHERE UPPER(type)=%s LIMIT 1;", (t,)
-        )
-        row = cur.fetchone()
-        return row[0] if row else None
+        return _lookup_id(cur, "type", _type_key(type_name))
     if type_id:
         return int(type_id)
     return 2
 
 
-def normalize(text: str) -> str:
-    text = text.upper()
-    text = "".join(
-        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
-    )
-    return text
+async def _aresolve_type_id(
+    cur, type_id: Optional[int], type_name: Optional[str]
+) -> Optional[int]:
+    if type_name:
+        return await _alookup_id(cur, "type", _type_key(type_name))
+    if type_id:
+        return int(type_id)
+    return 2
 
 
 def _resolve_category_id(
@@ -62,14 +149,19 @@ def _resolve_category_id(
         return category_id
 
     if category_name:
-        cur.execute("SELECT id, name FROM categories")
-        rows = cur.fetchall()
-        CATEGORY_MAP = {normalize(name): id_ for id_, name in rows}
+        return _lookup_id(cur, "category", category_name.strip())
+
+    return None
+
+
+async def _aresolve_category_id(
+    cur, category_id: Optional[int] = None, category_name: Optional[str] = None
+) -> Optional[int]:
+    if category_id:
+        return category_id
 
-        key = normalize(category_name.strip())
-        mapped_id = CATEGORY_MAP.get(key)
-        if mapped_id:
-            return mapped_id
+    if category_name:
+        return await _alookup_id(cur, "category", category_name.strip())
 
     return None
 
@@ -122,13 +214,25 @@ class AddMealArgs(BaseModel):
     )
     notes: Optional[str] = Field(default=None, description="Observações da refeição.")
 
+# Teto de linhas por página do query_transactions (a página inteira vai para o contexto do LLM)
+QUERY_LIMIT_MAX = 200
+
+
 class QueryTransactionsArgs(BaseModel):
     text: Optional[str] = Field(None, description="Texto para busca em 'source_text' ou 'description'")
     type_name: Optional[str] = Field(None, description="Nome do tipo de transação")
     date_local: Optional[str] = Field(None, description="Data exata da transação (formato YYYY-MM-DD)")
     date_from_local: Optional[str] = Field(None, description="Data inicial para filtro por intervalo (YYYY-MM-DD)")
     date_to_local: Optional[str] = Field(None, description="Data final para filtro por intervalo (YYYY-MM-DD)")
-    limit: int = Field(20, description="Quantidade máxima de registros a retornar")
+    limit: int = Field(
+        20, ge=1, le=QUERY_LIMIT_MAX, description="Quantidade máxima de registros a retornar"
+    )
+    rank_by_relevance: bool = Field(
+        False, description="Com 'text', ordena pela relevância da busca em vez da data (inclui a coluna relevance)."
+    )
+    cursor: Optional[str] = Field(
+        None, description="Token next_cursor devolvido pela consulta anterior, para buscar a próxima página."
+    )
 
 
 class EmptyArgs(BaseModel):
@@ -159,6 +263,267 @@ class UpdateTransactionArgs(BaseModel):
     payment_method: Optional[str] = Field(default=None, description="Novo meio de pagamento.")
     occurred_at: Optional[str] = Field(default=None, description="Novo timestamp ISO 8601.")
 
+class AddTransactionsBulkArgs(BaseModel):
+    transactions: List[AddTransactionArgs] = Field(
+        ..., description="Lista de transações a inserir de uma vez (ex.: linhas de um extrato colado)."
+    )
+
+SQL_INSERT_TRANSACTION = """
+    INSERT INTO transactions
+        (amount, type, category_id, description, payment_method, occurred_at, source_text)
+    VALUES
+        (%s, %s, %s, %s, %s, COALESCE(%s::timestamptz, NOW()), %s)
+    RETURNING id, occurred_at;
+"""
+
+SQL_INSERT_WORKOUT = """
+    INSERT INTO workouts (title, notes, scheduled_at, duration_min, source_text)
+    VALUES (%s, %s, COALESCE(%s::timestamptz, NOW()), %s, %s)
+    RETURNING id, scheduled_at;
+"""
+
+SQL_INSERT_MEAL = """
+    INSERT INTO meals (title, occurred_at, notes, source_text)
+    VALUES (%s, COALESCE(%s::timestamptz, NOW()), %s, %s)
+    RETURNING id, occurred_at;
+"""
+
+# Saldos saem do rollup diário mantido por trigger (migrations/003_rollup_saldo_diario.sql)
+SQL_TOTAL_BALANCE = """
+    SELECT
+        COALESCE(SUM(total) FILTER (WHERE type = 1), 0) AS total_income,
+        COALESCE(SUM(total) FILTER (WHERE type = 2), 0) AS total_expenses
+    FROM transaction_daily_rollup
+    WHERE type != 3
+"""
+
+SQL_DAILY_BALANCE = """
+    SELECT
+        COALESCE(SUM(total) FILTER (WHERE type = 1), 0) AS total_income,
+        COALESCE(SUM(total) FILTER (WHERE type = 2), 0) AS total_expenses
+    FROM transaction_daily_rollup
+    WHERE day = %s
+    AND type != 3
+"""
+
+SQL_FIND_TRANSACTION = """
+    SELECT
+        t.id
+    FROM transactions t
+    WHERE transaction_search_text(t.source_text, t.description) LIKE '%%' || lower(f_unaccent(%s)) || '%%'
+    AND t.occurred_at >= %s AND t.occurred_at < %s
+    ORDER BY t.occurred_at DESC
+    LIMIT 1;
+"""
+
+SQL_SELECT_TRANSACTION = """
+    SELECT
+      t.id, t.occurred_at, t.amount, tt.type AS type_name,
+      c.name AS category_name, t.description, t.payment_method, t.source_text
+    FROM transactions t
+    JOIN transaction_types tt ON tt.id = t.type
+    LEFT JOIN categories c ON c.id = t.category_id
+    WHERE t.id = %s;
+"""
+
+
+FUSO_LOCAL = ZoneInfo("America/Sao_Paulo")
+
+
+def local_day_range(date_from_local: str, date_to_local: Optional[str] = None) -> Tuple[datetime, datetime]:
+    """
+    Intervalo semiaberto [início, fim) em timestamptz para os dias locais (America/Sao_Paulo)
+    de date_from_local até date_to_local (inclusive). Filtrar `occurred_at >= início AND
+    occurred_at < fim` deixa o idx_transactions_occurred_at servir o filtro e o ORDER BY.
+    """
+    first = date.fromisoformat(date_from_local)
+    last = date.fromisoformat(date_to_local) if date_to_local else first
+    start = datetime.combine(first, time_of_day.min, tzinfo=FUSO_LOCAL)
+    end = datetime.combine(last + timedelta(days=1), time_of_day.min, tzinfo=FUSO_LOCAL)
+    return start, end
+
+
+# Busca por texto via índice de trigramas (migrations/001_busca_trigram.sql):
+# substring sem acento/caixa em source_text + description.
+SEARCH_EXPR = "transaction_search_text(t.source_text, t.description)"
+SEARCH_FILTER = f"{SEARCH_EXPR} LIKE '%%' || lower(f_unaccent(%s)) || '%%'"
+SEARCH_RANK = f"word_similarity(lower(f_unaccent(%s)), {SEARCH_EXPR})"
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _build_query_transactions(
+    text: Optional[str],
+    type_name: Optional[str],
+    date_local: Optional[str],
+    date_from_local: Optional[str],
+    date_to_local: Optional[str],
+    limit: Optional[int],
+    rank_by_relevance: bool = False,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[str, list]:
+    """
+    Monta a consulta de transações. A última coluna (occurred_at em timestamptz) é só
+    para a paginação por keyset e é removida antes de devolver as linhas ao chamador.
+    `after` = (occurred_at, id) da última linha da página anterior; `limit=None` sem LIMIT.
+    """
+    filters = []
+    params = []
+
+    conditions = [
+        (text, SEARCH_FILTER, lambda v: [_like_escape(v)]),
+        (type_name, "t.type = (SELECT id FROM transaction_types WHERE type ILIKE %s)", lambda v: [v]),
+        (date_local, "occurred_at >= %s AND occurred_at < %s", lambda v: list(local_day_range(v))),
+        ((date_from_local, date_to_local) if date_from_local and date_to_local else None,
+        "occurred_at >= %s AND occurred_at < %s",
+        lambda v: list(local_day_range(*v)))
+    ]
+
+    for val, sql, to_params in conditions:
+        if val:
+            filters.append(sql)
+            params.extend(to_params(val))
+
+    descending = _is_descending(date_from_local, date_to_local)
+    if after is not None:
+        filters.append("(t.occurred_at, t.id) < (%s, %s)" if descending else "(t.occurred_at, t.id) > (%s, %s)")
+        params.extend(after)
+
+    where_clause = " AND ".join(filters)
+    if where_clause:
+        where_clause = "WHERE " + where_clause
+
+    order_clause = "ORDER BY t.occurred_at DESC, t.id DESC" if descending else "ORDER BY t.occurred_at ASC, t.id ASC"
+
+    rank_column = ""
+    if text and rank_by_relevance:
+        rank_column = f", {SEARCH_RANK} AS relevance"
+        params.insert(0, text)
+        order_clause = "ORDER BY relevance DESC, t.occurred_at DESC, t.id DESC"
+
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = "LIMIT %s"
+        params.append(limit)
+
+    query = f"""
+        SELECT t.id, t.amount, tt.type, t.category_id, t.description, t.payment_method,
+            t.occurred_at AT TIME ZONE 'America/Sao_Paulo' AS occurred_local,
+            t.source_text{rank_column},
+            t.occurred_at AS cursor_at
+        FROM transactions t
+        JOIN transaction_types tt ON t.type = tt.id
+        {where_clause}
+        {order_clause}
+        {limit_clause}
+    """
+    return query, params
+
+
+def _is_descending(date_from_local: Optional[str], date_to_local: Optional[str]) -> bool:
+    # Intervalos saem em ordem cronológica; o resto, do mais recente para o mais antigo
+    return not (date_from_local or date_to_local)
+
+
+def _encode_cursor(occurred_at: datetime, id_: int, descending: bool) -> str:
+    raw = json.dumps({"o": occurred_at.isoformat(), "i": id_, "d": descending})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str) -> Tuple[Tuple[datetime, int], bool]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return (datetime.fromisoformat(data["o"]), int(data["i"])), bool(data["d"])
+    except Exception:
+        raise ValueError("cursor inválido.")
+
+
+def _resolve_page_cursor(
+    cursor: Optional[str], rank_by_relevance: bool, date_from_local: Optional[str], date_to_local: Optional[str]
+) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    if rank_by_relevance:
+        raise ValueError("cursor não é suportado com rank_by_relevance.")
+    after, descending = _decode_cursor(cursor)
+    if descending != _is_descending(date_from_local, date_to_local):
+        raise ValueError("cursor não corresponde aos filtros da consulta.")
+    return after
+
+
+def _check_limit(nome: str, valor: int, maximo: Optional[int] = None):
+    """Mesma regra do schema (ge=1, le=maximo) para quem chama as funções direto."""
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor < 1 or (maximo is not None and valor > maximo):
+        faixa = f"entre 1 e {maximo}" if maximo is not None else "maior ou igual a 1"
+        raise ValueError(f"{nome} deve ser um inteiro {faixa} (recebido {valor!r}).")
+
+
+def _page_result(rows: list, limit: int, descending: bool, pageable: bool = True) -> dict:
+    # A consulta pede limit + 1 linhas: a sobra só indica que existe próxima página
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if pageable:
+            next_cursor = _encode_cursor(rows[-1][-1], rows[-1][0], descending)
+    return {"transactions": [tuple(r[:-1]) for r in rows], "next_cursor": next_cursor}
+
+
+def _build_update_transaction(
+    target_id: int,
+    amount: Optional[float],
+    resolved_type_id: Optional[int],
+    resolved_category_id: Optional[int],
+    description: Optional[str],
+    payment_method: Optional[str],
+    occurred_at: Optional[str],
+) -> Tuple[Optional[str], List[object]]:
+    # Montar SET dinâmico
+    sets = []
+    params: List[object] = []
+    if amount is not None:
+        sets.append("amount = %s")
+        params.append(amount)
+    if resolved_type_id is not None:
+        sets.append("type = %s")
+        params.append(resolved_type_id)
+    if resolved_category_id is not None:
+        sets.append("category_id = %s")
+        params.append(resolved_category_id)
+    if description is not None:
+        sets.append("description = %s")
+        params.append(description)
+    if payment_method is not None:
+        sets.append("payment_method = %s")
+        params.append(payment_method)
+    if occurred_at is not None:
+        sets.append("occurred_at = %s::timestamptz")
+        params.append(occurred_at)
+
+    if not sets:
+        return None, params
+
+    params.append(target_id)
+    return f"UPDATE transactions SET {', '.join(sets)} WHERE id = %s;", params
+
+
+def _updated_row(r) -> Optional[dict]:
+    if not r:
+        return None
+    return {
+        "id": r[0],
+        "occurred_at": str(r[1]),
+        "amount": float(r[2]),
+        "type": r[3],
+        "category": r[4],
+        "description": r[5],
+        "payment_method": r[6],
+        "source_text": r[7],
+    }
+
+
 @tool("add_transaction", args_schema=AddTransactionArgs)
 def add_transaction(
     amount: float,
@@ -172,27 +537,20 @@ def add_transaction(
     payment_method: Optional[str] = None,
 ) -> dict:
     """Insere uma transação financeira no banco de dados Postgres."""
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        resolved_type_id = _resolve_type_id(cur, type_id, type_name)
-        if not resolved_type_id:
-            return {
-                "status": "error",
-                "message": "Tipo inválido (use type_id ou type_name: INCOME/EXPENSES/TRANSFER).",
-            }
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            resolved_type_id = _resolve_type_id(cur, type_id, type_name)
+            if not resolved_type_id:
+                return {
+                    "status": "error",
+                    "message": "Tipo inválido (use type_id ou type_name: INCOME/EXPENSES/TRANSFER).",
+                }
 
-        resolve_category_id = _resolve_category_id(cur, category_id, category_name)
+            resolve_category_id = _resolve_category_id(cur, category_id, category_name)
 
-        if occurred_at:
             cur.execute(
-                """
-                INSERT INTO transactions
-                    (amount, type, category_id, description, payment_method, occurred_at, source_text)
-                VALUES
-                    (%s, %s, %s, %s, %s, %s::timestamptz, %s)
-                RETURNING id, occurred_at;
-                """,
+                SQL_INSERT_TRANSACTION,
                 (
                     amount,
                     resolved_type_id,
@@ -203,40 +561,63 @@ def add_transaction(
                     source_text,
                 ),
             )
-        else:
-            cur.execute(
-                """
-                INSERT INTO transactions
-                    (amount, type, category_id, description, payment_method, occurred_at, source_text)
-                VALUES
-                    (%s, %s, %s, %s, %s, NOW(), %s)
-                RETURNING id, occurred_at;
-                """,
-                (
-                    amount,
-                    resolved_type_id,
-                    category_id,
-                    description,
-                    payment_method,
-                    source_text,
-                ),
-            )
 
+            new_id, occurred = cur.fetchone() or [None, None]
 
-        new_id, occurred = cur.fetchone() or [None, None]
+            conn.commit()
+            return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
 
-        conn.commit()
-        return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
-
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
-        try:
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+
+async def _aadd_transaction(
+    amount: float,
+    source_text: str,
+    occurred_at: Optional[str] = None,
+    type_id: Optional[int] = None,
+    type_name: Optional[str] = None,
+    category_id: Optional[int] = None,
+    category_name: Optional[str] = None,
+    description: Optional[str] = None,
+    payment_method: Optional[str] = None,
+) -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                resolved_type_id = await _aresolve_type_id(cur, type_id, type_name)
+                if not resolved_type_id:
+                    return {
+                        "status": "error",
+                        "message": "Tipo inválido (use type_id ou type_name: INCOME/EXPENSES/TRANSFER).",
+                    }
+
+                resolve_category_id = await _aresolve_category_id(cur, category_id, category_name)
+
+                await cur.execute(
+                    SQL_INSERT_TRANSACTION,
+                    (
+                        amount,
+                        resolved_type_id,
+                        resolve_category_id,
+                        description,
+                        payment_method,
+                        occurred_at,
+                        source_text,
+                    ),
+                )
+
+                new_id, occurred = await cur.fetchone() or [None, None]
+
+                await conn.commit()
+                return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
+
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
 
 
 @tool("add_workout", args_schema=AddWorkoutArgs)
@@ -247,46 +628,43 @@ def add_workout(
     duration_min: Optional[int] = None,
 ) -> dict:
     """Insere um treino no banco de dados Postgres."""
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        if scheduled_at:
-            cur.execute(
-                """
-                INSERT INTO workouts (title, notes, scheduled_at, duration_min, source_text)
-                VALUES (%s, %s, %s::timestamptz, %s, %s)
-                RETURNING id, scheduled_at;
-                """,
-                (title, notes, scheduled_at, duration_min, title),
-            )
-        else:
-            cur.execute(
-                """
-                INSERT INTO workouts (title, notes, scheduled_at, duration_min, source_text)
-                VALUES (%s, %s, NOW(), %s, %s)
-                RETURNING id, scheduled_at;
-                """,
-                (title, notes, duration_min, title),
-            )
-
-        row = cur.fetchone()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_INSERT_WORKOUT, (title, notes, scheduled_at, duration_min, title))
 
-        if row is not None:
-            new_id, scheduled = row
-        else:
-            new_id, scheduled = None, None
+            row = cur.fetchone()
 
-        conn.commit()
-        return {"status": "ok", "id": new_id, "scheduled_at": str(scheduled)}
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
-        try:
+            if row is not None:
+                new_id, scheduled = row
+            else:
+                new_id, scheduled = None, None
+
+            conn.commit()
+            return {"status": "ok", "id": new_id, "scheduled_at": str(scheduled)}
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+
+async def _aadd_workout(
+    title: str,
+    notes: Optional[str] = None,
+    scheduled_at: Optional[str] = None,
+    duration_min: Optional[int] = None,
+) -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                await cur.execute(SQL_INSERT_WORKOUT, (title, notes, scheduled_at, duration_min, title))
+                new_id, scheduled = await cur.fetchone() or [None, None]
+                await conn.commit()
+                return {"status": "ok", "id": new_id, "scheduled_at": str(scheduled)}
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
 
 
 @tool("add_meal", args_schema=AddMealArgs)
@@ -296,51 +674,47 @@ def add_meal(
     notes: Optional[str] = None,
 ) -> dict:
     """Insere uma refeição no banco de dados Postgres."""
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        if occurred_at:
-            cur.execute(
-                """
-                INSERT INTO meals (title, occurred_at, notes, source_text)
-                VALUES (%s, %s::timestamptz, %s, %s)
-                RETURNING id, occurred_at;
-                """,
-                (title, occurred_at, notes, title),
-            )
-        else:
-            cur.execute(
-                """
-                INSERT INTO meals (title, occurred_at, notes, source_text)
-                VALUES (%s, NOW(), %s, %s)
-                RETURNING id, occurred_at;
-                """,
-                (title, notes, title),
-            )
-
-        row = cur.fetchone()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(SQL_INSERT_MEAL, (title, occurred_at, notes, title))
 
-        if row is not None:
-            new_id, occurred = row
-        else:
-            new_id, occurred = None, None
+            row = cur.fetchone()
 
-        conn.commit()
-        return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
-        try:
+            if row is not None:
+                new_id, occurred = row
+            else:
+                new_id, occurred = None, None
+
+            conn.commit()
+            return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+
+async def _aadd_meal(
+    title: str,
+    occurred_at: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                await cur.execute(SQL_INSERT_MEAL, (title, occurred_at, notes, title))
+                new_id, occurred = await cur.fetchone() or [None, None]
+                await conn.commit()
+                return {"status": "ok", "id": new_id, "occurred_at": str(occurred)}
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
 
 @tool(
     "query_transactions",
     args_schema=QueryTransactionsArgs,
-    description="Consulta transações no banco com filtros opcionais"
+    description="Consulta transações no banco com filtros opcionais. Para a próxima página, repita a consulta com cursor=next_cursor."
 )
 def query_transactions(
     text: Optional[str] = None,
@@ -348,61 +722,114 @@ def query_transactions(
     date_local: Optional[str] = None,
     date_from_local: Optional[str] = None,
     date_to_local: Optional[str] = None,
-    limit: int = 20
+    limit: int = 20,
+    rank_by_relevance: bool = False,
+    cursor: Optional[str] = None,
 ) -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    filters = []
-    params = []
-
-    conditions = [
-        (text, "(source_text ILIKE %s OR description ILIKE %s)", lambda v: [f"%{v}%", f"%{v}%"]),
-        (type_name, "type = (SELECT id FROM transaction_types WHERE type ILIKE %s)", lambda v: [v]),
-        (date_local, "(occurred_at AT TIME ZONE 'America/Sao_Paulo')::date = %s::date", lambda v: [v]),
-        ((date_from_local, date_to_local) if date_from_local and date_to_local else None,
-        "(occurred_at AT TIME ZONE 'America/Sao_Paulo')::date BETWEEN %s::date AND %s::date",
-        lambda v: list(v) if v else [])
-    ]
-
-    for val, sql, to_params in conditions:
-        if val:
-            filters.append(sql)
-            params.extend(to_params(val))
-
-        where_clause = " AND ".join(filters)
-        if where_clause:
-            where_clause = "WHERE " + where_clause
-
-        order_clause = "ORDER BY occurred_at ASC" if date_from_local or date_to_local else "ORDER BY occurred_at DESC"
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            _check_limit("limit", limit, QUERY_LIMIT_MAX)
+            after = _resolve_page_cursor(cursor, rank_by_relevance, date_from_local, date_to_local)
+            query, params = _build_query_transactions(
+                text, type_name, date_local, date_from_local, date_to_local, limit + 1, rank_by_relevance, after
+            )
+            cur.execute(query, params)
+            results = cur.fetchall()
 
-    try:
-        query = f"""
-            SELECT t.id, t.amount, tt.type, t.category_id, t.description, t.payment_method,
-                t.occurred_at AT TIME ZONE 'America/Sao_Paulo' AS occurred_local,
-                t.source_text
-            FROM transactions t
-            JOIN transaction_types tt ON t.type = tt.id
-            {where_clause}
-            {order_clause}
-            LIMIT %s
-        """
-        params.append(limit)
+            return _page_result(
+                results, limit, _is_descending(date_from_local, date_to_local), not rank_by_relevance
+            )
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
+            cur.close()
 
-        cur.execute(query, params)
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
 
-        return {"transactions": results}
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
+async def _aquery_transactions(
+    text: Optional[str] = None,
+    type_name: Optional[str] = None,
+    date_local: Optional[str] = None,
+    date_from_local: Optional[str] = None,
+    date_to_local: Optional[str] = None,
+    limit: int = 20,
+    rank_by_relevance: bool = False,
+    cursor: Optional[str] = None,
+) -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                _check_limit("limit", limit, QUERY_LIMIT_MAX)
+                after = _resolve_page_cursor(cursor, rank_by_relevance, date_from_local, date_to_local)
+                query, params = _build_query_transactions(
+                    text, type_name, date_local, date_from_local, date_to_local, limit + 1, rank_by_relevance, after
+                )
+                await cur.execute(query, params)
+                return _page_result(
+                    await cur.fetchall(), limit, _is_descending(date_from_local, date_to_local), not rank_by_relevance
+                )
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
+
+
+STREAM_BATCH_SIZE = 2000
+
+
+def iter_transactions(
+    text: Optional[str] = None,
+    type_name: Optional[str] = None,
+    date_local: Optional[str] = None,
+    date_from_local: Optional[str] = None,
+    date_to_local: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[list]:
+    """
+    Percorre todas as transações dos filtros com um cursor nomeado (server-side),
+    entregando lotes de até `batch_size` linhas. Para exportação/análises: a memória
+    fica limitada ao lote. Mantém uma conexão do pool emprestada enquanto é consumido.
+    """
+    _check_limit("batch_size", batch_size)
+    query, params = _build_query_transactions(
+        text, type_name, date_local, date_from_local, date_to_local, None
+    )
+    with get_conn() as conn:
+        cur = conn.cursor(name="stream_transactions")
         try:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(r[:-1]) for r in rows]
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+            conn.rollback()
+
+
+async def aiter_transactions(
+    text: Optional[str] = None,
+    type_name: Optional[str] = None,
+    date_local: Optional[str] = None,
+    date_from_local: Optional[str] = None,
+    date_to_local: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> AsyncIterator[list]:
+    """Versão async de iter_transactions (cursor server-side do psycopg 3)."""
+    _check_limit("batch_size", batch_size)
+    query, params = _build_query_transactions(
+        text, type_name, date_local, date_from_local, date_to_local, None
+    )
+    async with aget_conn() as conn:
+        async with conn.transaction():
+            async with conn.cursor(name="stream_transactions") as cur:
+                await cur.execute(query, params)
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [tuple(r[:-1]) for r in rows]
 
 @tool(
     "total_balance",
@@ -410,36 +837,40 @@ def query_transactions(
     description="Retorna o saldo total considerando todas as transações, ignorando transferências (type = 3)."
 )
 def total_balance() -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        query = """
-        SELECT
-            COALESCE(SUM(CASE WHEN type = 1 THEN amount ELSE 0 END), 0) AS total_income,
-            COALESCE(SUM(CASE WHEN type = 2 THEN amount ELSE 0 END), 0) AS total_expenses
-        FROM transactions
-        WHERE type != 3
-        """
-        cur.execute(query)
-        row = cur.fetchone() or [0, 0]
-        total_income, total_expenses = float(row[0]), float(row[1])
-        cur.close()
-        conn.close()
-
-        return {
-            "total_income": total_income,
-            "total_expenses": total_expenses,
-            "balance": total_expenses - total_income
-        }
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
+    with get_conn() as conn:
+        cur = conn.cursor()
         try:
+            cur.execute(SQL_TOTAL_BALANCE)
+            row = cur.fetchone() or [0, 0]
+            total_income, total_expenses = float(row[0]), float(row[1])
+
+            return {
+                "total_income": total_income,
+                "total_expenses": total_expenses,
+                "balance": total_income - total_expenses
+            }
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+
+async def _atotal_balance() -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                await cur.execute(SQL_TOTAL_BALANCE)
+                row = await cur.fetchone() or [0, 0]
+                total_income, total_expenses = float(row[0]), float(row[1])
+                return {
+                    "total_income": total_income,
+                    "total_expenses": total_expenses,
+                    "balance": total_income - total_expenses
+                }
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
 
 @tool(
     "daily_balance",
@@ -447,38 +878,42 @@ def total_balance() -> dict:
     description="Retorna o saldo do dia informado (YYYY-MM-DD) em America/Sao_Paulo, considerando receitas e despesas e ignorando transferências (type = 3)."
 )
 def daily_balance(date_local: str) -> dict:
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        query = """
-        SELECT
-            COALESCE(SUM(CASE WHEN type = 1 THEN amount ELSE 0 END), 0) AS total_income,
-            COALESCE(SUM(CASE WHEN type = 2 THEN amount ELSE 0 END), 0) AS total_expenses
-        FROM transactions
-        WHERE (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date = %s
-        AND type != 3
-        """
-        cur.execute(query, (date_local,))
-        row = cur.fetchone() or [0, 0]
-        total_income, total_expenses = float(row[0]), float(row[1])
-        cur.close()
-        conn.close()
-
-        return {
-            "date_local": date_local,
-            "total_income": total_income,
-            "total_expenses": total_expenses,
-            "balance": total_income - total_expenses
-        }
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
+    with get_conn() as conn:
+        cur = conn.cursor()
         try:
+            cur.execute(SQL_DAILY_BALANCE, (date.fromisoformat(date_local),))
+            row = cur.fetchone() or [0, 0]
+            total_income, total_expenses = float(row[0]), float(row[1])
+
+            return {
+                "date_local": date_local,
+                "total_income": total_income,
+                "total_expenses": total_expenses,
+                "balance": total_income - total_expenses
+            }
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
+
+
+async def _adaily_balance(date_local: str) -> dict:
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                await cur.execute(SQL_DAILY_BALANCE, (date.fromisoformat(date_local),))
+                row = await cur.fetchone() or [0, 0]
+                total_income, total_expenses = float(row[0]), float(row[1])
+                return {
+                    "date_local": date_local,
+                    "total_income": total_income,
+                    "total_expenses": total_expenses,
+                    "balance": total_income - total_expenses
+                }
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
 
 @tool("update_transaction", args_schema=UpdateTransactionArgs)
 def update_transaction(
@@ -505,117 +940,300 @@ def update_transaction(
     if not any([amount, type_id, type_name, category_id, category_name, description, payment_method, occurred_at]):
         return {"status": "error", "message": "Nada para atualizar: forneÃ§a pelo menos um campo (amount, type, category, description, payment_method, occurred_at)."}
 
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        # Resolve target_id
-        target_id = id
-        if target_id is None:
-            if not match_text or not date_local:
-                return {"status": "error", "message": "Sem 'id': informe match_text E date_local para localizar o registro."}
-
-            # Buscar o mais recente no dia local informado que combine o texto
-            cur.execute(
-                f"""
-                SELECT
-                    t.id
-                FROM transactions t
-                WHERE (t.source_text ILIKE %s OR t.description ILIKE %s)
-                AND 
-                    (t.occurred_at AT TIME ZONE 'America/Sao_Paulo')::date = %s
-                ORDER BY t.occurred_at DESC
-                LIMIT 1;
-                """,
-                (f"%{match_text}%", f"%{match_text}%", date_local)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            # Resolve target_id
+            target_id = id
+            if target_id is None:
+                if not match_text or not date_local:
+                    return {"status": "error", "message": "Sem 'id': informe match_text E date_local para localizar o registro."}
+
+                # Buscar o mais recente no dia local informado que combine o texto
+                cur.execute(
+                    SQL_FIND_TRANSACTION,
+                    (_like_escape(match_text), *local_day_range(date_local))
+                )
+                row = cur.fetchone()
+                if not row:
+                    return {"status": "error", "message": "Nenhuma transaÃ§Ã£o encontrada para os filtros fornecidos."}
+                target_id = row[0]
+
+            # Resolver type_id / category_id a partir de nomes, se fornecidos
+            resolved_type_id = _resolve_type_id(cur, type_id, type_name) if (type_id or type_name) else None
+            resolved_category_id = category_id
+            if category_name and not category_id:
+                resolved_category_id = _resolve_category_id(cur, category_name=category_name)
+
+            query, params = _build_update_transaction(
+                target_id, amount, resolved_type_id, resolved_category_id,
+                description, payment_method, occurred_at,
             )
-            row = cur.fetchone()
-            if not row:
-                return {"status": "error", "message": "Nenhuma transaÃ§Ã£o encontrada para os filtros fornecidos."}
-            target_id = row[0]
-
-        # Resolver type_id / category_id a partir de nomes, se fornecidos
-        resolved_type_id = _resolve_type_id(cur, type_id, type_name) if (type_id or type_name) else None
-        resolved_category_id = category_id
-        if category_name and not category_id:
-            resolved_category_id = _resolve_category_id(cur, category_name)
-
-        # Montar SET dinÃ¢mico
-        sets = []
-        params: List[object] = []
-        if amount is not None:
-            sets.append("amount = %s")
-            params.append(amount)
-        if resolved_type_id is not None:
-            sets.append("type = %s")
-            params.append(resolved_type_id)
-        if resolved_category_id is not None:
-            sets.append("category_id = %s")
-            params.append(resolved_category_id)
-        if description is not None:
-            sets.append("description = %s")
-            params.append(description)
-        if payment_method is not None:
-            sets.append("payment_method = %s")
-            params.append(payment_method)
-        if occurred_at is not None:
-            sets.append("occurred_at = %s::timestamptz")
-            params.append(occurred_at)
-
-        if not sets:
-            return {"status": "error", "message": "Nenhum campo vÃ¡lido para atualizar."}
-
-        params.append(target_id)
-
-        cur.execute(
-            f"UPDATE transactions SET {', '.join(sets)} WHERE id = %s;",
-            params
-        )
-        rows_affected = cur.rowcount
-        conn.commit()
-
-        # Retornar o registro atualizado
-        cur.execute(
-            """
-            SELECT
-              t.id, t.occurred_at, t.amount, tt.type AS type_name,
-              c.name AS category_name, t.description, t.payment_method, t.source_text
-            FROM transactions t
-            JOIN transaction_types tt ON tt.id = t.type
-            LEFT JOIN categories c ON c.id = t.category_id
-            WHERE t.id = %s;
-            """,
-            (target_id,)
-        )
-        r = cur.fetchone()
-        updated = None
-        if r:
-            updated = {
-                "id": r[0],
-                "occurred_at": str(r[1]),
-                "amount": float(r[2]),
-                "type": r[3],
-                "category": r[4],
-                "description": r[5],
-                "payment_method": r[6],
-                "source_text": r[7],
+            if query is None:
+                return {"status": "error", "message": "Nenhum campo vÃ¡lido para atualizar."}
+
+            cur.execute(query, params)
+            rows_affected = cur.rowcount
+            conn.commit()
+
+            # Retornar o registro atualizado
+            cur.execute(SQL_SELECT_TRANSACTION, (target_id,))
+            updated = _updated_row(cur.fetchone())
+
+            return {
+                "status": "ok",
+                "rows_affected": rows_affected,
+                "id": target_id,
+                "updated": updated
             }
 
-        return {
-            "status": "ok",
-            "rows_affected": rows_affected,
-            "id": target_id,
-            "updated": updated
-        }
-
-    except Exception as e:
-        conn.rollback()
-        return {"status": "error", "message": str(e)}
-    finally:
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
+            cur.close()
+
+
+async def _aupdate_transaction(
+    id: Optional[int] = None,
+    match_text: Optional[str] = None,
+    date_local: Optional[str] = None,
+    amount: Optional[float] = None,
+    type_id: Optional[int] = None,
+    type_name: Optional[str] = None,
+    category_id: Optional[int] = None,
+    category_name: Optional[str] = None,
+    description: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    occurred_at: Optional[str] = None,
+) -> dict:
+    if not any([amount, type_id, type_name, category_id, category_name, description, payment_method, occurred_at]):
+        return {"status": "error", "message": "Nada para atualizar: forneÃ§a pelo menos um campo (amount, type, category, description, payment_method, occurred_at)."}
+
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                target_id = id
+                if target_id is None:
+                    if not match_text or not date_local:
+                        return {"status": "error", "message": "Sem 'id': informe match_text E date_local para localizar o registro."}
+
+                    await cur.execute(
+                        SQL_FIND_TRANSACTION,
+                        (_like_escape(match_text), *local_day_range(date_local))
+                    )
+                    row = await cur.fetchone()
+                    if not row:
+                        return {"status": "error", "message": "Nenhuma transaÃ§Ã£o encontrada para os filtros fornecidos."}
+                    target_id = row[0]
+
+                resolved_type_id = await _aresolve_type_id(cur, type_id, type_name) if (type_id or type_name) else None
+                resolved_category_id = category_id
+                if category_name and not category_id:
+                    resolved_category_id = await _aresolve_category_id(cur, category_name=category_name)
+
+                query, params = _build_update_transaction(
+                    target_id, amount, resolved_type_id, resolved_category_id,
+                    description, payment_method, occurred_at,
+                )
+                if query is None:
+                    return {"status": "error", "message": "Nenhum campo vÃ¡lido para atualizar."}
+
+                await cur.execute(query, params)
+                rows_affected = cur.rowcount
+                await conn.commit()
+
+                await cur.execute(SQL_SELECT_TRANSACTION, (target_id,))
+                updated = _updated_row(await cur.fetchone())
+
+                return {
+                    "status": "ok",
+                    "rows_affected": rows_affected,
+                    "id": target_id,
+                    "updated": updated
+                }
+
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
+
+
+SQL_INSERT_TRANSACTIONS_BULK = """
+    INSERT INTO transactions
+        (amount, type, category_id, description, payment_method, occurred_at, source_text)
+    VALUES %s
+    RETURNING id, occurred_at;
+"""
+
+BULK_ROW_TEMPLATE = "(%s, %s, %s, %s, %s, COALESCE(%s::timestamptz, NOW()), %s)"
+
+
+def _coerce_bulk_items(transactions, results: list) -> list:
+    """Valida cada item (dict ou AddTransactionArgs); inválidos já vão para `results`."""
+    items = []
+    for idx, t in enumerate(transactions):
+        try:
+            items.append((idx, t if isinstance(t, AddTransactionArgs) else AddTransactionArgs(**t)))
+        except Exception as e:
+            results[idx] = {"index": idx, "status": "error", "message": str(e)}
+    return items
+
+
+def _bulk_values(t: AddTransactionArgs, type_id: int, category_id: Optional[int]) -> tuple:
+    # Mesma ordem de parâmetros de SQL_INSERT_TRANSACTION / BULK_ROW_TEMPLATE
+    return (t.amount, type_id, category_id, t.description, t.payment_method, t.occurred_at, t.source_text)
+
+
+def _bulk_ok(idx: int, new_id, occurred) -> dict:
+    return {"index": idx, "status": "ok", "id": new_id, "occurred_at": str(occurred)}
+
+
+def _bulk_summary(results: list) -> dict:
+    inserted = sum(1 for r in results if r["status"] == "ok")
+    failed = len(results) - inserted
+    if not failed:
+        status = "ok"
+    elif inserted:
+        status = "partial"
+    else:
+        status = "error"
+    return {"status": status, "inserted": inserted, "failed": failed, "results": results}
+
+
+INVALID_TYPE_MESSAGE = "Tipo inválido (use type_id ou type_name: INCOME/EXPENSES/TRANSFER)."
+
+
+def insert_transactions_bulk(transactions: list) -> dict:
+    """
+    Insere várias transações numa única transação do banco.
+    Tipos/categorias são resolvidos pelo cache de lookups e as linhas vão num só
+    INSERT ... VALUES ... RETURNING. Se alguma linha for rejeitada pelo banco, o lote
+    é refeito linha a linha com SAVEPOINT para reportar exatamente quais falharam.
+    Retorna: status ("ok" | "partial" | "error"), inserted, failed e results por linha (index).
+    """
+    results = [None] * len(transactions)
+    items = _coerce_bulk_items(transactions, results)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
         try:
+            rows = []
+            for idx, t in items:
+                resolved_type_id = _resolve_type_id(cur, t.type_id, t.type_name)
+                if not resolved_type_id:
+                    results[idx] = {"index": idx, "status": "error", "message": INVALID_TYPE_MESSAGE}
+                    continue
+                resolved_category_id = _resolve_category_id(cur, t.category_id, t.category_name)
+                rows.append((idx, _bulk_values(t, resolved_type_id, resolved_category_id)))
+
+            if rows:
+                try:
+                    # RETURNING devolve as linhas na ordem do VALUES
+                    inserted = execute_values(
+                        cur,
+                        SQL_INSERT_TRANSACTIONS_BULK,
+                        [values for _, values in rows],
+                        template=BULK_ROW_TEMPLATE,
+                        page_size=len(rows),
+                        fetch=True,
+                    )
+                    for (idx, _), (new_id, occurred) in zip(rows, inserted):
+                        results[idx] = _bulk_ok(idx, new_id, occurred)
+                except Exception:
+                    conn.rollback()
+                    for idx, values in rows:
+                        cur.execute("SAVEPOINT bulk_row;")
+                        try:
+                            cur.execute(SQL_INSERT_TRANSACTION, values)
+                            new_id, occurred = cur.fetchone()
+                            cur.execute("RELEASE SAVEPOINT bulk_row;")
+                            results[idx] = _bulk_ok(idx, new_id, occurred)
+                        except Exception as e:
+                            cur.execute("ROLLBACK TO SAVEPOINT bulk_row;")
+                            results[idx] = {"index": idx, "status": "error", "message": str(e)}
+
+            conn.commit()
+            return _bulk_summary(results)
+        except Exception as e:
+            conn.rollback()
+            return {"status": "error", "message": str(e)}
+        finally:
             cur.close()
-            conn.close()
-        except Exception:
-            pass
 
 
-TOOLS = [add_transaction, add_workout, add_meal, query_transactions, total_balance, daily_balance]
+async def ainsert_transactions_bulk(transactions: list) -> dict:
+    """Versão async de insert_transactions_bulk (executemany em pipeline do psycopg 3)."""
+    results = [None] * len(transactions)
+    items = _coerce_bulk_items(transactions, results)
+
+    async with aget_conn() as conn:
+        async with conn.cursor() as cur:
+            try:
+                rows = []
+                for idx, t in items:
+                    resolved_type_id = await _aresolve_type_id(cur, t.type_id, t.type_name)
+                    if not resolved_type_id:
+                        results[idx] = {"index": idx, "status": "error", "message": INVALID_TYPE_MESSAGE}
+                        continue
+                    resolved_category_id = await _aresolve_category_id(cur, t.category_id, t.category_name)
+                    rows.append((idx, _bulk_values(t, resolved_type_id, resolved_category_id)))
+
+                if rows:
+                    try:
+                        inserted = []
+                        await cur.executemany(
+                            SQL_INSERT_TRANSACTION, [values for _, values in rows], returning=True
+                        )
+                        while True:
+                            inserted.append(await cur.fetchone())
+                            if not cur.nextset():
+                                break
+                        for (idx, _), (new_id, occurred) in zip(rows, inserted):
+                            results[idx] = _bulk_ok(idx, new_id, occurred)
+                    except Exception:
+                        await conn.rollback()
+                        # Uma transação externa para o lote inteiro; cada linha num
+                        # conn.transaction() aninhado, que o psycopg 3 faz com SAVEPOINT
+                        async with conn.transaction():
+                            for idx, values in rows:
+                                try:
+                                    async with conn.transaction():
+                                        await cur.execute(SQL_INSERT_TRANSACTION, values)
+                                        new_id, occurred = await cur.fetchone()
+                                    results[idx] = _bulk_ok(idx, new_id, occurred)
+                                except Exception as e:
+                                    results[idx] = {"index": idx, "status": "error", "message": str(e)}
+
+                await conn.commit()
+                return _bulk_summary(results)
+            except Exception as e:
+                await conn.rollback()
+                return {"status": "error", "message": str(e)}
+
+
+@tool(
+    "add_transactions_bulk",
+    args_schema=AddTransactionsBulkArgs,
+    description="Insere várias transações de uma vez (ex.: extrato colado pelo usuário) e reporta o resultado de cada linha."
+)
+def add_transactions_bulk(transactions: List[AddTransactionArgs]) -> dict:
+    return insert_transactions_bulk(transactions)
+
+
+async def _aadd_transactions_bulk(transactions: List[AddTransactionArgs]) -> dict:
+    return await ainsert_transactions_bulk(transactions)
+
+
+# Registra as versões async nas mesmas tools: .invoke() usa psycopg2 + pool síncrono,
+# .ainvoke() (AgentExecutor/LangGraph async) usa psycopg 3 + pool async.
+add_transaction.coroutine = _aadd_transaction
+add_workout.coroutine = _aadd_workout
+add_meal.coroutine = _aadd_meal
+query_transactions.coroutine = _aquery_transactions
+total_balance.coroutine = _atotal_balance
+daily_balance.coroutine = _adaily_balance
+update_transaction.coroutine = _aupdate_transaction
+add_transactions_bulk.coroutine = _aadd_transactions_bulk
+
+
+TOOLS = [add_transaction, add_transactions_bulk, add_workout, add_meal, query_transactions, total_balance, daily_balance]
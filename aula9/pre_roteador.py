@@ -0,0 +1,292 @@
+"""
+Pré-roteador local (sem LLM) na frente do chain_roteador.
+
+Regras por palavra-chave + classificador TF-IDF/regressão logística treinado em
+dados/rotas_treino.jsonl. Quando a decisão é confiável devolve a mesma saída do
+roteador (ROUTE=...) ou a saudação pronta; senão devolve None e o router_node segue
+para o LLM. fora_escopo nunca é respondido aqui: a resposta depende do LLM. Também ficam
+com o LLM as rotas sem nó no grafo (academia, alimentacao) e as mensagens em que ele
+pede esclarecimento (CLARIFY), como "Agendar pagamento amanhã às 9h".
+
+Uso (avaliação em dados/rotas_eval.jsonl):
+    python pre_roteador.py                  # acurácia/cobertura por limiar
+    python pre_roteador.py --limiar 0.6
+    python pre_roteador.py --com-llm        # compara com o roteador LLM (chama a API)
+"""
+from prompt_agentes import system_prompt_roteador, shots_roteador, today
+from typing import List, Optional, Set, Tuple
+from dotenv import load_dotenv
+import unicodedata
+import threading
+import argparse
+import json
+import time
+import sys
+import os
+import re
+
+load_dotenv()
+
+# Probabilidade mínima do classificador para pular o LLM
+PRE_ROUTER_THRESHOLD = float(os.getenv("PRE_ROUTER_THRESHOLD", "0.6"))
+PRE_ROUTER_ENABLED = os.getenv("PRE_ROUTER_ENABLED", "1") != "0"
+
+DADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+TREINO_PATH = os.path.join(DADOS_DIR, "rotas_treino.jsonl")
+EVAL_PATH = os.path.join(DADOS_DIR, "rotas_eval.jsonl")
+
+SAUDACAO = "saudacao"
+FORA_ESCOPO = "fora_escopo"
+# Rótulo do eval para mensagens em que o roteador pede esclarecimento em vez de rotear
+CLARIFY = "clarify"
+
+# Rotas com nó no grafo (router_node recusa as demais)
+ROTAS_GRAFO = {"financeiro", "agenda", "faq"}
+
+RESPOSTA_SAUDACAO = shots_roteador[0]["ai"]
+PERSONA_SISTEMA = (
+    system_prompt_roteador[1].split("### PERSONA SISTEMA", 1)[1].split("### PAPEL", 1)[0].strip()
+    .replace("{today_local}", today.date().isoformat())
+)
+
+
+def normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFD", texto.strip().lower())
+    return "".join(c for c in texto if unicodedata.category(c) != "Mn")
+
+
+# Regras sobre o texto normalizado (sem acento, minúsculo). Só decidem quando
+# exatamente uma rota casa; conflito (ex.: "refeição pós-treino") vai ao LLM.
+REGRAS = [
+    (SAUDACAO, re.compile(
+        r"^(oi+|ola|opa|ei|hey|e ai|fala|bom dia|boa tarde|boa noite|tudo (bem|certo|bom))"
+        r"([ ,]+(jarvis|tudo (bem|certo|bom)|beleza|boa noite|bom dia|boa tarde))*[\s!?.]*$"
+    )),
+    ("financeiro", re.compile(
+        r"\b(gastei|paguei|recebi|ganhei|transferi|comprei|lanca|lancar)\b.*\d|r\$\s*\d|\bsaldo\b|\b\d+([.,]\d+)? reais\b"
+    )),
+    ("agenda", re.compile(r"\b(reuniao|compromissos?|agendar|agenda|lembrete|me lembra|remarcar|desmarcar?)\b")),
+    ("academia", re.compile(r"\b(treinos?|treinar|treinei|academia|musculacao|series|agachamento)\b")),
+    ("alimentacao", re.compile(r"\b(refeica?o|refeicoes|cardapio|calorias?|dieta|cafe da manha)\b")),
+]
+
+
+# Termos que sozinhos não decidem a rota, mas contam como domínio no conflito:
+# "agendar pagamento" pode ser lançamento ou compromisso e o roteador LLM pergunta
+PISTAS = [
+    ("financeiro", re.compile(r"\b(pagamentos?|pagar|pagto|boletos?|faturas?|pix|transferencias?|transferir)\b")),
+]
+
+# Pedidos que o roteador LLM encaminha com CLARIFY preenchido (ver shots_roteador)
+PEDEM_CLARIFY = re.compile(r"\b(investir|investimentos?|cripto\w*|acoes|renda fixa)\b")
+
+
+def _rotas(regras, texto_norm: str) -> Set[str]:
+    return {rota for rota, padrao in regras if padrao.search(texto_norm)}
+
+
+def ambigua(texto_norm: str) -> bool:
+    """True quando a mensagem toca mais de um domínio ou pede esclarecimento."""
+    if PEDEM_CLARIFY.search(texto_norm):
+        return True
+    return len(_rotas(REGRAS, texto_norm) | _rotas(PISTAS, texto_norm)) > 1
+
+
+def aplicar_regras(texto_norm: str) -> Optional[str]:
+    rotas = _rotas(REGRAS, texto_norm)
+    if len(rotas) == 1:
+        return rotas.pop()
+    return None
+
+
+def _ler_jsonl(caminho: str) -> List[dict]:
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+class Classificador:
+    """TF-IDF (n-gramas de caracteres, robusto a erros de digitação) + regressão logística, treinado no primeiro uso."""
+
+    def __init__(self, caminho: str = TREINO_PATH):
+        self.caminho = caminho
+        self._modelo = None
+        self._lock = threading.Lock()
+        self.disponivel = True
+
+    def _treinar(self):
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.pipeline import make_pipeline
+        except ImportError:
+            # Sem scikit-learn o pré-roteador fica só com as regras
+            self.disponivel = False
+            return None
+        exemplos = _ler_jsonl(self.caminho)
+        modelo = make_pipeline(
+            TfidfVectorizer(preprocessor=normalizar, analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True),
+            LogisticRegression(C=20, max_iter=2000),
+        )
+        modelo.fit([e["texto"] for e in exemplos], [e["rota"] for e in exemplos])
+        return modelo
+
+    def prever(self, texto: str) -> Tuple[Optional[str], float]:
+        if self._modelo is None and self.disponivel:
+            with self._lock:
+                if self._modelo is None and self.disponivel:
+                    self._modelo = self._treinar()
+        if self._modelo is None:
+            return None, 0.0
+        probs = self._modelo.predict_proba([texto])[0]
+        i = probs.argmax()
+        return str(self._modelo.classes_[i]), float(probs[i])
+
+
+_classificador = Classificador()
+
+
+def classificar(texto: str) -> Tuple[Optional[str], float, Optional[str]]:
+    """(rota, confiança, origem) com origem "regra" ou "modelo"; rota None se nada decidiu."""
+    texto_norm = normalizar(texto)
+    if ambigua(texto_norm):
+        return None, 0.0, None
+    rota = aplicar_regras(texto_norm)
+    if rota:
+        return rota, 1.0, "regra"
+    rota, confianca = _classificador.prever(texto)
+    return rota, confianca, "modelo" if rota else None
+
+
+def formatar_rota(rota: str, texto: str) -> str:
+    """Mesmo protocolo de encaminhamento do prompt_roteador."""
+    return f"ROUTE={rota}\nPERGUNTA_ORIGINAL={texto}\nPERSONA={PERSONA_SISTEMA}\nCLARIFY="
+
+
+def decidir(texto: str, limiar: float = PRE_ROUTER_THRESHOLD) -> Optional[str]:
+    """Rota que o pré-roteador assume (saudação ou rota do grafo); None para usar o LLM."""
+    rota, confianca, _ = classificar(texto)
+    if rota is None or confianca < limiar:
+        return None
+    if rota != SAUDACAO and rota not in ROTAS_GRAFO:
+        return None
+    return rota
+
+
+def pre_rotear(texto: str, limiar: float = PRE_ROUTER_THRESHOLD) -> Optional[str]:
+    """Resposta no formato do roteador quando a decisão local é confiável; None para usar o LLM."""
+    if not PRE_ROUTER_ENABLED:
+        return None
+    rota = decidir(texto, limiar)
+    if rota is None:
+        return None
+    if rota == SAUDACAO:
+        return RESPOSTA_SAUDACAO
+    return formatar_rota(rota, texto)
+
+
+# ---------------------------------------------------------------------------
+# Avaliação
+# ---------------------------------------------------------------------------
+
+LIMIARES = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def _rota_da_resposta(resposta: str) -> str:
+    m = re.search(r"ROUTE=(\w+)", resposta)
+    if m:
+        if re.search(r"CLARIFY=\S", resposta):
+            return CLARIFY
+        return m.group(1).strip().lower()
+    # Resposta direta do roteador: saudação ou fora de escopo
+    return SAUDACAO if RESPOSTA_SAUDACAO.split("!")[0].lower() in resposta.lower() else FORA_ESCOPO
+
+
+def avaliar(exemplos: List[dict], limiar: float) -> dict:
+    """
+    Cobertura/acurácia das decisões locais. "bloqueantes" são as decisões que o grafo
+    não pode aceitar: caso CLARIFY encaminhado ou rota sem nó no grafo.
+    """
+    decididos = acertos = 0
+    erros = []
+    bloqueantes = []
+    for e in exemplos:
+        rota = decidir(e["texto"], limiar)
+        if rota is None:
+            continue
+        decididos += 1
+        if e["rota"] == CLARIFY or (rota != SAUDACAO and rota not in ROTAS_GRAFO):
+            bloqueantes.append((e["texto"], e["rota"], rota))
+        if rota == e["rota"]:
+            acertos += 1
+        else:
+            erros.append((e["texto"], e["rota"], rota))
+    return {
+        "cobertura": decididos / len(exemplos),
+        "acuracia": acertos / decididos if decididos else 0.0,
+        "erros": erros,
+        "bloqueantes": bloqueantes,
+    }
+
+
+def avaliar_llm(exemplos: List[dict]) -> dict:
+    from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
+    from langchain_core.output_parsers import StrOutputParser
+    from prompt_agentes import prompt_roteador
+
+    llm_fast = ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash",
+        temperature=0,
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+    )
+    chain = prompt_roteador | llm_fast | StrOutputParser()
+    acertos = concordancia = decididos = 0
+    latencias = []
+    for e in exemplos:
+        t0 = time.perf_counter()
+        rota_llm = _rota_da_resposta(chain.invoke({"input": e["texto"], "chat_history": []}))
+        latencias.append(time.perf_counter() - t0)
+        acertos += rota_llm == e["rota"]
+        rota = decidir(e["texto"])
+        if rota is not None:
+            decididos += 1
+            concordancia += rota == rota_llm
+    return {
+        "acuracia": acertos / len(exemplos),
+        "concordancia": concordancia / decididos if decididos else 0.0,
+        "latencia_media": sum(latencias) / len(latencias),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Avalia o pré-roteador no conjunto rotulado.")
+    parser.add_argument("--limiar", type=float, default=PRE_ROUTER_THRESHOLD)
+    parser.add_argument("--eval", default=EVAL_PATH, help="JSONL com {texto, rota}.")
+    parser.add_argument("--com-llm", action="store_true", help="Também mede o roteador LLM (chama a API).")
+    args = parser.parse_args(argv)
+
+    exemplos = _ler_jsonl(args.eval)
+    print(f"{len(exemplos)} exemplos em {args.eval}")
+    print("limiar  cobertura  acurácia")
+    for limiar in sorted(set(LIMIARES + [args.limiar])):
+        r = avaliar(exemplos, limiar)
+        marca = "  <-" if limiar == args.limiar else ""
+        print(f"{limiar:6.2f}  {r['cobertura']:9.1%}  {r['acuracia']:8.1%}{marca}")
+
+    resultado = avaliar(exemplos, args.limiar)
+    for texto, esperado, obtido in resultado["erros"]:
+        print(f"  erro: {texto!r} esperado={esperado} obtido={obtido}")
+
+    if args.com_llm:
+        r = avaliar_llm(exemplos)
+        print(f"roteador LLM: acurácia {r['acuracia']:.1%}, latência média {r['latencia_media'] * 1000:.0f} ms")
+        print(f"concordância pré-roteador x LLM (no limiar {args.limiar}): {r['concordancia']:.1%}")
+
+    if resultado["bloqueantes"]:
+        for texto, esperado, obtido in resultado["bloqueantes"]:
+            print(f"  FALHA: {texto!r} esperado={esperado} encaminhado para {obtido}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
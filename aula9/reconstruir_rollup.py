@@ -0,0 +1,60 @@
+"""
+Reconstrói transaction_daily_rollup a partir de transactions (migrations/003).
+
+Uso:
+    python reconstruir_rollup.py             # reconstrói
+    python reconstruir_rollup.py --verificar # só compara rollup x transactions
+
+O rollup é mantido por triggers; a reconstrução serve para a carga inicial ou para
+corrigir divergências (ex.: triggers desabilitadas durante uma manutenção).
+"""
+from pg_pool import get_pool
+import argparse
+import sys
+
+SQL_DIVERGENCIAS = """
+    SELECT COALESCE(r.day, t.day), COALESCE(r.type, t.type), COALESCE(r.category_id, t.category_id),
+           COALESCE(r.total, 0), COALESCE(t.total, 0)
+    FROM (SELECT * FROM transaction_daily_rollup WHERE tx_count <> 0 OR total <> 0) r
+    FULL JOIN (
+        SELECT (occurred_at AT TIME ZONE 'America/Sao_Paulo')::date AS day, type, category_id,
+               SUM(amount) AS total, COUNT(*) AS tx_count
+        FROM transactions
+        GROUP BY 1, 2, 3
+    ) t ON t.day = r.day AND t.type = r.type AND t.category_id IS NOT DISTINCT FROM r.category_id
+    WHERE r.total IS DISTINCT FROM t.total OR r.tx_count IS DISTINCT FROM t.tx_count
+    ORDER BY 1
+    LIMIT 50;
+"""
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstrói o rollup de saldo diário.")
+    parser.add_argument("--verificar", action="store_true", help="Só lista divergências.")
+    args = parser.parse_args(argv)
+
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            if args.verificar:
+                cur.execute(SQL_DIVERGENCIAS)
+                divergencias = cur.fetchall()
+                for dia, tipo, categoria, rollup, real in divergencias:
+                    print(f"{dia} type={tipo} category={categoria}: rollup={rollup} transactions={real}")
+                print(f"{len(divergencias)} divergência(s).")
+                return 1 if divergencias else 0
+
+            cur.execute("SELECT transaction_rollup_rebuild();")
+            linhas = cur.fetchone()[0]
+            conn.commit()
+            print(f"Rollup reconstruído: {linhas} linha(s).")
+            return 0
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Regressão do guardrail: acurácia no corpus rotulado e orçamento de tempo por regex.
+
+1) dados/guardrail_corpus.jsonl ({texto, acao}): toda ação tem que bater.
+2) Cada regex (REGRAS e PADROES_SANITIZAR) roda sobre o corpus e sobre entradas
+   adversariais longas; mostra p50/p95/p99/máx por padrão e falha se alguma chamada
+   passar do orçamento ou se o pior caso crescer mais que linearmente ao quadruplicar
+   a entrada — backtracking catastrófico (ReDoS) aparece como tempo quadrático.
+
+Uso:
+    python regressao_guardrail.py                    # sai com código 1 se algo falhar
+    python regressao_guardrail.py --orcamento-ms 20 --tamanho 50000
+"""
+from guardrail import PADROES_SANITIZAR, REGRAS, sanitizar, verificar_guardrail
+from collections import Counter
+from typing import Callable, List, Tuple
+import argparse
+import json
+import time
+import sys
+import os
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "guardrail_corpus.jsonl")
+
+# Pior tempo aceito por chamada de um padrão nas entradas adversariais
+GUARDRAIL_ORCAMENTO_MS = float(os.getenv("GUARDRAIL_ORCAMENTO_MS", "50"))
+# Entradas FATOR_CRESCIMENTO vezes maiores podem multiplicar o pior caso por no
+# máximo CRESCIMENTO_MAXIMO (linear ~4, quadrático ~16)
+FATOR_CRESCIMENTO = 4
+CRESCIMENTO_MAXIMO = 8.0
+
+
+def adversariais(tamanho: int) -> List[Tuple[str, str]]:
+    """Entradas que exploram quantificadores aninhados/ilimitados dos padrões atuais."""
+    def rep(trecho: str, prefixo: str = "", sufixo: str = "") -> str:
+        return prefixo + trecho * (tamanho // len(trecho)) + sufixo
+
+    return [
+        ("várias 'conta' sem número depois", rep("conta ", prefixo="123 ")),
+        ("'agência' e dígitos soltos", rep("agência 12 ", prefixo="999 ")),
+        ("e-mail: 'a.' repetido sem domínio", rep("a.", sufixo="@")),
+        ("e-mail: domínio sem TLD", rep("a", prefixo="x@", sufixo=".")),
+        ("e-mail: vários '@'", rep("a@a.")),
+        ("cartão: 12 dígitos + separadores", rep("1 " * 12 + "-" * 50 + "x ")),
+        ("cartão: dígitos com muitos espaços", rep("1" + " " * 20, sufixo="x")),
+        ("cartão: sequência de dígitos colada", rep("1", sufixo="x")),
+        ("telefone: dígitos e espaços", rep("5 ")),
+        ("CPF/CNPJ: pontos e dígitos", rep("12.345.")),
+        ("UUID: hex e hífens", rep("abcdef12-")),
+        ("ignore sem alvo", rep("ignore ")),
+        ("prompt repetido", rep("system prompt? ")),
+        ("separadores SQL", rep("-;/*")),
+        ("linha única sem espaços", rep("x")),
+    ]
+
+
+def percentis(amostras: List[float]) -> Tuple[float, float, float, float]:
+    ordenadas = sorted(amostras)
+
+    def p(q: float) -> float:
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+    return p(0.50), p(0.95), p(0.99), ordenadas[-1]
+
+
+def cronometrar(func: Callable[[str], object], textos: List[str], repeticoes: int) -> List[float]:
+    """Duração de cada chamada em milissegundos."""
+    amostras = []
+    for _ in range(repeticoes):
+        for t in textos:
+            t0 = time.perf_counter()
+            func(t)
+            amostras.append((time.perf_counter() - t0) * 1000)
+    return amostras
+
+
+def pior_caso(func: Callable[[str], object], textos: List[str]) -> float:
+    """Maior duração (ms) entre os textos, usando a menor de 3 medições de cada um para tirar ruído."""
+    return max(min(cronometrar(func, [t], 3)) for t in textos)
+
+
+def verificar_corpus(caminho: str) -> int:
+    with open(caminho, encoding="utf-8") as f:
+        exemplos = [json.loads(linha) for linha in f if linha.strip()]
+    erros = 0
+    confusao = Counter()
+    for e in exemplos:
+        acao = verificar_guardrail(e["texto"])[0]
+        confusao[(e["acao"], acao)] += 1
+        if acao != e["acao"]:
+            erros += 1
+            print(f"FALHOU  {e['texto']!r}: esperado {e['acao']}, obtido {acao}")
+    print(f"corpus: {len(exemplos) - erros}/{len(exemplos)} corretos")
+    for (esperado, obtido), n in sorted(confusao.items()):
+        if esperado != obtido:
+            print(f"  {esperado} -> {obtido}: {n}")
+    return erros
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Corpus e orçamento de tempo do guardrail.")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--tamanho", type=int, default=20_000, help="Caracteres das entradas adversariais.")
+    parser.add_argument("--orcamento-ms", type=float, default=GUARDRAIL_ORCAMENTO_MS, help="Tempo máximo por chamada de um padrão.")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    falhas = verificar_corpus(args.corpus)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(linha)["texto"] for linha in f if linha.strip()]
+    ataques = adversariais(args.tamanho)
+    textos = corpus + [t for _, t in ataques]
+
+    alvos = [(rotulo, padrao.search) for rotulo, padrao, _, _ in REGRAS]
+    alvos += [(f"SANITIZAR:{p.pattern[:30]}...", lambda t, p=p, s=s: p.sub(s, t)) for p, s in PADROES_SANITIZAR]
+    alvos += [("verificar_guardrail", verificar_guardrail), ("sanitizar", sanitizar)]
+
+    print(f"\n{len(corpus)} textos do corpus + {len(ataques)} adversariais de {args.tamanho} caracteres")
+    maiores = [t for _, t in adversariais(FATOR_CRESCIMENTO * args.tamanho)]
+    print(f"{'padrão':48} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {f'x{FATOR_CRESCIMENTO}':>6}  (ms)")
+    for rotulo, func in alvos:
+        p50, p95, p99, maximo = percentis(cronometrar(func, textos, args.repeticoes))
+        base = pior_caso(func, [t for _, t in ataques])
+        maior = pior_caso(func, maiores)
+        # Abaixo de 1 ms a razão é dominada por ruído
+        crescimento = maior / base if maior > 1.0 and base > 0 else 1.0
+        problemas = []
+        if maximo > args.orcamento_ms:
+            problemas.append("ESTOUROU")
+        if crescimento > CRESCIMENTO_MAXIMO:
+            problemas.append("SUPERLINEAR")
+        print(
+            f"{rotulo[:48]:48} {p50:8.3f} {p95:8.3f} {p99:8.3f} {maximo:8.3f} {crescimento:5.1f}x"
+            + (f"  <- {', '.join(problemas)}" if problemas else "")
+        )
+        if problemas:
+            falhas += 1
+            # Mostra qual entrada adversarial causou o problema
+            for (nome, t), t2 in zip(ataques, maiores):
+                ms, ms2 = pior_caso(func, [t]), pior_caso(func, [t2])
+                if ms > args.orcamento_ms or (ms2 > 1.0 and ms2 / max(ms, 1e-6) > CRESCIMENTO_MAXIMO):
+                    print(f"    {nome}: {ms:.1f} ms -> {ms2:.1f} ms com {FATOR_CRESCIMENTO}x o tamanho")
+
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
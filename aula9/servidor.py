@@ -0,0 +1,505 @@
+"""
+Servidor HTTP assíncrono (aiohttp) em volta do grafo do assessor (aula9.app).
+
+Rotas:
+    POST /chat          {"session_id": "...", "mensagem": "..."} -> {"session_id", "resposta"}
+    POST /chat/stream   mesmo corpo; resposta em SSE com os eventos de TraducaoEventos
+                        (progresso, token, fim) e "erro" se o turno falhar no meio
+    GET  /ws            WebSocket (?session_id=...); cada mensagem do cliente é um turno
+                        ({"mensagem": "..."} ou texto puro) e volta como eventos JSON
+    GET  /saude         turnos em execução, na fila e sessões ativas (503 ao encerrar)
+    GET  /metrics       métricas do instrumentacao no formato do Prometheus
+
+Sem session_id o servidor gera um e devolve na resposta.
+
+Concorrência:
+- Turnos da mesma sessão rodam um por vez, na ordem de chegada: o histórico no
+  Redis é lido no início e gravado no fim do turno, e dois turnos juntos perderiam
+  mensagens. Mais de SERVIDOR_FILA_SESSAO turnos pendentes na sessão -> 429.
+- Sessões diferentes rodam em paralelo em SERVIDOR_CONCORRENCIA threads (os nós do
+  grafo são síncronos e passam quase todo o tempo esperando Gemini, Postgres e
+  Redis). Com SERVIDOR_FILA turnos já esperando vaga, os próximos recebem 503 com
+  Retry-After.
+- SERVIDOR_TIMEOUT_S vale para o turno inteiro (fila da sessão, fila global e
+  execução) -> 504, ou evento "erro" se o streaming já começou. A thread não é
+  interrompida no meio de um nó: ela para no próximo evento e a sessão só libera o
+  turno seguinte quando ela termina.
+- Os eventos passam por uma fila de SERVIDOR_BUFFER_EVENTOS: cliente lento segura
+  a geração em vez de acumular memória; cliente que desconecta cancela o turno.
+- SIGINT/SIGTERM: o servidor para de aceitar conexões, novos turnos recebem 503 e
+  os turnos em andamento têm SERVIDOR_ENCERRAMENTO_S para terminar.
+
+Limites para centenas de usuários:
+- Turnos executando de fato = SERVIDOR_CONCORRENCIA (padrão 256 threads). O
+  aexecutar_fluxo_assessor_stream não é usado aqui: com nós síncronos o astream do
+  LangGraph os roda no executor padrão do loop (min(32, CPUs + 4) threads), um
+  teto ainda menor. Acima disso os turnos esperam na fila (SERVIDOR_FILA).
+- SQL simultâneo das tools = PG_POOL_MAX por processo (padrão 10). A conexão só fica
+  presa durante a query, então o pool suporta muito mais turnos que conexões, mas
+  com centenas de turnos suba para 20-50 (respeitando o max_connections do Postgres)
+  ou as tools esperam até PG_POOL_TIMEOUT e falham com PoolEsgotado.
+
+Uso:
+    python servidor.py                              # SERVIDOR_HOST:SERVIDOR_PORTA
+    python servidor.py --porta 8080 --concorrencia 512 --fila 1024
+    curl -N localhost:8080/chat/stream -d '{"session_id": "u1", "mensagem": "qual meu saldo?"}'
+"""
+from concurrent.futures import CancelledError as FuturoCancelado, ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+from contextlib import aclosing
+from aiohttp import WSCloseCode, WSMsgType, web
+from instrumentacao import METRICAS
+from dotenv import load_dotenv
+import threading
+import argparse
+import logging
+import asyncio
+import json
+import time
+import uuid
+import sys
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SERVIDOR_HOST = os.getenv("SERVIDOR_HOST", "127.0.0.1")
+SERVIDOR_PORTA = int(os.getenv("SERVIDOR_PORTA", "8080"))
+# Turnos executando ao mesmo tempo = threads do executor (cada uma passa quase todo o turno esperando I/O)
+SERVIDOR_CONCORRENCIA = int(os.getenv("SERVIDOR_CONCORRENCIA", "256"))
+# Turnos admitidos esperando (pela sessão ou por uma thread) antes de recusar com 503
+SERVIDOR_FILA = int(os.getenv("SERVIDOR_FILA", "512"))
+SERVIDOR_FILA_SESSAO = int(os.getenv("SERVIDOR_FILA_SESSAO", "4"))
+SERVIDOR_TIMEOUT_S = float(os.getenv("SERVIDOR_TIMEOUT_S", "120"))
+SERVIDOR_ENCERRAMENTO_S = float(os.getenv("SERVIDOR_ENCERRAMENTO_S", "30"))
+SERVIDOR_BUFFER_EVENTOS = int(os.getenv("SERVIDOR_BUFFER_EVENTOS", "64"))
+SERVIDOR_MAX_MENSAGEM = int(os.getenv("SERVIDOR_MAX_MENSAGEM", "4000"))
+
+MAX_SESSION_ID = 128
+RETRY_AFTER_S = 1
+# Intervalo em que a thread do turno confere se foi cancelada enquanto espera vaga na fila de eventos
+INTERVALO_CANCELAMENTO_S = 0.25
+
+
+class ErroTurno(Exception):
+    """Turno recusado ou interrompido; status é o código HTTP correspondente."""
+
+    def __init__(self, status: int, motivo: str):
+        super().__init__(motivo)
+        self.status = status
+        self.motivo = motivo
+
+
+class _Sessao:
+    __slots__ = ("ultimo", "pendentes")
+
+    def __init__(self):
+        self.ultimo: Optional[asyncio.Future] = None   # resolvido quando o último turno da fila terminar
+        self.pendentes = 0
+
+
+class ServicoAssessor:
+    """
+    Fila por sessão + fila global na frente de um executar_stream síncrono
+    (padrão: aula9.executar_fluxo_assessor_stream). Tudo que toca _sessoes roda no
+    loop do asyncio; só os contadores de execução são compartilhados com as threads.
+    """
+
+    def __init__(
+        self,
+        executar_stream: Optional[Callable[[str, str], Iterator[dict]]] = None,
+        concorrencia: int = SERVIDOR_CONCORRENCIA,
+        fila: int = SERVIDOR_FILA,
+        fila_sessao: int = SERVIDOR_FILA_SESSAO,
+        timeout_s: float = SERVIDOR_TIMEOUT_S,
+        buffer_eventos: int = SERVIDOR_BUFFER_EVENTOS,
+    ):
+        if executar_stream is None:
+            from aula9 import executar_fluxo_assessor_stream as executar_stream
+        self.executar_stream = executar_stream
+        self.concorrencia = concorrencia
+        self.fila = fila
+        self.fila_sessao = fila_sessao
+        self.timeout_s = timeout_s
+        self.buffer_eventos = buffer_eventos
+        self.executor = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="turno")
+        self.encerrando = False
+        self._sessoes: Dict[str, _Sessao] = {}
+        self._cancelamentos = set()    # threading.Event de cada turno vivo
+        self._liberacoes = set()       # tarefas que esperam turnos cancelados terminarem
+        self._lock = threading.Lock()
+        self._submetidos = 0
+        self._executando = 0
+
+    def estado(self) -> dict:
+        with self._lock:
+            submetidos, executando = self._submetidos, self._executando
+        return {
+            "em_execucao": executando,
+            "na_fila": submetidos - executando,
+            "sessoes": len(self._sessoes),
+            "concorrencia": self.concorrencia,
+            "encerrando": int(self.encerrando),
+        }
+
+    def turno(self, session_id: str, mensagem: str) -> "Turno":
+        """
+        Admite e reserva o turno de uma vez (ErroTurno 503/429 se não couber): ele já
+        conta na fila da sessão e na global antes de qualquer await do chamador.
+        Consuma com `async with aclosing(turno)`; aclose() devolve a reserva mesmo que
+        o turno nunca seja iterado.
+        """
+        if self.encerrando:
+            raise ErroTurno(503, "servidor encerrando")
+        if self.estado()["na_fila"] >= self.fila:
+            raise ErroTurno(503, "servidor sobrecarregado")
+        sessao = self._sessoes.setdefault(session_id, _Sessao())
+        if sessao.pendentes >= self.fila_sessao:
+            raise ErroTurno(429, "muitas mensagens pendentes nesta sessão")
+
+        loop = asyncio.get_running_loop()
+        anterior, proprio = sessao.ultimo, loop.create_future()
+        sessao.ultimo = proprio
+        sessao.pendentes += 1
+        with self._lock:
+            self._submetidos += 1
+        return Turno(self, session_id, mensagem, sessao, anterior, proprio, loop.time() + self.timeout_s)
+
+    async def _executar(
+        self, session_id: str, mensagem: str, sessao: _Sessao,
+        anterior: Optional[asyncio.Future], proprio: asyncio.Future, prazo: float,
+    ) -> AsyncIterator[dict]:
+        loop = asyncio.get_running_loop()
+        fila = asyncio.Queue(self.buffer_eventos)
+        cancelado = threading.Event()
+        self._cancelamentos.add(cancelado)
+        trabalho = None
+        try:
+            if anterior is not None and not anterior.done():
+                await asyncio.wait_for(asyncio.shield(anterior), prazo - loop.time())
+            if self.encerrando:
+                raise ErroTurno(503, "servidor encerrando")
+
+            trabalho = self.executor.submit(self._produzir, mensagem, session_id, fila, loop, cancelado)
+            while True:
+                evento = await asyncio.wait_for(fila.get(), prazo - loop.time())
+                if evento is None:
+                    return
+                yield evento
+        except asyncio.TimeoutError:
+            raise ErroTurno(504, f"turno passou de {self.timeout_s:g} s") from None
+        finally:
+            cancelado.set()
+            self._cancelamentos.discard(cancelado)
+            self._finalizar(session_id, sessao, anterior, proprio, trabalho)
+
+    def _finalizar(self, session_id: str, sessao: _Sessao, anterior: Optional[asyncio.Future], proprio: asyncio.Future, trabalho):
+        """Devolve a reserva feita em turno(); a thread devolve a dela se chegou a rodar."""
+        if trabalho is None or trabalho.cancel():
+            # Nunca foi para o executor, ou ainda estava na fila dele: não vai rodar
+            with self._lock:
+                self._submetidos -= 1
+        sessao.pendentes -= 1
+        # O próximo turno da sessão só começa quando este e o anterior tiverem parado de fato
+        vivos = [f for f in (anterior, trabalho and asyncio.wrap_future(trabalho)) if f is not None and not f.done()]
+        self._liberar(session_id, sessao, proprio, vivos)
+
+    def _liberar(self, session_id: str, sessao: _Sessao, proprio: asyncio.Future, vivos: list):
+        def concluir():
+            proprio.set_result(None)
+            if sessao.ultimo is proprio:
+                # Nenhum turno chegou depois: a sessão sai da memória
+                self._sessoes.pop(session_id, None)
+
+        if not vivos:
+            concluir()
+            return
+
+        async def esperar():
+            await asyncio.gather(*vivos, return_exceptions=True)
+            concluir()
+
+        tarefa = asyncio.ensure_future(esperar())
+        self._liberacoes.add(tarefa)
+        tarefa.add_done_callback(self._liberacoes.discard)
+
+    def _produzir(self, mensagem: str, session_id: str, fila: asyncio.Queue, loop, cancelado: threading.Event):
+        """Roda na thread do executor: consome o grafo e repassa os eventos para o loop."""
+        def entregar(evento: Optional[dict]) -> bool:
+            try:
+                envio = asyncio.run_coroutine_threadsafe(fila.put(evento), loop)
+            except RuntimeError:
+                return False    # loop já fechado
+            while not cancelado.is_set():
+                try:
+                    envio.result(timeout=INTERVALO_CANCELAMENTO_S)
+                    return True
+                except FuturoTimeout:
+                    continue
+                except FuturoCancelado:
+                    return False
+            envio.cancel()
+            return False
+
+        with self._lock:
+            self._executando += 1
+        inicio = time.perf_counter()
+        status = "ok"
+        try:
+            eventos = self.executar_stream(mensagem, session_id)
+            try:
+                for evento in eventos:
+                    if not entregar(evento):
+                        status = "cancelado"
+                        return
+            finally:
+                eventos.close()
+            entregar(None)
+        except Exception:
+            status = "erro"
+            logger.exception("Falha no turno da sessão %s", session_id)
+            if entregar({"tipo": "erro", "erro": "falha ao processar a mensagem"}):
+                entregar(None)
+        finally:
+            METRICAS.observar("assessor_servidor_turno_segundos", time.perf_counter() - inicio, status=status)
+            with self._lock:
+                self._executando -= 1
+                self._submetidos -= 1
+
+    async def encerrar(self):
+        """Cancela os turnos que sobraram e espera as threads saírem."""
+        self.encerrando = True
+        for cancelado in list(self._cancelamentos):
+            cancelado.set()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: self.executor.shutdown(wait=True, cancel_futures=True))
+
+
+class Turno:
+    """Eventos de um turno admitido por ServicoAssessor.turno (async iterator com aclose)."""
+
+    def __init__(self, servico: ServicoAssessor, session_id: str, mensagem: str, sessao: _Sessao,
+                 anterior: Optional[asyncio.Future], proprio: asyncio.Future, prazo: float):
+        self._servico = servico
+        self._reserva = (session_id, sessao, anterior, proprio)
+        self._eventos = servico._executar(session_id, mensagem, sessao, anterior, proprio, prazo)
+        self._iniciado = False
+
+    def __aiter__(self) -> "Turno":
+        return self
+
+    async def __anext__(self) -> dict:
+        self._iniciado = True
+        return await self._eventos.__anext__()
+
+    async def aclose(self):
+        if self._iniciado:
+            # O finally de _executar devolve a reserva
+            await self._eventos.aclose()
+            return
+        # Gerador nunca iniciado não roda o finally ao fechar: devolve a reserva aqui
+        self._iniciado = True
+        await self._eventos.aclose()
+        self._servico._finalizar(*self._reserva, None)
+
+
+SERVICO = web.AppKey("servico", ServicoAssessor)
+CONEXOES_WS = web.AppKey("conexoes_ws", dict)
+
+METRICAS.descrever("assessor_servidor_requisicoes_total", "Turnos recebidos pelo servidor HTTP, por rota e status.")
+METRICAS.descrever("assessor_servidor_turno_segundos", "Duração dos turnos nas threads do servidor.")
+
+
+def _erro(status: int, motivo: str) -> web.Response:
+    headers = {"Retry-After": str(RETRY_AFTER_S)} if status in (429, 503) else None
+    return web.json_response({"erro": motivo}, status=status, headers=headers)
+
+
+def _validar(corpo, session_id: Optional[str] = None) -> Tuple[str, str]:
+    if not isinstance(corpo, dict):
+        raise ErroTurno(400, "corpo deve ser um objeto JSON")
+    mensagem = corpo.get("mensagem")
+    session_id = corpo.get("session_id", session_id) or uuid.uuid4().hex
+    if not isinstance(mensagem, str) or not mensagem.strip():
+        raise ErroTurno(400, "campo 'mensagem' obrigatório")
+    if len(mensagem) > SERVIDOR_MAX_MENSAGEM:
+        raise ErroTurno(413, f"mensagem com mais de {SERVIDOR_MAX_MENSAGEM} caracteres")
+    if not isinstance(session_id, str) or len(session_id) > MAX_SESSION_ID:
+        raise ErroTurno(400, "session_id inválido")
+    return session_id, mensagem
+
+
+async def _ler_pedido(request: web.Request) -> Tuple[str, str]:
+    try:
+        corpo = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ErroTurno(400, "JSON inválido") from None
+    return _validar(corpo)
+
+
+def _contar(rota: str, status: int):
+    METRICAS.incrementar("assessor_servidor_requisicoes_total", rota=rota, status=str(status))
+
+
+async def chat(request: web.Request) -> web.Response:
+    servico: ServicoAssessor = request.app[SERVICO]
+    try:
+        session_id, mensagem = await _ler_pedido(request)
+        resposta = None
+        async with aclosing(servico.turno(session_id, mensagem)) as eventos:
+            async for evento in eventos:
+                if evento["tipo"] == "fim":
+                    resposta = evento["resposta"]
+                elif evento["tipo"] == "erro":
+                    raise ErroTurno(500, evento["erro"])
+    except ErroTurno as e:
+        _contar("chat", e.status)
+        return _erro(e.status, e.motivo)
+    _contar("chat", 200)
+    return web.json_response({"session_id": session_id, "resposta": resposta})
+
+
+async def chat_stream(request: web.Request) -> web.StreamResponse:
+    servico: ServicoAssessor = request.app[SERVICO]
+    try:
+        session_id, mensagem = await _ler_pedido(request)
+        eventos = servico.turno(session_id, mensagem)
+    except ErroTurno as e:
+        _contar("chat_stream", e.status)
+        return _erro(e.status, e.motivo)
+
+    status = 200
+    async with aclosing(eventos):
+        resposta = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream; charset=utf-8",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",    # nginx não segura os eventos
+            "X-Session-Id": session_id,
+        })
+
+        async def enviar(evento: dict):
+            dados = json.dumps(evento, ensure_ascii=False)
+            await resposta.write(f"event: {evento['tipo']}\ndata: {dados}\n\n".encode("utf-8"))
+
+        try:
+            await resposta.prepare(request)
+            async for evento in eventos:
+                await enviar(evento)
+        except ErroTurno as e:
+            status = e.status
+            await enviar({"tipo": "erro", "status": e.status, "erro": e.motivo})
+        except ConnectionResetError:
+            # Cliente desconectou; aclosing cancela o turno
+            status = 499
+    _contar("chat_stream", status)
+    return resposta
+
+
+async def websocket(request: web.Request) -> web.WebSocketResponse:
+    servico: ServicoAssessor = request.app[SERVICO]
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    conexoes = request.app[CONEXOES_WS]
+    conexoes[ws] = False    # ocupada com um turno?
+    session_id = request.query.get("session_id") or uuid.uuid4().hex
+    await ws.send_json({"tipo": "sessao", "session_id": session_id})
+
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            conexoes[ws] = True
+            try:
+                try:
+                    corpo = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    corpo = {"mensagem": msg.data}
+                if not isinstance(corpo, dict):
+                    corpo = {"mensagem": msg.data}
+                corpo.setdefault("session_id", session_id)
+                async with aclosing(servico.turno(*_validar(corpo))) as eventos:
+                    async for evento in eventos:
+                        await ws.send_json(evento)
+                _contar("ws", 200)
+            except ErroTurno as e:
+                _contar("ws", e.status)
+                await ws.send_json({"tipo": "erro", "status": e.status, "erro": e.motivo})
+            finally:
+                conexoes[ws] = False
+            if servico.encerrando:
+                await ws.close(code=WSCloseCode.GOING_AWAY, message=b"servidor encerrando")
+    finally:
+        conexoes.pop(ws, None)
+    return ws
+
+
+async def saude(request: web.Request) -> web.Response:
+    estado = request.app[SERVICO].estado()
+    return web.json_response(estado, status=503 if estado["encerrando"] else 200)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(text=METRICAS.exportar_texto(), content_type="text/plain", charset="utf-8")
+
+
+async def _ao_desligar(app: web.Application):
+    # Para de admitir turnos; WebSockets ociosos fecham agora, os ocupados depois do turno
+    app[SERVICO].encerrando = True
+    for ws, ocupada in list(app[CONEXOES_WS].items()):
+        if not ocupada:
+            await ws.close(code=WSCloseCode.GOING_AWAY, message=b"servidor encerrando")
+
+
+async def _ao_limpar(app: web.Application):
+    await app[SERVICO].encerrar()
+
+
+def criar_app(servico: Optional[ServicoAssessor] = None) -> web.Application:
+    servico = servico or ServicoAssessor()
+    # Corpo JSON: mensagem + session_id + folga para escapes
+    app = web.Application(client_max_size=4 * SERVIDOR_MAX_MENSAGEM + 1024)
+    app[SERVICO] = servico
+    app[CONEXOES_WS] = {}
+    app.router.add_post("/chat", chat)
+    app.router.add_post("/chat/stream", chat_stream)
+    app.router.add_get("/ws", websocket)
+    app.router.add_get("/saude", saude)
+    app.router.add_get("/metrics", metrics)
+    app.on_shutdown.append(_ao_desligar)
+    app.on_cleanup.append(_ao_limpar)
+    METRICAS.registrar_coletor("assessor_servidor", servico.estado)
+    return app
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor HTTP (JSON, SSE e WebSocket) do assessor.")
+    parser.add_argument("--host", default=SERVIDOR_HOST)
+    parser.add_argument("--porta", type=int, default=SERVIDOR_PORTA)
+    parser.add_argument("--concorrencia", type=int, default=SERVIDOR_CONCORRENCIA, help="Turnos executando ao mesmo tempo.")
+    parser.add_argument("--fila", type=int, default=SERVIDOR_FILA, help="Turnos esperando vaga antes de recusar com 503.")
+    parser.add_argument("--fila-sessao", type=int, default=SERVIDOR_FILA_SESSAO, help="Turnos pendentes por sessão antes de 429.")
+    parser.add_argument("--timeout-s", type=float, default=SERVIDOR_TIMEOUT_S, help="Tempo máximo de um turno, com as filas.")
+    parser.add_argument("--encerramento-s", type=float, default=SERVIDOR_ENCERRAMENTO_S, help="Prazo dos turnos em andamento ao encerrar.")
+    args = parser.parse_args(argv)
+
+    servico = ServicoAssessor(
+        concorrencia=args.concorrencia,
+        fila=args.fila,
+        fila_sessao=args.fila_sessao,
+        timeout_s=args.timeout_s,
+    )
+    web.run_app(
+        criar_app(servico),
+        host=args.host,
+        port=args.porta,
+        shutdown_timeout=args.encerramento_s,
+        # Desconexão do cliente cancela o handler, e com ele o turno
+        handler_cancellation=True,
+        access_log=None,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
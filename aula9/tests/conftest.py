@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Os módulos da aula9 se importam pelo nome (rodam a partir da própria pasta)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
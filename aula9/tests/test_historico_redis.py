@@ -0,0 +1,88 @@
+"""
+LRU do histórico na frente do Redis (fakeredis, sem servidor).
+
+Uso:
+    python -m pytest -q aula9/tests/test_historico_redis.py
+"""
+from langchain_core.messages import AIMessage, HumanMessage
+from historico_redis import HistoricoLRU, RedisChatMessageHistory
+import historico_redis
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def historico(client, cache, session_id="s1"):
+    return RedisChatMessageHistory(session_id, client=client, cache=cache, ttl=3600)
+
+
+def test_escrita_deixa_o_lru_quente(client):
+    cache = HistoricoLRU()
+    h = historico(client, cache)
+
+    assert h.messages == []
+    h.add_messages([HumanMessage(content="oi"), AIMessage(content="olá")])
+    assert [m.content for m in h.messages] == ["oi", "olá"]
+
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_turnos_com_varias_chains_so_vao_ao_redis_na_primeira_leitura(client):
+    cache = HistoricoLRU()
+    for turno in range(5):
+        for chain in range(3):
+            h = historico(client, cache)
+            h.messages
+            h.add_messages([HumanMessage(content=f"{turno}.{chain}"), AIMessage(content="ok")])
+
+    assert (cache.hits, cache.misses) == (14, 1)
+    assert len(historico(client, cache).messages) == 30
+
+
+def test_leitura_anterior_a_escrita_nao_entra_no_lru(client):
+    cache = HistoricoLRU()
+    h = historico(client, cache)
+    geracao = cache.geracao("s1")
+    antiga = h.messages    # lista lida antes da escrita
+
+    h.add_messages([HumanMessage(content="nova")])
+    cache.put("s1", antiga, geracao)
+
+    assert [m.content for m in h.messages] == ["nova"]
+
+
+def test_escritas_sobrepostas_deixam_a_entrada_vazia():
+    cache = HistoricoLRU()
+    geracao_a, sozinha_a = cache.iniciar_escrita("s1")
+    geracao_b, sozinha_b = cache.iniciar_escrita("s1")
+    cache.concluir_escrita("s1", geracao_b, sozinha_b, [HumanMessage(content="b")])
+    cache.concluir_escrita("s1", geracao_a, sozinha_a, [HumanMessage(content="a")])
+
+    assert (sozinha_a, sozinha_b) == (True, False)
+    assert cache.get("s1") is None
+
+
+def test_escrita_renova_o_ttl(client):
+    h = historico(client, HistoricoLRU())
+    h.add_messages([HumanMessage(content="oi")])
+    assert 0 < client.ttl(h.key) <= 3600
+
+
+def test_entrada_vale_no_maximo_metade_do_ttl(client, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(historico_redis.time, "monotonic", lambda: agora[0])
+    cache = HistoricoLRU(ttl=3600)
+    h = RedisChatMessageHistory("s1", client=client, cache=cache, ttl=10)
+    h.add_messages([HumanMessage(content="oi")])
+
+    agora[0] += 4
+    h.messages
+    # Passou de TTL/2 sem ir ao Redis: a leitura seguinte vai até lá e renova a chave
+    agora[0] += 2
+    h.messages
+
+    assert (cache.hits, cache.misses) == (1, 1)
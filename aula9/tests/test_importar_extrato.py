@@ -0,0 +1,32 @@
+"""
+Máscara de PII no importador (mascarar_lote), sem Postgres.
+
+Uso:
+    python -m pytest -q aula9/tests/test_importar_extrato.py
+"""
+from guardrail import verificar_guardrail
+from importar_extrato import mascarar_lote
+
+
+def test_linha_bloqueada_com_cpf_sai_mascarada():
+    memo = "PIX ENVIADO; CPF 123.456.789-00"
+    # O ";" faz o guardrail bloquear; a máscara não pode depender desse veredito
+    assert verificar_guardrail(memo)[0] == "BLOQUEAR"
+    lote = [{"source_text": memo, "description": memo}]
+    stats = {"mascaradas": 0}
+
+    mascarar_lote(lote, stats)
+
+    assert "789-00" not in lote[0]["source_text"]
+    assert "789-00" not in lote[0]["description"]
+    assert stats["mascaradas"] == 1
+
+
+def test_linha_sem_pii_fica_igual():
+    lote = [{"source_text": "MERCADO CENTRAL -- LOJA 2", "description": None}]
+    stats = {"mascaradas": 0}
+
+    mascarar_lote(lote, stats)
+
+    assert lote[0] == {"source_text": "MERCADO CENTRAL -- LOJA 2", "description": None}
+    assert stats["mascaradas"] == 0
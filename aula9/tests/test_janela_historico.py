@@ -0,0 +1,82 @@
+"""
+Janela + resumo sobre o histórico Redis (fakeredis): lista e resumo servidos do LRU.
+
+Uso:
+    python -m pytest -q aula9/tests/test_janela_historico.py
+"""
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from historico_redis import HistoricoLRU, RedisChatMessageHistory
+from janela_historico import JanelaHistorico, Resumidor, ResumoStore
+import fakeredis
+import pytest
+
+TTL = 3600
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def cache():
+    return HistoricoLRU()
+
+
+@pytest.fixture
+def store(client, cache):
+    return ResumoStore(client, cache)
+
+
+def janela(client, cache, store):
+    base = RedisChatMessageHistory("s1", client=client, cache=cache, ttl=TTL)
+    resumidor = Resumidor(RunnableLambda(lambda _: "resumo"), store)
+    return JanelaHistorico("s1", base, store, resumidor, TTL)
+
+
+def sem_redis(client, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise AssertionError("round trip ao Redis")
+    monkeypatch.setattr(client, "pipeline", falhar)
+
+
+def test_leitura_depois_da_escrita_nao_vai_ao_redis(client, cache, store, monkeypatch):
+    j = janela(client, cache, store)
+    j.messages
+    j.add_messages([HumanMessage(content="oi"), AIMessage(content="olá")])
+
+    sem_redis(client, monkeypatch)
+    assert [m.content for m in j.messages] == ["oi", "olá"]
+
+
+def test_resumo_regravado_busca_so_o_resumo(client, cache, store):
+    j = janela(client, cache, store)
+    j.add_messages([HumanMessage(content="oi"), AIMessage(content="olá")])
+    store.gravar("s1", "usuário disse oi", 0)
+
+    mensagens = j.messages
+    assert isinstance(mensagens[0], SystemMessage)
+    assert "usuário disse oi" in mensagens[0].content
+    # A lista continuou no LRU; só o HGETALL foi ao Redis
+    assert cache.misses == 0
+
+
+def test_resumo_no_lru_ate_a_proxima_gravacao(client, cache, store, monkeypatch):
+    j = janela(client, cache, store)
+    j.add_messages([HumanMessage(content="oi")])
+    store.gravar("s1", "resumo antigo", 0)
+    j.messages
+
+    sem_redis(client, monkeypatch)
+    assert "resumo antigo" in j.messages[0].content
+
+
+def test_leitura_renova_o_ttl_do_resumo(client, cache, store):
+    j = janela(client, cache, store)
+    j.add_messages([HumanMessage(content="oi")])
+    client.expire(store._key("s1"), 5)
+    cache.invalidar("s1")
+
+    j.messages
+    assert client.ttl(store._key("s1")) > 5
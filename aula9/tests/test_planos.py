@@ -0,0 +1,31 @@
+"""
+Regressão de planos (EXPLAIN) das consultas por data: os CASOS de verificar_planos.py
+como teste. Precisa do banco com as migrações aplicadas; sem DATABASE_URL é pulado.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m pytest -q aula9/tests/test_planos.py
+"""
+from pg_pool import DATABASE_URL
+from verificar_planos import CASOS, avaliar, explain, get_conn
+import pytest
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL não definido")
+
+
+@pytest.fixture
+def cur():
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        try:
+            # Plano independente do volume de dados da base (ver verificar_planos.py)
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+            yield cursor
+        finally:
+            conn.rollback()
+            cursor.close()
+
+
+@pytest.mark.parametrize("montar, esperado", [(m, e) for _, m, e in CASOS], ids=[nome for nome, _, _ in CASOS])
+def test_plano_usa_indice(cur, montar, esperado):
+    query, params = montar()
+    assert avaliar(explain(cur, query, params), esperado) == []
@@ -0,0 +1,31 @@
+"""
+Pré-roteador contra dados/rotas_eval.jsonl: nada de CLARIFY encaminhado nem rota sem nó no grafo.
+
+Uso:
+    python -m pytest -q aula9/tests/test_pre_roteador.py
+"""
+from pre_roteador import EVAL_PATH, PRE_ROUTER_THRESHOLD, ROTAS_GRAFO, _ler_jsonl, avaliar, decidir
+import pytest
+
+
+def test_eval_sem_decisoes_que_o_grafo_recusa():
+    resultado = avaliar(_ler_jsonl(EVAL_PATH), PRE_ROUTER_THRESHOLD)
+    assert resultado["bloqueantes"] == []
+
+
+@pytest.mark.parametrize("texto", [
+    "Agendar pagamento amanhã às 9h",
+    "me lembra de pagar a fatura dia 10",
+    "Posso investir em criptomoedas com segurança?",
+])
+def test_mensagem_ambigua_fica_com_o_llm(texto):
+    assert decidir(texto) is None
+
+
+@pytest.mark.parametrize("texto", ["Quero treinar pernas amanhã de manhã.", "quantas calorias tem a dieta de hoje?"])
+def test_rota_sem_no_no_grafo_fica_com_o_llm(texto):
+    assert decidir(texto) is None
+
+
+def test_rota_obvia_decidida_localmente():
+    assert decidir("Tenho reunião amanhã às 9h?") in ROTAS_GRAFO
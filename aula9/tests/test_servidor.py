@@ -0,0 +1,170 @@
+"""
+Recusas do servidor (429/503/504) com TestClient em memória e um grafo falso que
+segura o turno até ser liberado (sem Gemini, Postgres ou Redis).
+
+Uso:
+    python -m pytest -q aula9/tests
+"""
+from aiohttp.test_utils import TestClient, TestServer
+from servidor import SERVICO, ErroTurno, ServicoAssessor, criar_app
+import threading
+import pytest
+import asyncio
+import json
+
+
+class GrafoFalso:
+    def __init__(self):
+        self.liberar = threading.Event()
+        self.iniciou = threading.Event()
+
+    def __call__(self, mensagem, session_id):
+        self.iniciou.set()
+        yield {"tipo": "progresso", "etapa": "inicio"}
+        self.liberar.wait(10)
+        yield {"tipo": "fim", "resposta": f"eco: {mensagem}"}
+
+
+def rodar(cenario, **opcoes):
+    grafo = GrafoFalso()
+    servico = ServicoAssessor(executar_stream=grafo, **opcoes)
+
+    async def principal():
+        async with TestClient(TestServer(criar_app(servico))) as cliente:
+            try:
+                await cenario(cliente, grafo)
+            finally:
+                # As threads presas no grafo precisam sair antes do encerramento
+                grafo.liberar.set()
+            await esperar_saude(cliente, lambda e: e["sessoes"] == 0 and e["na_fila"] == 0 and e["em_execucao"] == 0)
+
+    asyncio.run(principal())
+
+
+async def esperar_saude(cliente, condicao, prazo=5.0):
+    loop = asyncio.get_running_loop()
+    fim = loop.time() + prazo
+    while True:
+        estado = await (await cliente.get("/saude")).json()
+        if condicao(estado):
+            return estado
+        assert loop.time() < fim, f"estado não chegou na condição: {estado}"
+        await asyncio.sleep(0.02)
+
+
+async def pedir(cliente, rota, session_id, mensagem="oi"):
+    resposta = await cliente.post(rota, json={"session_id": session_id, "mensagem": mensagem})
+    return resposta.status, resposta.headers, await resposta.text()
+
+
+def test_chat_responde():
+    async def cenario(cliente, grafo):
+        grafo.liberar.set()
+        status, _, corpo = await pedir(cliente, "/chat", "s1", "qual meu saldo?")
+        assert status == 200
+        assert json.loads(corpo) == {"session_id": "s1", "resposta": "eco: qual meu saldo?"}
+
+    rodar(cenario)
+
+
+def test_429_com_turno_pendente_na_sessao():
+    async def cenario(cliente, grafo):
+        primeiro = asyncio.ensure_future(pedir(cliente, "/chat", "s1"))
+        assert await asyncio.to_thread(grafo.iniciou.wait, 5)
+
+        status, headers, _ = await pedir(cliente, "/chat", "s1")
+        assert status == 429
+        assert headers["Retry-After"] == "1"
+        # Outra sessão não é afetada
+        outra = asyncio.ensure_future(pedir(cliente, "/chat", "s2"))
+        await esperar_saude(cliente, lambda e: e["sessoes"] == 2)
+
+        grafo.liberar.set()
+        assert (await primeiro)[0] == 200
+        assert (await outra)[0] == 200
+
+    rodar(cenario, fila_sessao=1)
+
+
+def test_429_streams_simultaneos_na_mesma_sessao():
+    async def cenario(cliente, grafo):
+        # A reserva acontece na admissão: só um dos pedidos concorrentes passa
+        respostas = await asyncio.gather(*[
+            cliente.post("/chat/stream", json={"session_id": "s1", "mensagem": "oi"})
+            for _ in range(5)
+        ])
+        status = sorted(r.status for r in respostas)
+        assert status == [200, 429, 429, 429, 429]
+
+        grafo.liberar.set()
+        aceita = next(r for r in respostas if r.status == 200)
+        corpo = await aceita.text()
+        assert "event: fim" in corpo
+        for r in respostas:
+            r.release()
+
+    rodar(cenario, fila_sessao=1)
+
+
+def test_reserva_acontece_na_admissao():
+    async def principal():
+        servico = ServicoAssessor(executar_stream=GrafoFalso(), fila_sessao=1)
+        # O segundo turno é recusado antes de o primeiro ser iterado
+        primeiro = servico.turno("s1", "oi")
+        with pytest.raises(ErroTurno) as erro:
+            servico.turno("s1", "oi")
+        assert erro.value.status == 429
+        assert servico.estado()["na_fila"] == 1
+
+        # Fechar sem iterar devolve as duas reservas
+        await primeiro.aclose()
+        await asyncio.sleep(0)
+        estado = servico.estado()
+        assert (estado["na_fila"], estado["em_execucao"], estado["sessoes"]) == (0, 0, 0)
+        await servico.encerrar()
+
+    asyncio.run(principal())
+
+
+def test_503_com_fila_global_cheia():
+    async def cenario(cliente, grafo):
+        executando = asyncio.ensure_future(pedir(cliente, "/chat", "a"))
+        assert await asyncio.to_thread(grafo.iniciou.wait, 5)
+        na_fila = asyncio.ensure_future(pedir(cliente, "/chat", "b"))
+        await esperar_saude(cliente, lambda e: e["em_execucao"] == 1 and e["na_fila"] == 1)
+
+        status, headers, _ = await pedir(cliente, "/chat", "c")
+        assert status == 503
+        assert headers["Retry-After"] == "1"
+        status, _, _ = await pedir(cliente, "/chat/stream", "d")
+        assert status == 503
+
+        grafo.liberar.set()
+        assert (await executando)[0] == 200
+        assert (await na_fila)[0] == 200
+
+    rodar(cenario, concorrencia=1, fila=1)
+
+
+def test_504_quando_o_turno_passa_do_timeout():
+    async def cenario(cliente, grafo):
+        status, _, corpo = await pedir(cliente, "/chat", "s1")
+        assert status == 504
+        assert "erro" in json.loads(corpo)
+
+        # No streaming os cabeçalhos já foram enviados: o 504 vira evento "erro"
+        status, _, corpo = await pedir(cliente, "/chat/stream", "s2")
+        assert status == 200
+        assert "event: erro" in corpo and '"status": 504' in corpo
+
+    rodar(cenario, timeout_s=0.2)
+
+
+def test_503_ao_encerrar():
+    async def cenario(cliente, grafo):
+        cliente.server.app[SERVICO].encerrando = True
+        status, _, _ = await pedir(cliente, "/chat", "s1")
+        assert status == 503
+        assert (await cliente.get("/saude")).status == 503
+
+    rodar(cenario)
@@ -0,0 +1,129 @@
+"""
+Regressão de planos (EXPLAIN) das consultas por data das tools.
+
+Garante que os filtros de dia/intervalo local são sargáveis: o Postgres deve usar
+idx_transactions_occurred_at para o filtro e, quando há ORDER BY occurred_at, não
+pode precisar de um Sort por occurred_at. A busca por texto deve usar o índice de
+trigramas (migrations/001_busca_trigram.sql) e daily_balance, a chave do rollup
+(migrations/003_rollup_saldo_diario.sql). Com transactions particionada
+(migrations/004), os filtros de um dia/mês devem tocar uma única partição.
+
+Precisa do banco de desenvolvimento (DATABASE_URL) com as migrações aplicadas.
+Os mesmos CASOS rodam no pytest (tests/test_planos.py), que é pulado sem DATABASE_URL.
+
+Uso:
+    python verificar_planos.py      # sai com código 1 se algum plano regredir
+    python -m pytest -q aula9/tests/test_planos.py
+
+Roda com enable_seqscan = off (SET LOCAL) para o resultado não depender do volume
+de dados da base de desenvolvimento.
+"""
+from pg_tools import (
+    SQL_DAILY_BALANCE,
+    SQL_FIND_TRANSACTION,
+    _build_query_transactions,
+    get_conn,
+    local_day_range,
+)
+from datetime import date
+import json
+import sys
+
+INDICE_DATA = "idx_transactions_occurred_at"
+INDICE_BUSCA = "idx_transactions_search_trgm"
+INDICE_ROLLUP = "uq_transaction_daily_rollup"
+
+CASOS = [
+    (
+        "query_transactions (date_local)",
+        lambda: _build_query_transactions(None, None, "2025-03-10", None, None, 20),
+        {"indice": INDICE_DATA, "sem_sort": True, "max_particoes": 1},
+    ),
+    (
+        "query_transactions (intervalo)",
+        lambda: _build_query_transactions(None, None, None, "2025-03-01", "2025-03-31", 20),
+        {"indice": INDICE_DATA, "sem_sort": True, "max_particoes": 1},
+    ),
+    (
+        "daily_balance (rollup)",
+        lambda: (SQL_DAILY_BALANCE, [date(2025, 3, 10)]),
+        {"indice": INDICE_ROLLUP, "sem_sort": False},
+    ),
+    (
+        "update_transaction (match_text + date_local)",
+        lambda: (SQL_FIND_TRANSACTION, ["mercado", *local_day_range("2025-03-10")]),
+        # Os dois filtros são indexados: conforme as estatísticas o planner escolhe o
+        # intervalo de data ou os trigramas (e aí ordena as poucas linhas que sobram)
+        {"indice": (INDICE_DATA, INDICE_BUSCA), "sem_sort": False, "max_particoes": 1},
+    ),
+    (
+        "query_transactions (text, relevância)",
+        lambda: _build_query_transactions("mercado", None, None, None, None, 20, True),
+        {"indice": INDICE_BUSCA, "sem_sort": False},
+    ),
+]
+
+
+def _eh_transactions(relacao: str) -> bool:
+    return relacao == "transactions" or bool(relacao) and relacao.startswith(("transactions_p", "transactions_default"))
+
+
+def _nos(plano: dict):
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from _nos(filho)
+
+
+def explain(cur, query: str, params) -> dict:
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    resultado = cur.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]["Plan"]
+
+
+def avaliar(plano: dict, esperado: dict) -> list:
+    problemas = []
+    nos = list(_nos(plano))
+    indices = {n.get("Index Name") for n in nos if n.get("Index Name")}
+    aceitos = esperado["indice"] if isinstance(esperado["indice"], tuple) else (esperado["indice"],)
+    if not indices & set(aceitos):
+        problemas.append(f"não usa {' nem '.join(aceitos)} (índices: {sorted(indices) or 'nenhum'})")
+    if any(n["Node Type"] == "Seq Scan" and _eh_transactions(n.get("Relation Name")) for n in nos):
+        problemas.append("Seq Scan em transactions")
+    if "max_particoes" in esperado:
+        # Só se aplica com transactions particionada (migrations/004)
+        particoes = {n["Relation Name"] for n in nos if _eh_transactions(n.get("Relation Name"))} - {"transactions"}
+        if len(particoes) > esperado["max_particoes"]:
+            problemas.append(f"sem partition pruning ({len(particoes)} partições: {sorted(particoes)})")
+    if esperado["sem_sort"]:
+        for n in nos:
+            if n["Node Type"] in ("Sort", "Incremental Sort") and any(
+                "occurred_at" in chave for chave in n.get("Sort Key", [])
+            ):
+                problemas.append(f"Sort por occurred_at ({n['Sort Key']})")
+    return problemas
+
+
+def main() -> int:
+    falhas = 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SET LOCAL enable_seqscan = off;")
+            for nome, montar, esperado in CASOS:
+                query, params = montar()
+                problemas = avaliar(explain(cur, query, params), esperado)
+                if problemas:
+                    falhas += 1
+                    print(f"FALHOU  {nome}: " + "; ".join(problemas))
+                else:
+                    print(f"ok      {nome}")
+        finally:
+            conn.rollback()
+            cur.close()
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())